@@ -0,0 +1,141 @@
+#!/usr/bin/env python3
+"""
+Stage-level benchmarks on synthetic corpora: wall time and peak traced memory of
+load, smooth, detect, match (tolerant and optimal), kappa, dtw, plot and report at each corpus size.
+
+Usage:
+    python benchmarks/run_benchmarks.py --save benchmarks/baselines/local.json
+    python benchmarks/run_benchmarks.py --compare benchmarks/baselines/reference.json
+    python benchmarks/run_benchmarks.py --sizes 100000 1000000 --stages load smooth detect match kappa --no-memory
+
+Sizes above 10^4 are opt-in: per-dialogue DTW paths alone take minutes at 10^5.
+"""
+
+import argparse, json, os, platform, sys, tempfile, time, tracemalloc
+import numpy as np
+import scipy
+import pandas as pd
+from tie_dialog.agreement import kappa_by_window
+from tie_dialog.corpus import DialogueCorpus
+from tie_dialog.data_loading import load_ct_series, load_events
+from tie_dialog.dtw_analysis import per_dialogue
+from tie_dialog.events import EventArrays, detect_event_arrays, match_counts_by_window
+from tie_dialog.plots import render_overlays
+from tie_dialog.preprocessing import smooth_series
+from tie_dialog.report import build_pdf
+from tie_dialog.synthetic import write_synthetic
+
+WINDOWS = [1, 2, 3]
+
+def stages(workdir, n_plots):
+    """(name, fn) pairs; each fn reads and updates the shared state dict."""
+    def load(s):
+        s["ct"] = DialogueCorpus.from_frame(load_ct_series(s["ct_path"]))
+        s["ref"] = EventArrays.from_frame(load_events(s["ev_path"]))
+    def smooth(s):
+        s["smoothed"] = smooth_series(s["ct"], window=3)
+    def detect(s):
+        s["det"] = detect_event_arrays(s["smoothed"])
+    def match(s):
+        s["counts"] = match_counts_by_window(s["det"], WINDOWS)
+    def optimal(s):
+        s["optimal"] = match_counts_by_window(s["det"], WINDOWS, "optimal")
+    def kappa(s):
+        s["kappa"] = kappa_by_window(s["det"], s["ct"], WINDOWS)
+    def dtw(s):
+        s["dtw"] = per_dialogue(s["smoothed"])
+    def plot(s):
+        ids = s["ct"].dialogue_ids[:n_plots]
+        os.makedirs(os.path.join(workdir, "figures"), exist_ok=True)
+        s["figs"] = render_overlays(s["smoothed"], os.path.join(workdir, "figures"), ids=ids)
+    def report(s):
+        tables = {}
+        for name in ("counts", "kappa", "dtw"):
+            tables[name] = os.path.join(workdir, f"{name}.csv")
+            s[name].head(450).to_csv(tables[name], index=False)
+        build_pdf(s["figs"], tables, os.path.join(workdir, "report.pdf"))
+    return [(f.__name__, f) for f in (load, smooth, detect, match, optimal, kappa, dtw, plot, report)]
+
+STAGES = ["load", "smooth", "detect", "match", "optimal", "kappa", "dtw", "plot", "report"]
+# stages that produce each stage's inputs; always earlier in STAGES
+NEEDS = {"smooth": ["load"], "detect": ["smooth"], "match": ["detect"], "optimal": ["detect"], "kappa": ["detect"], "dtw": ["smooth"],
+         "plot": ["smooth"], "report": ["match", "kappa", "dtw", "plot"]}
+
+def run_size(n, seed, repeat, memory, n_plots, selected):
+    out = {}
+    wanted = set(selected)
+    for name in reversed(STAGES):
+        if name in wanted:
+            wanted.update(NEEDS.get(name, []))
+    with tempfile.TemporaryDirectory() as workdir:
+        ct_path, ev_path = write_synthetic(workdir, n, seed=seed)
+        state = dict(ct_path=ct_path, ev_path=ev_path)
+        for name, fn in stages(workdir, n_plots):
+            if name not in wanted:
+                continue
+            if name not in selected:
+                fn(state)   # untimed prerequisite
+                continue
+            best = np.inf
+            for _ in range(repeat):
+                t0 = time.perf_counter()
+                fn(state)
+                best = min(best, time.perf_counter() - t0)
+            out[name] = {"seconds": round(best, 4)}
+            if memory:
+                # a separate traced run: tracemalloc slows the Python-level parts of a stage
+                tracemalloc.start()
+                fn(state)
+                out[name]["peak_mb"] = round(tracemalloc.get_traced_memory()[1] / 2**20, 2)
+                tracemalloc.stop()
+            print(f"{n:>9,} {name:<7} {best:9.3f} s" + (f" {out[name]['peak_mb']:9.1f} MB" if memory else ""), flush=True)
+    return out
+
+def compare(results, baseline, tolerance, min_seconds, min_mb):
+    """Lines describing stages slower or larger than the baseline beyond `tolerance` (relative) and the noise floors."""
+    flagged = []
+    for size, by_stage in results.items():
+        for stage, cur in by_stage.items():
+            ref = baseline.get("results", {}).get(size, {}).get(stage)
+            if ref is None:
+                continue
+            for key, floor, unit in (("seconds", min_seconds, "s"), ("peak_mb", min_mb, "MB")):
+                if key in cur and key in ref and cur[key] > ref[key] * (1 + tolerance) and cur[key] - ref[key] > floor:
+                    flagged.append(f"{size:>9} {stage:<7} {key}: {ref[key]:.3f} -> {cur[key]:.3f} {unit} (+{cur[key] / ref[key] - 1:.0%})")
+    return flagged
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--sizes", type=int, nargs="+", default=[1000, 10000])
+    ap.add_argument("--stages", nargs="+", choices=STAGES, default=STAGES)
+    ap.add_argument("--seed", type=int, default=0)
+    ap.add_argument("--repeat", type=int, default=1)
+    ap.add_argument("--plots", type=int, default=24, help="overlays rendered per size (plot/report stages)")
+    ap.add_argument("--no-memory", action="store_true")
+    ap.add_argument("--save", help="write results as a baseline JSON")
+    ap.add_argument("--compare", help="baseline JSON to check for regressions")
+    ap.add_argument("--tolerance", type=float, default=0.25)
+    ap.add_argument("--min-seconds", type=float, default=0.05)
+    ap.add_argument("--min-mb", type=float, default=4.0)
+    args = ap.parse_args()
+
+    results = {str(n): run_size(n, args.seed, args.repeat, not args.no_memory, args.plots, args.stages) for n in args.sizes}
+    doc = dict(
+        created=time.strftime("%Y-%m-%dT%H:%M:%S"),
+        machine=dict(platform=platform.platform(), python=platform.python_version(), cpus=os.cpu_count(),
+                     numpy=np.__version__, pandas=pd.__version__, scipy=scipy.__version__),
+        seed=args.seed, repeat=args.repeat, results=results,
+    )
+    if args.save:
+        os.makedirs(os.path.dirname(args.save) or ".", exist_ok=True)
+        with open(args.save, "w", encoding="utf-8") as f:
+            json.dump(doc, f, indent=2)
+        print(f"saved {args.save}")
+    if args.compare:
+        with open(args.compare, "r", encoding="utf-8") as f:
+            flagged = compare(results, json.load(f), args.tolerance, args.min_seconds, args.min_mb)
+        print("\n".join(["regressions:"] + flagged) if flagged else "no regressions")
+        sys.exit(1 if flagged else 0)
+
+if __name__ == "__main__":
+    main()
@@ -1,54 +1,13 @@
 Figure 1 — Mean Human Leading Lag Across Six Dialogues
-import matplotlib.pyplot as plt
+import pandas as pd
+from tie_dialog.plots import plot_lead_lag
 
-# Valor medio del lead–lag
-mean_lag = 0.47
-
-fig, ax = plt.subplots(figsize=(8, 4))
-
-# Línea vertical en 0 (zero point)
-ax.axvline(
-    0,
-    linestyle="--",
-    color="gray",
-    alpha=0.7,
-    label="Zero point"
-)
-
-# Punto medio (X azul)
-ax.scatter(
-    [mean_lag],
-    [0],
-    marker="x",
-    s=250,
-    linewidths=3,
-    color="blue",
-    label=f"Mean human-leading lag (+{mean_lag:.2f})"
-)
-
-# Rango de ejes
-ax.set_xlim(-2.0, 2.0)
-ax.set_ylim(-1.0, 1.0)
-ax.set_yticks([])
-
-# Etiquetas y título
-ax.set_xlabel("Lead–Lag (turns)", fontsize=12)
-ax.set_title("Mean Human Leading Lag Across Six Dialogues", fontsize=16)
-
-# Grid vertical suave
-ax.grid(axis="x", linestyle=":", alpha=0.3)
-
-# Leyenda abajo centrada
-ax.legend(
-    loc="upper center",
-    bbox_to_anchor=(0.5, -0.25),
-    frameon=False,
-    ncol=2
-)
+# Lead–lag por diálogo y media del corpus (IC bootstrap), escritos por
+# `scripts/run_pipeline.py --stage metrics` con tie_dialog.lead_lag
+lags = pd.read_csv("reports/artifacts/lead_lag.csv")
+corpus = pd.read_csv("reports/artifacts/lead_lag_corpus.csv")
 
-plt.tight_layout()
-plt.savefig("figure_lead_lag.png", dpi=300)
-plt.show()
+plot_lead_lag(lags, corpus, "figure_lead_lag.png", dpi=300)
 
 
 Figure 2 — TIE–Dialog architecture
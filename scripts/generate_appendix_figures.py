@@ -4,7 +4,7 @@ Generate Appendix Figures (B1, B2, B3, B4, B6) for the TIE–Dialog preprint.
 
 Requirements:
 - Python 3.9+
-- numpy, pandas, matplotlib, scipy
+- numpy, pandas, matplotlib, scipy, tie_dialog (src/ on PYTHONPATH)
 
 Usage:
     python generate_appendix_figures.py \
@@ -14,7 +14,8 @@ Usage:
 
 Notes:
 - Figure B6 is a conceptual-but-empirical schematic built from a flattened C_t oscillation with Φ thresholds.
-- DTW path (B4) is computed with a basic dynamic-programming implementation to avoid extra dependencies.
+- Φ_low/Φ_high in B1 come from tie_dialog.sbr (the S–B–R quantization used by the pipeline).
+- DTW path (B4) comes from tie_dialog.dtw_path (anti-diagonal wavefront); the cost heatmap is strided for long dialogues.
 """
 
 import argparse
@@ -22,7 +23,8 @@ import numpy as np
 import pandas as pd
 import matplotlib.pyplot as plt
 from scipy.signal import find_peaks
-from scipy.spatial.distance import cdist
+from tie_dialog.dtw_path import warping_path
+from tie_dialog.sbr import phi_thresholds
 
 def ensure_dir(p):
     import os
@@ -38,9 +40,9 @@ def fig_B1(d2_path, out_dir):
     peaks, _ = find_peaks(ct, prominence=0.03, distance=2)
     valleys, _ = find_peaks(-ct, prominence=0.03, distance=2)
 
-    # Adaptive thresholds
-    phi_low = np.percentile(ct, 25)
-    phi_high = np.percentile(ct, 75)
+    # Adaptive thresholds (per-dialogue 25th/75th percentiles, as in the pipeline's S–B–R states)
+    lo, hi = phi_thresholds(ct, np.array([0, len(ct)]), mode="adaptive", percentiles=(25, 75))
+    phi_low, phi_high = lo[0], hi[0]
 
     plt.figure(figsize=(9,5))
     plt.plot(t, ct, linewidth=2, label='Coherence trajectory (C_t)')
@@ -99,33 +101,12 @@ def fig_B3(d4_path, out_dir):
     plt.savefig(f"{out_dir}/Figure_B3_Dialogue4_proto_coherence.png", dpi=300)
     plt.close()
 
-def dtw_path_matrix(x, y):
-    """Compute DTW accumulated cost and backtracked path (i,j)."""
-    D = cdist(x.reshape(-1,1), y.reshape(-1,1), metric='euclidean')
-    n, m = D.shape
-    acc = np.zeros((n, m))
-    acc[0, 0] = D[0, 0]
-    for i in range(1, n):
-        acc[i, 0] = D[i, 0] + acc[i-1, 0]
-    for j in range(1, m):
-        acc[0, j] = D[0, j] + acc[0, j-1]
-    for i in range(1, n):
-        for j in range(1, m):
-            acc[i, j] = D[i, j] + min(acc[i-1, j], acc[i, j-1], acc[i-1, j-1])
-
-    i, j = n-1, m-1
-    path = [(i, j)]
-    while i > 0 and j > 0:
-        step = np.argmin([acc[i-1, j-1], acc[i-1, j], acc[i, j-1]])
-        if step == 0:
-            i, j = i-1, j-1
-        elif step == 1:
-            i, j = i-1, j
-        else:
-            j = j-1
-        path.append((i, j))
-    path.reverse()
-    return D, path
+def dtw_path_matrix(x, y, max_cells=1000):
+    """Local cost |x_i - y_j| (strided to at most max_cells per axis) and the DTW path (i,j)."""
+    _, path = warping_path(x, y)
+    step = max(1, int(np.ceil(max(len(x), len(y)) / max_cells)))
+    D = np.abs(x[::step, None] - y[None, ::step])
+    return D, step, path
 
 def fig_B4(d2_path, out_dir):
     """Figure B4. DTW warping path for Dialogue 2 (human ↔ model)."""
@@ -133,11 +114,12 @@ def fig_B4(d2_path, out_dir):
     human = df['Ct_Im'].values
     model = df['Ct'].values
 
-    D, path = dtw_path_matrix(human, model)
-    path_y, path_x = zip(*path)
+    D, step, path = dtw_path_matrix(human, model)
+    path_y, path_x = path[:, 0], path[:, 1]
 
     plt.figure(figsize=(6,6))
-    plt.imshow(D, cmap='cividis', origin='lower', aspect='auto')
+    plt.imshow(D, cmap='cividis', origin='lower', aspect='auto',
+               extent=(-0.5, D.shape[1] * step - 0.5, -0.5, D.shape[0] * step - 0.5))
     plt.plot(path_x, path_y, color='white', linewidth=2, label='Optimal path')
     plt.xlabel("Model time steps")
     plt.ylabel("Human time steps")
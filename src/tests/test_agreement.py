@@ -0,0 +1,31 @@
+import itertools
+import numpy as np
+import pandas as pd
+from sklearn.metrics import cohen_kappa_score
+from tie_dialog.agreement import fleiss_kappa, kappa_by_window, kappa_summary, light_kappa, pairwise_kappa
+from tie_dialog.events import EventArrays
+
+def test_kappa_by_window_matches_sklearn_at_window_zero():
+    rng = np.random.default_rng(0)
+    grid = pd.DataFrame(dict(dialogue_id=np.repeat([1,2,3], 40), turn=np.tile(np.arange(40), 3)))
+    flags = (rng.random((len(grid), 4)) < 0.2).astype(int)
+    ev = EventArrays.from_frame(grid.assign(human_peak=flags[:,0], human_valley=flags[:,1], machine_peak=flags[:,2], machine_valley=flags[:,3]))
+    table = kappa_by_window(ev, grid, [0, 2])
+    zero = table[(table["window"] == 0) & (table["kind"] == "peak")]
+    ref = [cohen_kappa_score(flags[grid.dialogue_id == d, 0], flags[grid.dialogue_id == d, 2]) for d in (1, 2, 3)]
+    assert np.allclose(zero["kappa"], ref)
+    summary = kappa_summary(table).set_index(["window","kind"])
+    assert np.isclose(summary.loc[(0, "peak"), "kappa_pooled"], cohen_kappa_score(flags[:, 0], flags[:, 2]))
+    assert (summary.loc[(2, "peak"), "kappa_pooled"] >= summary.loc[(0, "peak"), "kappa_pooled"])
+
+def test_multi_rater_kappa():
+    rng = np.random.default_rng(1)
+    Y = np.where(rng.random((300, 5)) < 0.6, rng.integers(0, 3, (300, 1)), rng.integers(0, 3, (300, 5)))
+    K = pairwise_kappa(Y)
+    pairs = list(itertools.combinations(range(5), 2))
+    assert np.allclose([K[i, j] for i, j in pairs], [cohen_kappa_score(Y[:, i], Y[:, j]) for i, j in pairs])
+    assert np.isclose(light_kappa(Y), np.mean([K[i, j] for i, j in pairs]))
+    counts = np.stack([(Y == l).sum(axis=1) for l in range(3)], axis=1)
+    P = ((counts ** 2).sum(axis=1) - 5) / 20
+    p = counts.sum(axis=0) / Y.size
+    assert np.isclose(fleiss_kappa(Y), (P.mean() - (p ** 2).sum()) / (1 - (p ** 2).sum()))
@@ -0,0 +1,22 @@
+import numpy as np
+import pandas as pd
+from tie_dialog.bootstrap import f1_intervals, mean_intervals, resampled_sums
+from tie_dialog.events import EventArrays, f1_summary, match_counts_by_window
+
+def test_resampled_sums_are_resamples():
+    X = np.arange(10, dtype=np.float64)[:, None] ** [0, 1]
+    S = resampled_sums(X, n_boot=50, seed=3, max_cells=40)
+    # every resample draws 10 dialogues; chunking must not change the draws' determinism
+    assert np.allclose(S[:, 0], 10) and np.array_equal(S, resampled_sums(X, n_boot=50, seed=3, max_cells=40))
+
+def test_f1_intervals_bracket_point_estimates():
+    rng = np.random.default_rng(0)
+    n = 600
+    ev = EventArrays(rng.integers(0, 50, n).astype(np.int32), rng.integers(0, 80, n).astype(np.int32),
+                     rng.integers(0, 2, n).astype(np.int8), rng.integers(0, 2, n).astype(np.int8), np.arange(50))
+    counts = match_counts_by_window(ev, [1, 3])
+    table = f1_summary(counts).merge(f1_intervals(counts, n_boot=500, seed=1), on=["window","kind"])
+    assert (table["f1_ci_low"] <= table["f1"]).all() and (table["f1"] <= table["f1_ci_high"]).all()
+    assert (table["f1_micro_ci_low"] <= table["f1_micro"]).all() and (table["f1_micro"] <= table["f1_micro_ci_high"]).all()
+    means = mean_intervals(pd.DataFrame(dict(x=[1.0, 2.0, np.nan, 3.0])), ["x"], n_boot=200)
+    assert means["mean"].iloc[0] == 2.0 and means["n_dialogues"].iloc[0] == 3
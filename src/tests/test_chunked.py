@@ -0,0 +1,50 @@
+import filecmp
+import pandas as pd
+import pytest
+from tie_dialog import cli
+from tie_dialog.data_loading import iter_ct_chunks, load_ct_series
+from tie_dialog.synthetic import synthetic_corpus
+
+def _write(tmp_path, n=40):
+    ct, ev = synthetic_corpus(n, seed=2)
+    for df in (ct, ev):
+        df["dialogue_id"] = "d" + df["dialogue_id"].astype(str)   # string ids: d10 sorts before d2
+    ct = ct.sort_values(["dialogue_id","turn"])
+    ct.to_csv(tmp_path / "ct.csv", index=False)
+    ev.sort_values(["dialogue_id","turn"]).to_csv(tmp_path / "ev.csv", index=False)
+    ev.iloc[::3].rename(columns=lambda c: c.replace("human", "annotator_1").replace("machine", "annotator_2")).to_csv(tmp_path / "raters.csv", index=False)
+    return ct
+
+def test_chunks_hold_whole_dialogues(tmp_path):
+    ct = _write(tmp_path)
+    chunks = list(iter_ct_chunks(str(tmp_path / "ct.csv"), chunk_rows=50))
+    assert len(chunks) > 5
+    ids = [set(c["dialogue_id"].astype(str)) for c in chunks]
+    assert sum(map(len, ids)) == len(set().union(*ids)) == ct["dialogue_id"].nunique()
+    full = load_ct_series(str(tmp_path / "ct.csv"))
+    assert pd.concat(chunks, ignore_index=True)["human_ct"].equals(full["human_ct"])
+    ct.iloc[::-1].to_csv(tmp_path / "rev.csv", index=False)
+    with pytest.raises(ValueError, match="sorted"):
+        list(iter_ct_chunks(str(tmp_path / "rev.csv"), chunk_rows=50))
+
+@pytest.mark.parametrize("events", ["ev.csv", "none.csv"])
+def test_chunked_metrics_match_in_memory(tmp_path, events):
+    _write(tmp_path)
+    for out in ("mem", "chunk"):
+        (tmp_path / f"{out}.yml").write_text(f"""seed: 0
+data: {{ct_series: {tmp_path / 'ct.csv'}, events: {tmp_path / events}, raters: {tmp_path / 'raters.csv'}}}
+outputs: {{figures_dir: {tmp_path / out / 'fig'}, artifacts_dir: {tmp_path / out}, pdf_report: {tmp_path / out / 'r.pdf'}}}
+analysis:
+  smoothing: {{method: rolling, window: 3}}
+  events: {{peak_prominence: 0.08, min_distance: 2}}
+  windows: [0, 2, 1]
+  bootstrap: {{n_boot: 200}}
+  dtw: {{}}
+plotting: {{}}
+""")
+    assert cli.main(["metrics", "--config", str(tmp_path / "mem.yml"), "--no-instrument"]) == 0
+    assert cli.main(["metrics", "--config", str(tmp_path / "chunk.yml"), "--no-instrument", "--chunk-rows", "60"]) == 0
+    names = sorted(p.name for p in (tmp_path / "mem").glob("*.csv"))
+    assert len(names) == 11
+    match, mismatch, errors = filecmp.cmpfiles(tmp_path / "mem", tmp_path / "chunk", names, shallow=False)
+    assert mismatch == [] and errors == []
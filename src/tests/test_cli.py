@@ -0,0 +1,55 @@
+import os, subprocess, sys
+import pandas as pd
+import pytest
+from tie_dialog import __version__, cli, config
+from tie_dialog.events import MATCH_MODES
+from tie_dialog.preprocessing import SMOOTHING_METHODS
+from tie_dialog.synthetic import synthetic_corpus
+
+SRC = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+def _config(tmp_path, ct_series, method="rolling"):
+    path = tmp_path / "cfg.yml"
+    path.write_text(f"""seed: 0
+data: {{ct_series: {ct_series}, events: {tmp_path / 'none.csv'}}}
+outputs: {{figures_dir: {tmp_path / 'fig'}, artifacts_dir: {tmp_path / 'art'}, pdf_report: {tmp_path / 'r.pdf'}}}
+analysis:
+  smoothing: {{method: {method}, window: 3}}
+  events: {{peak_prominence: 0.08, min_distance: 2}}
+  windows: 2
+  dtw: {{}}
+plotting: {{}}
+""")
+    return str(path)
+
+def test_version_and_check_config(tmp_path, capsys):
+    with pytest.raises(SystemExit):
+        cli.main(["--version"])
+    assert __version__ in capsys.readouterr().out
+    ct, _ = synthetic_corpus(3, seed=0)
+    ct.to_csv(tmp_path / "ct.csv", index=False)
+    assert cli.main(["--check-config", _config(tmp_path, tmp_path / "ct.csv")]) == 0
+    assert cli.main(["--check-config", _config(tmp_path, tmp_path / "missing.csv", method="median")]) == 1
+    assert len(capsys.readouterr().err.splitlines()) == 2
+    assert config.SMOOTHING_METHODS == SMOOTHING_METHODS and config.MATCH_MODES == MATCH_MODES
+
+def test_cli_import_is_light():
+    code = "import sys, tie_dialog.cli; print(sorted({'pandas', 'scipy', 'matplotlib', 'rich', 'yaml'} & set(sys.modules)))"
+    out = subprocess.run([sys.executable, "-c", code], capture_output=True, text=True, check=True,
+                         env=dict(os.environ, PYTHONPATH=SRC)).stdout
+    assert out.strip() == "[]"
+
+def test_stage_modules_skip_dtaidistance():
+    code = "import sys, tie_dialog.plots, tie_dialog.lead_lag, tie_dialog.sweep; print('dtaidistance' in sys.modules)"
+    out = subprocess.run([sys.executable, "-c", code], capture_output=True, text=True, check=True,
+                         env=dict(os.environ, PYTHONPATH=SRC)).stdout
+    assert out.strip() == "False"
+
+def test_stream_writes_events(tmp_path):
+    ct, _ = synthetic_corpus(4, seed=1)
+    ct.to_csv(tmp_path / "ct.csv", index=False)
+    out = tmp_path / "events.csv"
+    assert cli.main(["stream", "--config", _config(tmp_path, tmp_path / "ct.csv"), "--output", str(out)]) == 0
+    ev = pd.read_csv(out)
+    assert list(ev.columns) == ["dialogue_id", "turn", "kind", "speaker", "prominence"] and len(ev) > 0
+    assert set(ev["kind"]) <= {"peak", "valley"}
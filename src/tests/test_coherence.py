@@ -0,0 +1,42 @@
+
+import numpy as np
+import pandas as pd
+from tie_dialog.coherence import EmbeddingCache, compute_coherence
+
+def test_compute_coherence_window():
+    rng = np.random.default_rng(0)
+    E = rng.normal(size=(5, 4)).astype(np.float32)
+    out = compute_coherence(E, pd.DataFrame(dict(dialogue_id=[1]*5, turn=range(5))), window=2)
+    U = E / np.linalg.norm(E, axis=1, keepdims=True)
+    ctx = U[1] + U[2]
+    assert np.isnan(out["Ct"].iloc[0])
+    assert np.isclose(out["Ct"].iloc[3], U[3] @ ctx / np.linalg.norm(ctx), atol=1e-5)
+
+def test_embedding_cache_encodes_each_text_once(tmp_path):
+    calls = []
+    def encoder(texts):
+        calls.append(list(texts))
+        return np.ones((len(texts), 3))
+    EmbeddingCache(str(tmp_path), encoder).encode(["a", "b", "a"])
+    EmbeddingCache(str(tmp_path), encoder).encode(["b", "a"])
+    assert calls == [["a", "b"]]
+
+def test_embedding_cache_shards_per_call_and_compacts(tmp_path):
+    import glob
+    encoder = lambda texts: np.array([[len(t), ord(t[0])] for t in texts], dtype=np.float32)
+    for i in range(4):
+        EmbeddingCache(str(tmp_path), encoder, batch_size=2).encode([f"{c}{i}" * (i + 1) for c in "abcde"])
+    assert len(glob.glob(str(tmp_path / "shard-*.keys.npy"))) == 4
+    cache = EmbeddingCache(str(tmp_path), max_shards=2)
+    assert len(glob.glob(str(tmp_path / "shard-*.npy"))) == 2 and len(cache) == 20
+    assert np.array_equal(cache.encode(["e3e3e3e3", "a0"]), [[8, ord("e")], [2, ord("a")]])
+
+def test_blocks_follow_the_byte_budget(monkeypatch):
+    from tie_dialog import coherence
+    rng = np.random.default_rng(1)
+    E = rng.normal(size=(60, 8)).astype(np.float32)
+    frame = pd.DataFrame(dict(dialogue_id=np.repeat(np.arange(12), 5), turn=np.tile(np.arange(5), 12)))
+    whole = compute_coherence(E, frame)
+    monkeypatch.setattr(coherence, "CHUNK_BYTES", 20 * 8 * 7)   # 7 rows per block
+    assert coherence._chunk_rows(E, None) == 7
+    pd.testing.assert_frame_equal(compute_coherence(E, frame), whole)
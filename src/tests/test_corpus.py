@@ -0,0 +1,32 @@
+import numpy as np
+import pandas as pd
+from tie_dialog.corpus import DialogueCorpus
+from tie_dialog.synthetic import synthetic_corpus
+from tie_dialog.preprocessing import smooth_series
+from tie_dialog.events import detect_event_arrays
+from tie_dialog.dtw_analysis import per_dialogue
+
+def test_round_trip_views_and_subset():
+    ct, _ = synthetic_corpus(20, seed=3)
+    c = DialogueCorpus.from_frame(ct)
+    assert c.n_dialogues == 20 and c.human_ct.dtype == np.float32 and c.turn.dtype == np.int32
+    back = c.to_frame()
+    pd.testing.assert_frame_equal(back, ct, check_dtype=False, atol=1e-6)
+
+    v = c.view(4)
+    assert np.shares_memory(v.human_ct, c.human_ct) and v.dialogue_id == c.dialogue_ids[4]
+    assert np.array_equal(c[v.dialogue_id].model_ct, v.model_ct)
+
+    ids = [c.dialogue_ids[7], "missing", c.dialogue_ids[2]]
+    sub = c.subset(ids)
+    assert list(sub.dialogue_ids) == [c.dialogue_ids[2], c.dialogue_ids[7]]
+    assert np.array_equal(sub.view(1).human_ct, c.view(7).human_ct)
+
+def test_stages_agree_on_frame_and_corpus():
+    ct, _ = synthetic_corpus(15, seed=4)
+    c = DialogueCorpus.from_frame(ct, dtype=None)
+    sm_f, sm_c = smooth_series(ct, window=3), smooth_series(c, window=3)
+    assert np.allclose(sm_f["human_ct"].to_numpy(), sm_c.human_ct, equal_nan=True)
+    ev_f, ev_c = detect_event_arrays(sm_f), detect_event_arrays(sm_c)
+    assert np.array_equal(ev_f.turn, ev_c.turn) and np.array_equal(ev_f.kind, ev_c.kind)
+    pd.testing.assert_frame_equal(per_dialogue(sm_f), per_dialogue(sm_c))
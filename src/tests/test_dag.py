@@ -0,0 +1,73 @@
+import filecmp, operator, time
+import pytest
+from tie_dialog import cli
+from tie_dialog.dag import DAG, Node
+from tie_dialog.instrument import Instrument
+from tie_dialog.synthetic import synthetic_corpus
+
+def _sleep(seconds, value=None):
+    def fn(*_):
+        time.sleep(seconds)
+        return value
+    return fn
+
+def test_order_values_and_errors():
+    dag = DAG([Node("sum", operator.add, ("a", "b"), ("c",)), Node("a", lambda: 2, (), ("a",)), Node("b", lambda a: a * 5, ("a",), ("b",))])
+    assert dag.order() == ["a", "b", "sum"]
+    assert dag.run()["c"] == 12
+    assert DAG([Node("x", operator.neg, ("a",), ("x",))]).run(values={"a": 3})["x"] == -3
+    with pytest.raises(ValueError, match="no node produces"):
+        DAG([Node("x", operator.neg, ("a",), ("x",))]).order()
+    with pytest.raises(ValueError, match="cycle"):
+        DAG([Node("x", operator.neg, ("y",), ("x",)), Node("y", operator.neg, ("x",), ("y",))]).order()
+    with pytest.raises(ValueError, match="produced by both"):
+        DAG([Node("x", int, (), ("a",)), Node("y", int, (), ("a",))])
+
+def test_independent_nodes_overlap_within_jobs():
+    # load -> three 0.3 s branches -> report: about 0.4 s on the critical path, 1 s one at a time
+    inst = Instrument()
+    dag = DAG([Node("load", _sleep(0.05, 1), (), ("raw",))]
+              + [Node(f"b{i}", _sleep(0.3, i), ("raw",), (f"b{i}",)) for i in range(3)]
+              + [Node("report", _sleep(0.05), ("b0", "b1", "b2"))])
+    t0 = time.perf_counter()
+    values = dag.run(jobs=4, stage=inst.stage)
+    assert time.perf_counter() - t0 < 0.75
+    assert [values[f"b{i}"] for i in range(3)] == [0, 1, 2]
+    assert {r.name: r.parent for r in inst.records}["report"] is None
+    assert set(dag.status.values()) == {"done"}
+
+def test_process_node():
+    dag = DAG([Node("n", lambda: 7, (), ("n",)), Node("sq", operator.mul, ("n", "n"), ("sq",), "process")])
+    assert dag.run(jobs=2)["sq"] == 49
+
+@pytest.mark.parametrize("jobs", [1, 3])
+def test_failure_skips_dependents(jobs):
+    def boom(_):
+        raise RuntimeError("boom")
+    dag = DAG([Node("load", lambda: 1, (), ("raw",)), Node("bad", boom, ("raw",), ("x",)), Node("slow", _sleep(0.1, 2), ("raw",), ("y",)),
+               Node("after", operator.neg, ("x",), ("z",)), Node("report", lambda *_: None, ("y", "z"))])
+    with pytest.raises(RuntimeError, match="boom"):
+        dag.run(jobs=jobs, keep_going=True)
+    assert dag.status == {"load": "done", "bad": "failed", "slow": "done", "after": "skipped", "report": "skipped"}
+
+def test_pipeline_output_does_not_depend_on_jobs(tmp_path):
+    ct, ev = synthetic_corpus(12, seed=3)
+    ct.to_csv(tmp_path / "ct.csv", index=False)
+    ev.to_csv(tmp_path / "ev.csv", index=False)
+    for jobs in ("1", "3"):
+        (tmp_path / f"{jobs}.yml").write_text(f"""seed: 0
+data: {{ct_series: {tmp_path / 'ct.csv'}, events: {tmp_path / 'ev.csv'}}}
+outputs: {{figures_dir: {tmp_path / jobs / 'fig'}, artifacts_dir: {tmp_path / jobs}, pdf_report: {tmp_path / jobs / 'r.pdf'}}}
+analysis:
+  smoothing: {{method: rolling, window: 3}}
+  events: {{peak_prominence: 0.08, min_distance: 2}}
+  windows: [1, 2]
+  bootstrap: {{n_boot: 100}}
+  dtw: {{}}
+plotting: {{}}
+""")
+        assert cli.main(["metrics", "--config", str(tmp_path / f"{jobs}.yml"), "--no-instrument", "--jobs", jobs]) == 0
+    names = sorted(p.name for p in (tmp_path / "1").glob("*.csv"))
+    assert len(names) == 10
+    match, mismatch, errors = filecmp.cmpfiles(tmp_path / "1", tmp_path / "3", names, shallow=False)
+    assert mismatch == [] and errors == []
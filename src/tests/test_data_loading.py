@@ -0,0 +1,34 @@
+
+import pandas as pd
+from tie_dialog.data_loading import load_ct_series
+
+def test_load_ct_series_cache(tmp_path):
+    path = tmp_path / "ct.csv"
+    pd.DataFrame(dict(dialogue_id=[2,1,1], turn=[1,2,1], human_ct=[0.1,0.2,0.3], model_ct=[0.4,0.5,0.6])).to_csv(path, index=False)
+    first = load_ct_series(str(path), cache_dir=str(tmp_path / "cache"))
+    second = load_ct_series(str(path), cache_dir=str(tmp_path / "cache"))
+    assert first["dialogue_id"].tolist() == [1,1,2] and first["turn"].tolist() == [1,2,1]
+    assert str(first["human_ct"].dtype) == "float32" and str(first["turn"].dtype) == "int32"
+    pd.testing.assert_frame_equal(first, second)
+
+def test_cache_keyed_on_size_and_mtime(tmp_path):
+    import mmap, os
+    import numpy as np
+    from tie_dialog.data_loading import _cache_path
+    path, cache = tmp_path / "ct.csv", str(tmp_path / "cache")
+    pd.DataFrame(dict(dialogue_id=[1,1], turn=[1,2], human_ct=[0.1,0.2], model_ct=[0.4,0.5])).to_csv(path, index=False)
+    os.makedirs(_cache_path(cache, str(path), "ct_series") + ".tmp")   # stale, from an interrupted write
+    (tmp_path / "cache" / os.listdir(cache)[0] / "stray.npy").write_bytes(b"")
+    load_ct_series(str(path), cache_dir=cache)
+    cached = load_ct_series(str(path), cache_dir=cache)
+    cdir = _cache_path(cache, str(path), "ct_series")
+    assert os.listdir(cache) == [os.path.basename(cdir)] and "stray.npy" not in os.listdir(cdir)
+    for c in cached.columns:
+        base = cached[c].to_numpy()
+        while getattr(base, "base", None) is not None:
+            base = base.base
+        assert isinstance(base, mmap.mmap)
+    st = os.stat(path)
+    os.utime(path, ns=(st.st_atime_ns, st.st_mtime_ns + 10**9))
+    assert _cache_path(cache, str(path), "ct_series") not in {os.path.join(cache, d) for d in os.listdir(cache)}
+    assert _cache_path(cache, str(path), "ct_series", full_hash=True) != _cache_path(cache, str(path), "ct_series")
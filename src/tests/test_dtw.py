@@ -0,0 +1,34 @@
+
+import numpy as np
+import pandas as pd
+from dtaidistance import dtw
+from tie_dialog.dtw_analysis import per_dialogue
+
+def test_per_dialogue_honors_window_and_psi():
+    rng = np.random.default_rng(0)
+    df = pd.DataFrame(dict(dialogue_id=[1]*30+[2]*20, turn=list(range(30))+list(range(20)), human_ct=rng.random(50), model_ct=rng.random(50)))
+    out = per_dialogue(df, window=3, psi=1)
+    part = df[df["dialogue_id"] == 2]
+    ref = dtw.distance(part["human_ct"].values, part["model_ct"].values, window=3, psi=1, use_c=False)
+    assert np.isclose(out["dist"].iloc[1], ref)
+    assert np.isclose(out["dist_norm"].iloc[1], ref / np.sqrt(40))
+
+def test_dtw_path_matches_dtaidistance():
+    from tie_dialog.dtw_path import dtw_path
+    rng = np.random.default_rng(1)
+    x, y = rng.random(40), rng.random(35)
+    res = dtw_path(x, y, window=6, psi=2)
+    assert np.isclose(res.distance, dtw.distance(x, y, window=6, psi=2, use_c=False))
+    full = dtw_path(x, y)
+    assert np.array_equal(full.path, np.array(dtw.warping_path(x, y)))
+    assert np.isclose(full.lag, np.mean(full.path[:, 1] - full.path[:, 0]))
+
+def test_batch_paths_match_dtw_path():
+    from tie_dialog.dtw_path import batch_paths, dtw_path
+    rng = np.random.default_rng(2)
+    X, Y = np.round(rng.random((2, 7, 25)), 1)   # quantized: ties in the backtrack
+    for window, psi, max_cells in ((None, 0, 1000), (4, 2, 1000), (4, 2, 100)):
+        got = batch_paths(X, Y, window, psi, max_cells=max_cells)
+        for r in range(len(X)):
+            res = dtw_path(X[r], Y[r], window, psi)
+            assert np.allclose(got[r], [res.distance, res.r_warped, res.lag, len(res.path)])
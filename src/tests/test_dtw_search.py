@@ -0,0 +1,33 @@
+import os
+import numpy as np
+from dtaidistance import dtw
+from tie_dialog.dtw_search import DTWIndex, cluster_dialogues, condensed_index, pairwise_matrix
+from tie_dialog.synthetic import synthetic_corpus
+
+def test_top_k_matches_brute_force_and_bounds_hold():
+    ct, _ = synthetic_corpus(120, seed=4)
+    for window, psi in ((None, 0), (3, 0), (4, 2)):
+        idx = DTWIndex(ct, window=window, psi=psi)
+        q = idx.series(7)
+        brute = np.array([dtw.distance(q, idx.series(j), window=window, psi=psi) for j in range(len(idx))])
+        brute[7] = np.inf
+        res = idx.neighbors(idx.corpus.dialogue_ids[7], k=4)
+        order = np.argsort(brute, kind="stable")[:4]
+        assert np.allclose(res["dist"], brute[order]) and list(res["dialogue_id"]) == list(idx.corpus.dialogue_ids[order])
+        stats = res.attrs["stats"]
+        assert stats["candidates"] == len(idx) - 1 == stats["pruned_kim"] + stats["pruned_keogh"] + stats["dtw"]
+        cand = np.arange(len(idx))
+        brute[7] = 0
+        assert (idx._lb_kim(q, cand) <= brute + 1e-9).all() and (idx._lb_keogh(q, cand) <= brute + 1e-9).all()
+
+def test_pairwise_matrix_is_cached(tmp_path):
+    ct, _ = synthetic_corpus(40, seed=5)
+    D = pairwise_matrix(ct, str(tmp_path), window=3, jobs=2)
+    idx = DTWIndex(ct, window=3)
+    series = [idx.series(i) for i in range(len(idx))]
+    assert np.allclose(D, dtw.distance_matrix(series, window=3, compact=True))
+    assert np.isclose(D[condensed_index(2, 9, len(idx))], dtw.distance(series[2], series[9], window=3))
+    (path,) = os.listdir(tmp_path)
+    mtime = os.path.getmtime(tmp_path / path)
+    assert np.array_equal(pairwise_matrix(ct, str(tmp_path), window=3), D) and os.path.getmtime(tmp_path / path) == mtime
+    assert len(os.listdir(tmp_path)) == 1 and len(set(cluster_dialogues(ct, D, 3)["cluster"])) == 3
@@ -0,0 +1,37 @@
+import os
+import numpy as np
+import pandas as pd
+from sklearn.metrics import cohen_kappa_score
+from tie_dialog.agreement import kappa_by_window
+from tie_dialog.event_store import agreement_matrix, combine, from_long, from_wide, load_rater_events, pairwise_agreement
+from tie_dialog.events import EventArrays, match_counts_by_window
+from tie_dialog.synthetic import synthetic_corpus
+
+WORKBOOK = os.path.join(os.path.dirname(__file__), "..", "..", "docs", "valleys_peaks_final_results.xlsx")
+KEY = ["window","dialogue_id","kind"]
+
+def test_pair_counts_match_match_counts_and_kappa_by_window():
+    ct, ev = synthetic_corpus(30, seed=1)
+    table = pairwise_agreement(from_wide(ev, ct), [0, 1, 3], by_dialogue=True)
+    pair = table[(table["ref"] == "human") & (table["sys"] == "machine") & (table["kind"] != "all")].set_index(KEY)
+    arrays = EventArrays.from_frame(ev)
+    counts = match_counts_by_window(arrays, [0, 1, 3]).set_index(KEY)
+    cols = ["n_ref","n_sys","tp_ref","tp_sys"]
+    assert (pair.loc[counts.index, cols].to_numpy() == counts[cols].to_numpy()).all()
+    kappa = kappa_by_window(arrays, ct, [0, 1, 3]).set_index(KEY)
+    assert np.allclose(pair.loc[kappa.index, "kappa"], kappa["kappa"], equal_nan=True)
+
+def test_annotator_workbook():
+    df = pd.read_excel(WORKBOOK)
+    store = load_rater_events(WORKBOOK)
+    assert list(store.raters) == [f"annotator_{i}" for i in range(1, 6)] and store.n_turns.tolist() == [30] * 6
+    table = pairwise_agreement(store, [0, 2])
+    K = agreement_matrix(table, "kappa", window=0, kind="peak")
+    assert np.isclose(K.loc["annotator_1", "annotator_3"], cohen_kappa_score(df["annotator_1_peak"], df["annotator_3_peak"]))
+    F = agreement_matrix(table)
+    assert np.allclose(np.diag(F), 1) and np.allclose(F.to_numpy(), F.to_numpy().T)
+    long = df.melt(["dialogue_id","turn"], [c for c in df.columns if c.startswith("annotator_")], var_name="col")
+    long = long[long["value"] > 0].assign(rater=lambda x: x["col"].str.rsplit("_", n=1).str[0], kind=lambda x: x["col"].str.rsplit("_", n=1).str[1])
+    assert pairwise_agreement(from_long(long, df), [0, 2]).equals(table)
+    both = combine(from_long(long[long["rater"] <= "annotator_2"], df), from_long(long[long["rater"] > "annotator_2"], df))
+    assert pairwise_agreement(both, [0, 2]).equals(table)
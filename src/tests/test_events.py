@@ -6,3 +6,64 @@ def test_detect_events_empty():
     df = pd.DataFrame(dict(dialogue_id=[1,1], turn=[1,2], human_ct=[0.0,0.0], model_ct=[0.0,0.0]))
     ev = detect_events(df, prominence=1.0, min_distance=1)
     assert set(ev.columns)=={'dialogue_id','turn','human_peak','human_valley','machine_peak','machine_valley'}
+
+def test_detect_event_arrays_matches_per_dialogue_find_peaks():
+    import numpy as np
+    from scipy.signal import find_peaks
+    from tie_dialog.events import detect_event_arrays
+    rng = np.random.default_rng(0)
+    lens = rng.integers(1, 40, size=50)
+    df = pd.DataFrame(dict(dialogue_id=np.repeat(np.arange(50), lens), turn=np.concatenate([np.arange(n) for n in lens]),
+                           human_ct=rng.random(lens.sum()), model_ct=rng.random(lens.sum())))
+    ev = detect_event_arrays(df, prominence=0.1, min_distance=3)
+    ref = set()
+    for did, part in df.groupby("dialogue_id"):
+        for s, col in enumerate(["human_ct","model_ct"]):
+            for k, sign in enumerate([1, -1]):
+                p, _ = find_peaks(sign * part[col].values, prominence=0.1, distance=3)
+                ref |= {(did, t, k, s) for t in part["turn"].values[p]}
+    assert set(zip(ev.dialogue_ids[ev.dialogue], ev.turn, ev.kind, ev.speaker)) == ref
+
+def test_match_counts_one_to_one():
+    import numpy as np
+    from tie_dialog.events import EventArrays, match_counts
+    # human peaks at 5 and 7, machine peaks at 6 only
+    ev = EventArrays(np.zeros(3, np.int32), np.array([5, 7, 6], np.int32), np.zeros(3, np.int8), np.array([0, 0, 1], np.int8), np.array([1]))
+    tolerant = match_counts(ev, 1, "tolerant").iloc[0]
+    greedy = match_counts(ev, 1, "greedy").iloc[0]
+    assert (tolerant.tp_ref, tolerant.tp_sys, tolerant.fn) == (2, 1, 0)
+    assert (greedy.tp_ref, greedy.tp_sys, greedy.fn, greedy.fp) == (1, 1, 1, 0)
+
+def test_match_counts_by_window_equals_single_windows():
+    import numpy as np
+    from tie_dialog.events import EventArrays, match_counts, match_counts_by_window
+    rng = np.random.default_rng(0)
+    n = 200
+    ev = EventArrays(rng.integers(0, 5, n).astype(np.int32), rng.integers(0, 100, n).astype(np.int32),
+                     rng.integers(0, 2, n).astype(np.int8), rng.integers(0, 2, n).astype(np.int8), np.arange(5))
+    for mode in ("tolerant", "greedy"):
+        sweep = match_counts_by_window(ev, range(0, 21), mode)
+        for w in (0, 3, 20):
+            single = match_counts(ev, w, mode)
+            assert sweep[sweep["window"] == w].drop(columns="window").reset_index(drop=True).equals(single)
+
+def test_optimal_matching_equals_sorted_sweep():
+    import numpy as np
+    from tie_dialog.events import EventArrays, match_counts_by_window
+    rng = np.random.default_rng(1)
+    n = 300
+    ev = EventArrays(rng.integers(0, 6, n).astype(np.int32), rng.integers(0, 60, n).astype(np.int32),
+                     rng.integers(0, 2, n).astype(np.int8), rng.integers(0, 2, n).astype(np.int8), np.arange(6))
+    sweep = match_counts_by_window(ev, range(0, 8), "optimal")
+    for (did, kind, w), row in sweep.set_index(["dialogue_id", "kind", "window"]).iterrows():
+        sel = (ev.dialogue == did) & (ev.kind == (0 if kind == "peak" else 1))
+        a, b = np.sort(ev.turn[sel & (ev.speaker == 0)]).tolist(), np.sort(ev.turn[sel & (ev.speaker == 1)]).tolist()
+        i = j = hits = 0
+        while i < len(a) and j < len(b):
+            if b[j] < a[i] - w:
+                j += 1
+            elif b[j] > a[i] + w:
+                i += 1
+            else:
+                hits += 1; i += 1; j += 1
+        assert row.tp_ref == row.tp_sys == hits
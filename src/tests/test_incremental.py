@@ -0,0 +1,22 @@
+import numpy as np
+import pandas as pd
+from tie_dialog.incremental import DialogueStore, dialogue_fingerprints
+
+def test_store_recomputes_only_changed_dialogues(tmp_path):
+    df = pd.DataFrame(dict(dialogue_id=["a","a","b","b"], turn=[1,2,1,2], human_ct=[0.1,0.2,0.3,0.4], model_ct=0.5))
+    fp = dialogue_fingerprints(df, ["dialogue_id","turn","human_ct","model_ct"])
+    store = DialogueStore(str(tmp_path), "x")
+    assert store.stale(fp).all()
+    store.update(fp, store.stale(fp), df.groupby("dialogue_id", as_index=False)["human_ct"].sum())
+    # "b" changes, "c" is new, "a" keeps its fingerprint even though the id categories change
+    df2 = pd.concat([df, pd.DataFrame(dict(dialogue_id=["c"], turn=[1], human_ct=[1.0], model_ct=0.5))], ignore_index=True)
+    df2.loc[3, "human_ct"] = 0.9
+    df2["dialogue_id"] = df2["dialogue_id"].astype("category")
+    fp2 = dialogue_fingerprints(df2, ["dialogue_id","turn","human_ct","model_ct"])
+    store = DialogueStore(str(tmp_path), "x")
+    stale = store.stale(fp2)
+    assert stale.tolist() == [False, True, True]
+    fresh = df2[df2["dialogue_id"].isin(fp2.index[stale])].groupby("dialogue_id", as_index=False, observed=True)["human_ct"].sum()
+    table = store.update(fp2, stale, fresh)
+    assert table["dialogue_id"].tolist() == ["a","b","c"]
+    assert np.allclose(table["human_ct"], [0.3, 1.2, 1.0])
@@ -0,0 +1,32 @@
+import json
+import numpy as np
+from tie_dialog.instrument import Instrument
+
+def test_nested_stages_counts_and_memory(tmp_path):
+    inst = Instrument(trace_memory=True, profile_dir=str(tmp_path / "profile"))
+    with inst.stage("outer") as outer:
+        outer.count(rows=10)
+        with inst.stage("inner"):
+            x = np.ones(1 << 20)   # 8 MB, freed before the outer stage ends
+            inst.count(events=3)
+            inst.count(events=2)
+            del x
+    inner, outer = inst.records[1], inst.records[0]
+    assert inner.parent == "outer" and outer.parent is None
+    assert inner.counts == {"events": 5} and outer.counts == {"rows": 10}
+    assert inner.traced_peak_mb >= 8 and outer.traced_peak_mb >= 8
+    assert abs(outer.traced_mb) < 1
+    assert outer.seconds >= inner.seconds
+    assert (tmp_path / "profile" / "outer.prof").exists() and not (tmp_path / "profile" / "inner.prof").exists()
+
+    path = inst.write(str(tmp_path / "run_metrics.json"), status="ok")
+    doc = json.load(open(path))
+    assert doc["status"] == "ok" and [s["name"] for s in doc["stages"]] == ["outer", "inner"]
+
+def test_disabled_instrument_is_a_no_op(tmp_path):
+    inst = Instrument(enabled=False)
+    with inst.stage("load") as st:
+        st.count(rows=1)
+    assert inst.records == []
+    assert inst.write(str(tmp_path / "run_metrics.json")) is None
+    assert not (tmp_path / "run_metrics.json").exists()
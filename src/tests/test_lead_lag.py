@@ -0,0 +1,29 @@
+import numpy as np
+import pandas as pd
+from tie_dialog.lead_lag import cross_correlation, lead_lag, lead_lag_summary
+from tie_dialog.preprocessing import dialogue_offsets
+
+def test_cross_correlation_matches_direct_sum():
+    rng = np.random.default_rng(0)
+    lens = np.array([1, 2, 5, 17, 40])
+    h, m = rng.normal(size=lens.sum()), rng.normal(size=lens.sum())
+    offsets = dialogue_offsets(pd.Series(np.repeat(np.arange(5), lens)))
+    R = cross_correlation(h, m, offsets, max_lag=None)
+    K = lens.max() - 1
+    for d, n in enumerate(lens):
+        x, y = h[offsets[d]:offsets[d + 1]], m[offsets[d]:offsets[d + 1]]
+        x, y = x - x.mean(), y - y.mean()
+        for k in range(-K, K + 1):
+            want = np.nan if abs(k) >= n or n == 1 else sum(x[t] * y[t + k] for t in range(max(0, -k), min(n, n - k))) / np.sqrt((x @ x) * (y @ y))
+            assert np.isclose(R[d, K + k], want, equal_nan=True)
+
+def test_lead_lag_sign_and_refinement():
+    t = np.arange(120)
+    human = np.sin(t / 5.0)
+    rows = [pd.DataFrame(dict(dialogue_id=d, turn=t, human_ct=human, model_ct=np.roll(human, shift))) for d, shift in enumerate([2, -1, 0])]
+    ll = lead_lag(pd.concat(rows, ignore_index=True), max_lag=3)
+    assert ll["lag"].tolist() == [2, -1, 0]
+    # the biased normalization pulls the parabola slightly towards lag 0
+    assert np.allclose(ll["lag_refined"], [2, -1, 0], atol=0.3)
+    summary = lead_lag_summary(ll, n_boot=200)
+    assert summary.set_index("statistic").loc["lag", "mean"] == np.mean([2, -1, 0])
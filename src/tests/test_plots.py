@@ -0,0 +1,12 @@
+import os, time
+import pandas as pd
+from tie_dialog.plots import render_overlays
+
+def test_render_overlays_skips_up_to_date(tmp_path):
+    df = pd.DataFrame(dict(dialogue_id=[1,1,2,2], turn=[1,2,1,2], human_ct=[0.1,0.2,0.3,0.4], model_ct=[0.2,0.1,0.4,0.3]))
+    paths = render_overlays(df, str(tmp_path), figsize=(4,2), dpi=50)
+    assert [os.path.basename(p) for p in paths] == ["ct_overlay_d1.png", "ct_overlay_d2.png"]
+    stamp = os.path.getmtime(paths[0])
+    os.remove(paths[1])
+    assert render_overlays(df, str(tmp_path), figsize=(4,2), dpi=50, skip_newer_than=time.time() - 60) == paths
+    assert os.path.exists(paths[1]) and os.path.getmtime(paths[0]) == stamp
@@ -0,0 +1,28 @@
+
+import numpy as np
+import pandas as pd
+from tie_dialog.corpus import dialogue_offsets
+from tie_dialog.preprocessing import ewma, smooth_series
+
+def test_smooth_series_matches_grouped_rolling():
+    rng = np.random.default_rng(0)
+    df = pd.DataFrame(dict(dialogue_id=[1]*5+[2]*3, turn=[1,2,3,4,5,1,2,3], human_ct=rng.random(8), model_ct=rng.random(8)))
+    got = smooth_series(df, window=3)
+    ref = df.groupby("dialogue_id")["human_ct"].transform(lambda s: s.rolling(3, min_periods=1).mean())
+    assert np.allclose(got["human_ct"], ref, atol=1e-6)
+    ref = df.groupby("dialogue_id")["model_ct"].transform(lambda s: s.ewm(span=3, adjust=False).mean())
+    assert np.allclose(smooth_series(df, window=3, method="ewma")["model_ct"], ref, atol=1e-6)
+
+def test_ewma_nans_stay_in_their_dialogue():
+    rng = np.random.default_rng(1)
+    lengths = rng.integers(1, 30, 200)
+    df = pd.DataFrame(dict(dialogue_id=np.repeat(np.arange(200), lengths), human_ct=rng.random(lengths.sum())))
+    x = df["human_ct"].to_numpy().copy()
+    x[rng.choice(len(x), 40, replace=False)] = np.nan
+    x[:3] = np.nan                      # leading NaNs of the first dialogue
+    df["human_ct"] = x
+    offsets = dialogue_offsets(df["dialogue_id"])
+    for adjust in (False, True):
+        ref = df.groupby("dialogue_id")["human_ct"].transform(lambda s: s.ewm(span=4, adjust=adjust).mean())
+        got = ewma(x, offsets, 4, adjust=adjust)
+        assert np.array_equal(np.isnan(got), ref.isna()) and np.allclose(got, ref, atol=1e-6, equal_nan=True)
@@ -0,0 +1,13 @@
+import re
+import pandas as pd
+from tie_dialog.plots import render_overlays
+from tie_dialog.report import build_pdf
+
+def test_build_pdf_tables_and_grid(tmp_path):
+    df = pd.DataFrame(dict(dialogue_id=[1,1,2,2,3,3], turn=[1,2]*3, human_ct=0.5, model_ct=0.4))
+    paths = render_overlays(df, str(tmp_path), figsize=(4,2), dpi=50)
+    pd.DataFrame(dict(window=[1,2], f1=[0.5,0.75])).to_csv(tmp_path / "f1.csv", index=False)
+    out = build_pdf(paths, {"F1": str(tmp_path / "f1.csv"), "missing": str(tmp_path / "none.csv")}, str(tmp_path / "r.pdf"), grid=(2,1))
+    data = open(out, "rb").read()
+    # title page, one table page, two overlay pages
+    assert data.startswith(b"%PDF") and len(re.findall(rb"/Type /Page\b", data)) == 4
@@ -0,0 +1,54 @@
+import numpy as np
+from tie_dialog.corpus import DialogueCorpus
+from tie_dialog.sbr import B, R, S, run_lengths, sbr_by_dialogue, sbr_states, sbr_summary, segmented_percentile, transition_counts
+from tie_dialog.synthetic import synthetic_corpus
+
+def _loop_states(x, lo, hi, h):
+    out, st = [], None
+    for v in x:
+        if st is None:
+            st = B if v < lo else S
+        elif v < lo:
+            st = B
+        elif v >= hi:
+            st = S
+        elif st == B and v >= lo + h:
+            st = R
+        out.append(st)
+    return out
+
+def test_percentiles_and_states_match_per_dialogue_reference():
+    rng = np.random.default_rng(0)
+    lens = rng.integers(0, 40, size=300)
+    offsets = np.concatenate(([0], np.cumsum(lens)))
+    x = rng.random(offsets[-1]).astype(np.float32)
+    x[rng.random(len(x)) < 0.03] = np.nan
+    P = segmented_percentile(x, offsets, [25, 75])
+    for i, (a, b) in enumerate(zip(offsets[:-1], offsets[1:])):
+        if np.isfinite(x[a:b]).any():
+            assert np.array_equal(P[i], np.nanpercentile(x[a:b].astype(np.float64), [25, 75]))
+        else:
+            assert np.isnan(P[i]).all()
+    for h in (0.0, 0.1):
+        states = sbr_states(x, offsets, P[:, 0], P[:, 1], h)
+        for i, (a, b) in enumerate(zip(offsets[:-1], offsets[1:])):
+            assert list(states[a:b]) == _loop_states(x[a:b], P[i, 0], P[i, 1], h)
+
+def test_run_lengths_and_transitions():
+    states = np.array([S, S, B, B, R, S, B, R, R, S], dtype=np.int8)
+    offsets = np.array([0, 6, 10])
+    d, s, start, length = run_lengths(states, offsets)
+    assert d.tolist() == [0, 0, 0, 0, 1, 1, 1] and s.tolist() == [S, B, R, S, B, R, S]
+    assert start.tolist() == [0, 2, 4, 5, 0, 1, 3] and length.tolist() == [2, 2, 1, 1, 1, 2, 1]
+    T = transition_counts(states, offsets)
+    assert T[0, R, S] == 1 and T[1, R, S] == 1 and T.sum() == 8
+
+def test_sbr_tables():
+    ct, _ = synthetic_corpus(30, seed=3)
+    table = sbr_by_dialogue(DialogueCorpus.from_frame(ct), mode="fixed", phi_low=0.7, phi_high=0.8, hysteresis=0.01)
+    assert len(table) == 60 and list(table["speaker"][:2]) == ["human", "machine"]
+    assert np.allclose(table[["frac_S", "frac_B", "frac_R"]].sum(axis=1), 1)
+    assert (table[[c for c in table.columns if c.startswith("n_") and len(c) == 4]].sum(axis=1) == table["n_turns"] - 1).all()
+    summary = sbr_summary(table)
+    assert len(summary) == 6 and np.allclose(summary.groupby("speaker")["frac"].sum(), 1)
+    assert (summary.loc[summary["state"] == "S", "p_to_R"] == 0).all()
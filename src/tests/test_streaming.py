@@ -0,0 +1,44 @@
+import numpy as np
+import pandas as pd
+import pytest
+from tie_dialog.events import KINDS, SPEAKERS, detect_event_arrays
+from tie_dialog.preprocessing import smooth_series
+from tie_dialog.streaming import StreamingAnalyzer
+
+# quantized curves put equally high peaks within min_distance, where the later one must win as in find_peaks
+@pytest.mark.parametrize("step", [None, 0.1])
+def test_streaming_matches_batch_detection(step):
+    rng = np.random.default_rng(0)
+    lens = rng.integers(1, 60, size=30)
+    curves = rng.random((2, lens.sum()))
+    if step:
+        curves = np.round(curves / step) * step
+    df = pd.DataFrame(dict(dialogue_id=np.repeat(np.arange(30), lens), turn=np.concatenate([np.arange(n) for n in lens]),
+                           human_ct=curves[0], model_ct=curves[1]))
+    ev = detect_event_arrays(smooth_series(df, window=3), prominence=0.1, min_distance=3)
+    batch = set(zip(ev.dialogue_ids[ev.dialogue], ev.turn, [KINDS[k] for k in ev.kind], [SPEAKERS[s] for s in ev.speaker]))
+    sa = StreamingAnalyzer(window=3, prominence=0.1, min_distance=3, lookahead=10**6)
+    out = []
+    # interleave dialogues turn by turn, as live traffic would arrive
+    for r in df.sort_values(["turn","dialogue_id"]).itertuples():
+        out += sa.push(r.dialogue_id, r.turn, r.human_ct, r.model_ct)
+    out += sa.close_all()
+    assert {(e.dialogue_id, e.turn, e.kind, e.speaker) for e in out} == batch
+    assert sa.active_dialogues == 0
+
+def test_equal_peaks_keep_the_later_one():
+    # find_peaks(x, distance=3, prominence=1) -> [3, 9]: the plateau at 2-4, then 9 over 7
+    x = [1, 1, 3, 3, 3, 1, 2, 3, 2, 3, 2]
+    df = pd.DataFrame(dict(dialogue_id=0, turn=np.arange(len(x)), human_ct=x, model_ct=x))
+    ev = detect_event_arrays(df, prominence=1, min_distance=3)
+    assert ev.turn[(ev.kind == 0) & (ev.speaker == 0)].tolist() == [3, 9]
+    sa = StreamingAnalyzer(window=1, prominence=1, min_distance=3)
+    out = [e for t, v in enumerate(x) for e in sa.push(0, t, v, v)] + sa.close_all()
+    assert sorted(e.turn for e in out if e.kind == "peak" and e.speaker == "human") == [3, 9]
+
+def test_fire_level_is_the_exact_crossing():
+    import math
+    from tie_dialog.streaming import _fire_level
+    for value, threshold in ((0.3, 0.3), (0.5, 0.2), (-3.0, 0.08), (0.08, 0.08), (0.0, 0.0)):
+        level = _fire_level(value, threshold)
+        assert value - level >= threshold > value - math.nextafter(level, math.inf)
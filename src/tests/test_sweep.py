@@ -0,0 +1,27 @@
+import pytest
+import numpy as np
+import pandas as pd
+from tie_dialog.agreement import kappa_by_window, kappa_summary
+from tie_dialog.events import detect_event_arrays, f1_summary, match_counts_by_window
+from tie_dialog.preprocessing import smooth_series
+from tie_dialog.sweep import threshold_sweep
+
+@pytest.mark.parametrize("step", [None, 0.1])
+def test_sweep_matches_detect_and_score(step):
+    rng = np.random.default_rng(0)
+    lens = rng.integers(5, 60, size=30)
+    ct = pd.DataFrame(dict(dialogue_id=np.repeat(np.arange(30), lens), turn=np.concatenate([np.arange(n) for n in lens]),
+                           human_ct=np.cumsum(rng.normal(0, .05, lens.sum())), model_ct=np.cumsum(rng.normal(0, .05, lens.sum()))))
+    if step:
+        # quantized C_t: many equally high maxima closer than min_distance
+        ct[["human_ct","model_ct"]] = np.round(rng.random((len(ct), 2)) / step) * step
+    surface = threshold_sweep(ct, [1, 3], [0.02, 0.08], [2, 4], [0.05], windows=[0, 2])
+    assert len(surface) == 2 * 2 * 2 * 1 * 2 * 3
+    smoothed = smooth_series(ct, window=3)
+    ev = detect_event_arrays(smoothed, prominence=0.08, min_distance=4, valley_prominence=0.05)
+    ref = f1_summary(match_counts_by_window(ev, [0, 2])).merge(kappa_summary(kappa_by_window(ev, smoothed, [0, 2])), on=["window","kind"], suffixes=("", "_k"))
+    got = surface[(surface.smooth_window == 3) & (surface.min_distance == 4) & (surface.peak_prominence == 0.08)]
+    both = ref.merge(got, on=["window","kind"], suffixes=("", "_sweep"))
+    assert len(both) == 6
+    for c in ("f1", "f1_micro", "kappa", "kappa_pooled"):
+        assert np.allclose(both[c], both[c + "_sweep"], equal_nan=True)
@@ -0,0 +1,23 @@
+import numpy as np
+import pandas as pd
+from tie_dialog.data_loading import load_ct_series, load_events
+from tie_dialog.events import EventArrays, detect_event_arrays, match_counts_by_window, f1_summary
+from tie_dialog.synthetic import SyntheticSpec, synthetic_corpus, write_synthetic
+
+def test_synthetic_corpus_is_deterministic_and_planted():
+    ct, ev = synthetic_corpus(300, seed=3)
+    ct2, ev2 = synthetic_corpus(300, seed=3)
+    pd.testing.assert_frame_equal(ct, ct2)
+    pd.testing.assert_frame_equal(ev, ev2)
+    assert (ct[["dialogue_id","turn"]].to_numpy() == ev[["dialogue_id","turn"]].to_numpy()).all()
+    assert ct.groupby("dialogue_id").size().between(18, 40).all()
+    assert abs((ct.model_ct - ct.human_ct).mean() + 0.12) < 0.01
+    # planted events show up in the curves: detected human/model events agree about as well as the planted ones
+    f1 = lambda e: f1_summary(match_counts_by_window(e, [2])).set_index("kind").loc["all", "f1_micro"]
+    assert 0.6 < f1(detect_event_arrays(ct)) <= f1(EventArrays.from_frame(ev)) + 0.1
+
+def test_write_synthetic_chunks(tmp_path):
+    ct_path, ev_path = write_synthetic(str(tmp_path), 250, seed=1, spec=SyntheticSpec(turns=(10, 12)), chunk_dialogues=100)
+    ct, ev = load_ct_series(ct_path), load_events(ev_path)
+    assert ct["dialogue_id"].nunique() == 250 and len(ct) == len(ev)
+    assert np.array_equal(ct["dialogue_id"].unique(), np.arange(250))
@@ -0,0 +1,163 @@
+
+# Agreement statistics from aligned integer label arrays: Cohen's κ per kind/window/dialogue
+# and Fleiss/Light κ for N raters, all from confusion counts built with bincount.
+import numpy as np
+import pandas as pd
+from tie_dialog.events import KINDS, EventArrays
+from tie_dialog.corpus import DialogueCorpus, dialogue_offsets
+
+CONFUSION_COLUMNS = ["n00","n01","n10","n11"]   # n<ref><sys> for binary labels
+
+def confusion_counts(y_ref, y_sys, groups=None, n_groups=None, n_labels=2) -> np.ndarray:
+    """(n_groups, n_labels, n_labels) counts of (ref, sys) label pairs per group."""
+    y_ref = np.asarray(y_ref, dtype=np.int64)
+    y_sys = np.asarray(y_sys, dtype=np.int64)
+    if groups is None:
+        groups, n_groups = np.zeros(len(y_ref), dtype=np.int64), 1
+    elif n_groups is None:
+        n_groups = int(np.max(groups, initial=-1)) + 1
+    L = n_labels
+    flat = (np.asarray(groups, dtype=np.int64) * L + y_ref) * L + y_sys
+    return np.bincount(flat, minlength=n_groups * L * L).reshape(n_groups, L, L)
+
+def kappa_from_confusion(C) -> np.ndarray:
+    """Cohen's κ over the last two axes of confusion counts; NaN where chance agreement is 1 (as sklearn)."""
+    C = np.asarray(C, dtype=np.float64)
+    n = C.sum(axis=(-2, -1))
+    with np.errstate(invalid="ignore", divide="ignore"):
+        po = np.trace(C, axis1=-2, axis2=-1) / n
+        pe = np.einsum("...i,...i->...", C.sum(axis=-1), C.sum(axis=-2)) / n ** 2
+        return (po - pe) / (1 - pe)
+
+def cohen_kappa_labels(y_ref, y_sys) -> float:
+    y_ref, y_sys = np.asarray(y_ref), np.asarray(y_sys)
+    labels, inv = np.unique(np.concatenate((y_ref, y_sys)), return_inverse=True)
+    n_labels = max(len(labels), 1)
+    return float(kappa_from_confusion(confusion_counts(inv[:len(y_ref)], inv[len(y_ref):], n_labels=n_labels))[0])
+
+def _row_bounds(offsets):
+    """Start and end offset of the dialogue of every row."""
+    lengths = np.diff(offsets)
+    return np.repeat(offsets[:-1], lengths), np.repeat(offsets[1:], lengths)
+
+def _prefix(x):
+    cs = np.zeros(len(x) + 1, dtype=np.int64)
+    np.cumsum(x, out=cs[1:])
+    return cs
+
+def _dilated(cs, bounds, w):
+    starts, ends = bounds
+    idx = np.arange(len(starts))
+    return cs[np.minimum(idx + w + 1, ends)] - cs[np.maximum(idx - w, starts)] > 0
+
+def dilate(x, offsets, w, bounds=None) -> np.ndarray:
+    """True where a nonzero entry of x lies within ±w rows of the same dialogue segment."""
+    x = np.asarray(x) > 0
+    if w <= 0:
+        return x
+    return _dilated(_prefix(x), _row_bounds(offsets) if bounds is None else bounds, w)
+
+def tolerant_labels(ref, sys, offsets, w, bounds=None) -> np.ndarray:
+    """System labels with ±w tolerance: a reference event counts as hit when a system event is within w,
+    and a system event within w of a reference event is not a false positive (w = 0 gives `sys`)."""
+    ref, sys = np.asarray(ref) > 0, np.asarray(sys) > 0
+    if w <= 0:
+        return sys
+    bounds = _row_bounds(offsets) if bounds is None else bounds
+    return _tolerant(ref, sys, _prefix(ref), _prefix(sys), bounds, w)
+
+def _tolerant(ref, sys, cs_ref, cs_sys, bounds, w):
+    # tolerant_labels from precomputed prefix sums, reused across windows
+    if w <= 0:
+        return sys
+    return (ref & _dilated(cs_sys, bounds, w)) | (sys & ~_dilated(cs_ref, bounds, w))
+
+def kappa_by_window(ev: EventArrays, grid: pd.DataFrame, windows) -> pd.DataFrame:
+    """Human (reference) vs machine (system) κ per window, dialogue and kind over the turns of `grid`.
+
+    Returns the binary confusion counts alongside κ, so tables can be pooled by
+    summing counts (see kappa_summary). `grid` is a frame or a DialogueCorpus.
+    """
+    if isinstance(grid, DialogueCorpus):
+        offsets = grid.offsets
+        grid = pd.DataFrame(dict(dialogue_id=grid.dialogue_ids.take(grid.dialogue_rows()), turn=grid.turn))
+    else:
+        grid = grid[["dialogue_id","turn"]].reset_index(drop=True)
+        offsets = dialogue_offsets(grid["dialogue_id"])
+    n_d = len(offsets) - 1
+    dense = ev.to_frame(grid)
+    dialogue = np.repeat(np.arange(n_d, dtype=np.int64), np.diff(offsets))
+    windows = [int(w) for w in windows]
+    bounds = _row_bounds(offsets)
+    parts = []
+    for k, kind in enumerate(KINDS):
+        ref = dense[f"human_{kind}"].to_numpy() > 0
+        sys = dense[f"machine_{kind}"].to_numpy() > 0
+        cs_ref, cs_sys = _prefix(ref), _prefix(sys)
+        C = np.stack([confusion_counts(ref, _tolerant(ref, sys, cs_ref, cs_sys, bounds, w), dialogue, n_d) for w in windows])
+        parts.append(pd.DataFrame({
+            "window": np.repeat(windows, n_d),
+            "dialogue_id": np.tile(grid["dialogue_id"].to_numpy()[offsets[:-1]], len(windows)),
+            "kind": kind,
+            **dict(zip(CONFUSION_COLUMNS, C.reshape(-1, 4).T)),
+            "kappa": kappa_from_confusion(C).reshape(-1),
+        }))
+    out = pd.concat(parts, ignore_index=True)
+    return out.sort_values(["window","dialogue_id","kind"], kind="stable").reset_index(drop=True)
+
+def kappa_summary(table: pd.DataFrame) -> pd.DataFrame:
+    """Macro κ (mean over dialogues with defined κ) and pooled κ (summed confusion counts) per window and kind.
+
+    kind "all" pools both kinds per dialogue.
+    """
+    both = pd.concat([table, table.assign(kind="all")], ignore_index=True)
+    per = both.groupby(["window","kind","dialogue_id"], sort=True, observed=True)[CONFUSION_COLUMNS].sum()
+    g = per.groupby(level=["window","kind"])
+    pooled = g.sum()
+    out = pd.DataFrame({"n_dialogues": g.size()})
+    out["kappa"] = pd.Series(kappa_from_confusion(per.to_numpy().reshape(-1, 2, 2)), index=per.index).groupby(level=["window","kind"]).mean()
+    out["kappa_pooled"] = kappa_from_confusion(pooled.to_numpy().reshape(-1, 2, 2))
+    return out.join(pooled).reset_index()
+
+def _one_hot_gram(Y, n_labels, chunk_rows=1 << 18):
+    """(R, L, R, L) counts of items where rater a says l and rater b says m; -1 marks a missing label."""
+    n, R = Y.shape
+    G = np.zeros((R * n_labels, R * n_labels), dtype=np.float64)
+    cols = np.arange(R) * n_labels
+    for a in range(0, n, chunk_rows):
+        y = Y[a:a + chunk_rows]
+        O = np.zeros((len(y), R * n_labels), dtype=np.float32)
+        r, c = np.nonzero(y >= 0)
+        O[r, cols[c] + y[r, c]] = 1
+        G += O.T.astype(np.float64) @ O
+    return G.reshape(R, n_labels, R, n_labels)
+
+def pairwise_kappa(Y, n_labels=None) -> np.ndarray:
+    """(R, R) Cohen's κ between every pair of raters of the label matrix Y (items × raters, -1 = missing)."""
+    Y = np.asarray(Y, dtype=np.int64)
+    n_labels = n_labels or int(Y.max(initial=0)) + 1
+    G = _one_hot_gram(Y, n_labels)
+    return kappa_from_confusion(G.transpose(0, 2, 1, 3))
+
+def light_kappa(Y, n_labels=None) -> float:
+    """Light's κ: mean pairwise Cohen's κ over all rater pairs."""
+    K = pairwise_kappa(Y, n_labels)
+    iu = np.triu_indices(len(K), 1)
+    return float(np.nanmean(K[iu])) if len(iu[0]) else np.nan
+
+def fleiss_kappa(Y, n_labels=None) -> float:
+    """Fleiss' κ for the label matrix Y (items × raters, -1 = missing); items need at least two labels."""
+    Y = np.asarray(Y, dtype=np.int64)
+    n_labels = n_labels or int(Y.max(initial=0)) + 1
+    items, raters = np.nonzero(Y >= 0)
+    counts = np.bincount(items * n_labels + Y[items, raters], minlength=len(Y) * n_labels).reshape(len(Y), n_labels)
+    n_i = counts.sum(axis=1)
+    ok = n_i >= 2
+    counts, n_i = counts[ok], n_i[ok]
+    if not len(n_i):
+        return np.nan
+    P_i = ((counts ** 2).sum(axis=1) - n_i) / (n_i * (n_i - 1))
+    p_j = counts.sum(axis=0) / n_i.sum()
+    P_e = (p_j ** 2).sum()
+    with np.errstate(invalid="ignore", divide="ignore"):
+        return float((P_i.mean() - P_e) / (1 - P_e))
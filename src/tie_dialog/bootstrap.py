@@ -0,0 +1,101 @@
+
+# Dialogue-level bootstrap on per-dialogue sufficient statistics: every resample is a
+# weight vector over dialogues, so each statistic is a function of weighted column sums.
+from concurrent.futures import ProcessPoolExecutor
+import numpy as np
+import pandas as pd
+from tie_dialog.agreement import CONFUSION_COLUMNS, kappa_from_confusion
+from tie_dialog.corpus import resolve_jobs
+from tie_dialog.events import _prf, dialogue_f1
+
+COUNT_SUMS = ["tp_sys","n_sys","tp_ref","n_ref"]
+
+def _chunk_sums(X, rows, seed):
+    # resample weights as counts of drawn dialogue indices, one row per resample
+    rng = np.random.default_rng(seed)
+    n = len(X)
+    idx = rng.integers(0, n, size=(rows, n)) + (np.arange(rows, dtype=np.int64) * n)[:, None]
+    W = np.bincount(idx.ravel(), minlength=rows * n).reshape(rows, n).astype(np.float64)
+    return W @ X
+
+def resampled_sums(X, n_boot=10000, seed=0, jobs=1, max_cells=1 << 23) -> np.ndarray:
+    """(n_boot, K) weighted column sums of X (dialogues × K) over bootstrap resamples of its rows.
+
+    Resamples are drawn in chunks of at most `max_cells` weights, each from its own
+    child of SeedSequence(seed), so results do not depend on `jobs`.
+    """
+    X = np.asarray(X, dtype=np.float64)
+    if len(X) == 0 or n_boot <= 0:
+        return np.full((max(n_boot, 0), X.shape[1]), np.nan)
+    rows = max(1, min(n_boot, max_cells // len(X)))
+    sizes = [min(rows, n_boot - a) for a in range(0, n_boot, rows)]
+    seeds = np.random.SeedSequence(seed).spawn(len(sizes))
+    jobs = min(resolve_jobs(jobs), len(sizes))
+    if jobs == 1:
+        parts = [_chunk_sums(X, r, s) for r, s in zip(sizes, seeds)]
+    else:
+        with ProcessPoolExecutor(max_workers=jobs) as ex:
+            parts = list(ex.map(_chunk_sums, [X] * len(sizes), sizes, seeds))
+    return np.concatenate(parts)
+
+def _interval(samples, alpha):
+    if len(samples) == 0:
+        return (np.full(samples.shape[1:], np.nan),) * 2
+    with np.errstate(invalid="ignore"):
+        lo, hi = np.nanpercentile(samples, [100 * alpha / 2, 100 * (1 - alpha / 2)], axis=0)
+    return lo, hi
+
+def _dense(per: pd.DataFrame, keys, columns):
+    """(groups, dialogues × groups × columns values, presence) from long per-dialogue rows."""
+    g_codes, groups = pd.MultiIndex.from_frame(per[keys]).factorize()
+    d_codes, _ = pd.factorize(per["dialogue_id"])
+    n_d, n_g = d_codes.max(initial=-1) + 1, len(groups)
+    vals = np.zeros((n_d, n_g, len(columns)))
+    present = np.zeros((n_d, n_g))
+    vals[d_codes, g_codes] = per[columns].to_numpy(dtype=np.float64)
+    present[d_codes, g_codes] = 1
+    return groups, vals, present
+
+def _macro_and_pooled(per, keys, value, sums, pooled_fn, names, n_boot, seed, alpha, jobs):
+    groups, vals, present = _dense(per, keys, [value] + sums)
+    n_g = len(groups)
+    ok = present * np.isfinite(vals[:, :, 0])
+    X = np.concatenate([np.nan_to_num(vals[:, :, 0]) * ok, ok, vals[:, :, 1:].reshape(len(vals), -1)], axis=1)
+    S = resampled_sums(X, n_boot, seed, jobs)
+    with np.errstate(invalid="ignore", divide="ignore"):
+        macro = S[:, :n_g] / S[:, n_g:2 * n_g]
+    pooled = pooled_fn(S[:, 2 * n_g:].reshape(len(S), n_g, len(sums)))
+    out = groups.to_frame(index=False)
+    out.columns = keys
+    for name, samples in zip(names, (macro, pooled)):
+        out[name + "_ci_low"], out[name + "_ci_high"] = _interval(samples, alpha)
+    return out
+
+def f1_intervals(counts: pd.DataFrame, n_boot=10000, seed=0, alpha=0.05, jobs=1) -> pd.DataFrame:
+    """Bootstrap CIs of macro and micro F1 per window and kind (as in events.f1_summary), resampling dialogues."""
+    keys = ["window"] if "window" in counts.columns else []
+    cols = ["n_ref","n_sys","tp_ref","tp_sys"]
+    pooled = counts.groupby(keys + ["dialogue_id"], sort=False, observed=True)[cols].sum().reset_index().assign(kind="all")
+    per = dialogue_f1(pd.concat([counts[keys + ["dialogue_id","kind"] + cols], pooled], ignore_index=True))
+    micro = lambda S: _prf(S[..., 0], S[..., 1], S[..., 2], S[..., 3])[2]
+    return _macro_and_pooled(per, keys + ["kind"], "f1", COUNT_SUMS, micro, ("f1","f1_micro"), n_boot, seed, alpha, jobs)
+
+def kappa_intervals(table: pd.DataFrame, n_boot=10000, seed=0, alpha=0.05, jobs=1) -> pd.DataFrame:
+    """Bootstrap CIs of macro and pooled κ per window and kind (as in agreement.kappa_summary)."""
+    both = pd.concat([table, table.assign(kind="all")], ignore_index=True)
+    per = both.groupby(["window","kind","dialogue_id"], sort=False, observed=True)[CONFUSION_COLUMNS].sum().reset_index()
+    per["kappa"] = kappa_from_confusion(per[CONFUSION_COLUMNS].to_numpy().reshape(-1, 2, 2))
+    pooled = lambda S: kappa_from_confusion(S.reshape(*S.shape[:-1], 2, 2))
+    return _macro_and_pooled(per, ["window","kind"], "kappa", CONFUSION_COLUMNS, pooled, ("kappa","kappa_pooled"), n_boot, seed, alpha, jobs)
+
+def mean_intervals(df: pd.DataFrame, columns, n_boot=10000, seed=0, alpha=0.05, jobs=1) -> pd.DataFrame:
+    """Corpus mean (NaN-skipping) of per-dialogue columns with bootstrap CIs; one row per column."""
+    vals = df[list(columns)].to_numpy(dtype=np.float64)
+    ok = np.isfinite(vals).astype(np.float64)
+    S = resampled_sums(np.concatenate([np.nan_to_num(vals) * ok, ok], axis=1), n_boot, seed, jobs)
+    k = len(columns)
+    with np.errstate(invalid="ignore", divide="ignore"):
+        means = S[:, :k] / S[:, k:]
+        point = np.nansum(vals, axis=0) / ok.sum(axis=0)
+    lo, hi = _interval(means, alpha)
+    return pd.DataFrame(dict(statistic=list(columns), n_dialogues=ok.sum(axis=0).astype(np.int64), mean=point, ci_low=lo, ci_high=hi))
@@ -0,0 +1,56 @@
+
+# Append-only CSV outputs for the chunked (out-of-core) pipeline: per-dialogue rows are
+# written as each chunk finishes and the file only appears under its name once complete.
+import os, shutil
+import pandas as pd
+
+class AppendCSV:
+    """Rows appended chunk by chunk; identical bytes to one to_csv of the concatenated frames."""
+    def __init__(self, path: str):
+        self.path, self.tmp = path, path + ".tmp"
+        self.rows, self._header = 0, True
+        open(self.tmp, "w").close()
+
+    def append(self, df: pd.DataFrame):
+        df.to_csv(self.tmp, mode="a", header=self._header, index=False)
+        self._header = False
+        self.rows += len(df)
+
+    def close(self, columns=None) -> str:
+        if self._header and columns is not None:
+            pd.DataFrame(columns=columns).to_csv(self.tmp, index=False)
+        os.replace(self.tmp, self.path)
+        return self.path
+
+class WindowMajorCSV:
+    """Per-window part files stitched in window order: the window-major sort of the in-memory tables.
+
+    Chunks hold consecutive dialogues, so appending each chunk's rows of window w to
+    part w and concatenating the parts gives rows sorted by (window, dialogue_id).
+    """
+    def __init__(self, path: str, windows):
+        self.path = path
+        self.parts = {w: AppendCSV(f"{path}.w{w}") for w in sorted({int(w) for w in windows})}
+        self.rows, self.columns = 0, None
+
+    def append(self, df: pd.DataFrame):
+        self.columns = list(df.columns)
+        for w, part in df.groupby("window", sort=False):
+            self.parts[int(w)].append(part)
+        self.rows += len(df)
+
+    def close(self) -> str:
+        tmp = self.path + ".tmp"
+        with open(tmp, "wb") as out:
+            header = True
+            for part in self.parts.values():
+                with open(part.tmp, "rb") as f:
+                    if not header:
+                        f.readline()
+                    shutil.copyfileobj(f, out)
+                header = header and part.rows == 0
+                os.remove(part.tmp)
+        if header and self.columns is not None:
+            pd.DataFrame(columns=self.columns).to_csv(tmp, index=False)
+        os.replace(tmp, self.path)
+        return self.path
@@ -0,0 +1,70 @@
+
+# `tie-dialog` entry point. Only argparse and the config loader are imported up front;
+# tie_dialog.pipeline (pandas) and each stage's dependencies load once a subcommand runs.
+import argparse, sys
+from tie_dialog import __version__
+
+COMMANDS = {
+    "metrics": "F1, kappa, DTW, lead–lag and S–B–R tables",
+    "figures": "per-dialogue overlays and the lead–lag figure",
+    "report": "PDF report from the existing figures and tables",
+    "sweep": "F1 surface over the smoothing/detection threshold grid",
+    "all": "metrics, figures and report",
+    "stream": "turn-by-turn event detection over a C_t CSV (or stdin)",
+}
+
+def add_run_options(ap):
+    ap.add_argument("--config", required=True)
+    ap.add_argument("--jobs", type=int, default=1, help="stage nodes run at once, in threads and worker processes (0 = all cores)")
+    ap.add_argument("--force", action="store_true", help="recompute every dialogue instead of only changed ones")
+    ap.add_argument("--profile", action="store_true", help="cProfile each stage into artifacts_dir/profile")
+    ap.add_argument("--trace-memory", action="store_true", help="record tracemalloc allocation deltas per stage (slower)")
+    ap.add_argument("--no-instrument", action="store_true", help="skip stage timings and run_metrics.json")
+    ap.add_argument("--chunk-rows", type=int, help="process sorted input in dialogue-contiguous chunks of about this many rows (out-of-core)")
+
+def _parser():
+    ap = argparse.ArgumentParser(prog="tie-dialog")
+    ap.add_argument("--version", action="version", version=f"tie-dialog {__version__}")
+    ap.add_argument("--check-config", metavar="CONFIG", help="validate a config file and exit")
+    sub = ap.add_subparsers(dest="stage", metavar="command")
+    for name, text in COMMANDS.items():
+        p = sub.add_parser(name, help=text, description=text)
+        if name == "stream":
+            p.add_argument("--config", required=True)
+            p.add_argument("--input", help="C_t CSV in arrival order, '-' for stdin (default: data.ct_series)")
+            p.add_argument("--output", help="events CSV (default: stdout)")
+            p.add_argument("--max-history", type=int, default=512, help="turns of state kept per open dialogue")
+        else:
+            add_run_options(p)
+    return ap
+
+def check_config(path) -> int:
+    from tie_dialog.config import check_config, load_config
+    try:
+        problems = check_config(load_config(path))
+    except (OSError, KeyError, TypeError, ValueError) as e:
+        problems = [f"cannot load {path}: {e!r}"]
+    for p in problems:
+        print(f"{path}: {p}", file=sys.stderr)
+    if not problems:
+        print(f"{path}: ok")
+    return 1 if problems else 0
+
+def main(argv=None) -> int:
+    ap = _parser()
+    args = ap.parse_args(argv)
+    if args.check_config:
+        return check_config(args.check_config)
+    if args.stage is None:
+        ap.print_help()
+        return 2
+    from tie_dialog.config import load_config
+    from tie_dialog.logging_setup import setup_logger
+    from tie_dialog import pipeline
+    log = setup_logger(stderr=args.stage == "stream")
+    cfg = load_config(args.config)
+    (pipeline.stream if args.stage == "stream" else pipeline.run)(args, cfg, log)
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,4 +1,208 @@
 
-# If you already have 𝒞_t in CSV, this module can stay minimal.
-# Otherwise, you could add functions to compute 𝒞_t from embeddings.
-pass
+# Coherence engine: C_t (global), C_i (per participant) and C_t–I_m (field / matrix
+# alignment) from per-turn embeddings. If you already have 𝒞_t in CSV, skip this module.
+import glob, hashlib, os, time, uuid
+from typing import Callable, List, Optional
+import numpy as np
+import pandas as pd
+from tie_dialog.corpus import dialogue_offsets
+
+Encoder = Callable[[List[str]], np.ndarray]
+CHUNK_BYTES = 1 << 28   # working memory per block; the float64 cumsum and context rows dominate
+
+def load_embeddings(path: str) -> np.ndarray:
+    """Per-turn embedding matrix from a .npy file, memory-mapped."""
+    return np.load(path, mmap_mode="r")
+
+def _unit(E) -> np.ndarray:
+    U = np.asarray(E, dtype=np.float32)
+    norms = np.linalg.norm(U, axis=1, keepdims=True)
+    return np.divide(U, norms, out=np.zeros_like(U), where=norms > 0)
+
+def _chunk_rows(E, chunk_rows):
+    # rows per block: the float32 unit rows plus float64 cumsum and context rows, ~20 bytes per dimension
+    if chunk_rows is not None:
+        return int(chunk_rows)
+    dim = np.shape(E)[1] if np.ndim(E) > 1 else 1
+    return max(1, CHUNK_BYTES // (20 * max(dim, 1)))
+
+def _blocks(offsets, chunk_rows):
+    # dialogue-aligned [lo, hi) index ranges into offsets with about chunk_rows rows each
+    lo = 0
+    while lo < len(offsets) - 1:
+        hi = int(np.searchsorted(offsets, offsets[lo] + chunk_rows, side="right")) - 1
+        hi = min(max(hi, lo + 1), len(offsets) - 1)
+        yield lo, hi
+        lo = hi
+
+def _context_cosine(U, offsets, window):
+    """Cosine between each row and the summed previous `window` rows (all previous rows when None)."""
+    n = len(U)
+    cs = np.zeros((n + 1, U.shape[1]), dtype=np.float64)
+    np.cumsum(U, axis=0, out=cs[1:])
+    starts = np.repeat(offsets[:-1], np.diff(offsets))
+    lo = starts if window is None else np.maximum(starts, np.arange(n) - window)
+    ctx = cs[lo]
+    np.subtract(cs[:-1], ctx, out=ctx)   # in place: one (n, d) float64 temporary besides cs
+    norm = np.linalg.norm(ctx, axis=1)
+    dot = np.einsum("ij,ij->i", U, ctx)
+    out = np.full(n, np.nan, dtype=np.float32)
+    ok = norm > 0
+    out[ok] = dot[ok] / norm[ok]
+    return out
+
+def context_coherence(E, offsets, window: Optional[int] = 3, chunk_rows: Optional[int] = None) -> np.ndarray:
+    """C_t per turn: similarity to the preceding `window` turns of the same dialogue (NaN on first turns).
+
+    Blocks of whole dialogues hold about `chunk_rows` turns, by default as many as fit CHUNK_BYTES.
+    """
+    out = np.empty(len(E), dtype=np.float32)
+    for lo, hi in _blocks(offsets, _chunk_rows(E, chunk_rows)):
+        a, b = offsets[lo], offsets[hi]
+        out[a:b] = _context_cosine(_unit(E[a:b]), offsets[lo:hi + 1] - a, window)
+    return out
+
+def participant_coherence(E, offsets, speakers, window: Optional[int] = 3, chunk_rows: Optional[int] = None) -> np.ndarray:
+    """C_i per turn: similarity to the same participant's preceding `window` turns in the dialogue."""
+    speakers = pd.factorize(np.asarray(speakers))[0]
+    out = np.empty(len(E), dtype=np.float32)
+    for lo, hi in _blocks(offsets, _chunk_rows(E, chunk_rows)):
+        a, b = offsets[lo], offsets[hi]
+        dlg = np.repeat(np.arange(hi - lo), np.diff(offsets[lo:hi + 1]))
+        order = np.lexsort((np.arange(b - a), speakers[a:b], dlg))
+        group = dlg[order].astype(np.int64) * (speakers.max(initial=0) + 1) + speakers[a:b][order]
+        sub = dialogue_offsets(group)
+        out[a + order] = _context_cosine(_unit(E[a:b][order]), sub, window)
+    return out
+
+def matrix_alignment(E, M, chunk_rows: Optional[int] = None) -> np.ndarray:
+    """C_t–I_m matrix: cosine of every turn against every row of the reference configuration M."""
+    Mu = _unit(np.atleast_2d(M)).T
+    out = np.empty((len(E), Mu.shape[1]), dtype=np.float32)
+    chunk_rows = _chunk_rows(E, chunk_rows)
+    for a in range(0, len(E), chunk_rows):
+        out[a:a + chunk_rows] = _unit(E[a:a + chunk_rows]) @ Mu
+    return out
+
+def compute_coherence(E, frame: pd.DataFrame, window: Optional[int] = 3, chunk_rows: Optional[int] = None) -> pd.DataFrame:
+    """Ct, C_i and Ct_Im for every turn of `frame` (dialogue_id, turn[, participant]), rows aligned with E.
+
+    Ct_Im is the alignment with the dialogue's accumulated field, i.e. all earlier turns.
+    """
+    offsets = dialogue_offsets(frame["dialogue_id"])
+    out = frame[[c for c in ("dialogue_id","turn","participant") if c in frame.columns]].reset_index(drop=True)
+    out["Ct"] = context_coherence(E, offsets, window, chunk_rows)
+    if "participant" in frame.columns:
+        out["C_i"] = participant_coherence(E, offsets, frame["participant"].to_numpy(), window, chunk_rows)
+    out["Ct_Im"] = context_coherence(E, offsets, None, chunk_rows)
+    return out
+
+class EmbeddingCache:
+    """On-disk embeddings keyed by text hash: append-only .npy shards opened memory-mapped.
+
+    Every encode() call that meets new texts adds one shard, under a unique name
+    and renamed into place once complete, so several writers can share a cache_dir.
+    Opening a cache with more than max_shards shards compacts them into one.
+    Use one cache_dir per encoder, so changing analysis parameters never re-encodes text.
+    """
+    def __init__(self, cache_dir: str, encoder: Encoder = None, batch_size: int = 256, max_shards: int = 64):
+        self.cache_dir = cache_dir
+        self.encoder = encoder
+        self.batch_size = batch_size
+        os.makedirs(cache_dir, exist_ok=True)
+        self._stems, self._shards, self._index = [], [], {}
+        for path in sorted(glob.glob(os.path.join(cache_dir, "shard-*.keys.npy"))):
+            self._add_shard(path[:-len(".keys.npy")])
+        if len(self._shards) > max_shards:
+            self._compact()
+
+    @staticmethod
+    def text_key(text: str) -> bytes:
+        return hashlib.blake2b(text.encode("utf-8"), digest_size=16).digest()
+
+    def _add_shard(self, stem):
+        try:
+            keys = np.load(stem + ".keys.npy")
+            vectors = np.load(stem + ".npy", mmap_mode="r")
+        except FileNotFoundError:
+            return   # removed by another process compacting the cache; its rows live on in the compacted shard
+        s = len(self._shards)
+        self._stems.append(stem)
+        self._shards.append(vectors)
+        for row, k in enumerate(keys.tolist()):
+            self._index[k] = (s, row)
+
+    def __len__(self):
+        return len(self._index)
+
+    def _new_stem(self):
+        # names sort by creation time, so later shards win for keys stored twice
+        return os.path.join(self.cache_dir, f"shard-{time.time_ns():020d}-{os.getpid()}-{uuid.uuid4().hex[:8]}")
+
+    def _write_shard(self, keys, vectors):
+        stem = self._new_stem()
+        np.save(stem + ".tmp.npy", np.asarray(vectors, dtype=np.float32))
+        np.save(stem + ".keys.tmp.npy", np.asarray(keys, dtype="S16"))
+        # the keys file is what readers look for, so it goes into place last
+        os.replace(stem + ".tmp.npy", stem + ".npy")
+        os.replace(stem + ".keys.tmp.npy", stem + ".keys.npy")
+        self._add_shard(stem)
+
+    def _compact(self):
+        """Copy every indexed row into one new shard, shard by shard, then drop the old ones."""
+        keys = list(self._index)
+        loc = np.array([self._index[k] for k in keys], dtype=np.int64).reshape(-1, 2)
+        stem, old = self._new_stem(), self._stems
+        out = np.lib.format.open_memmap(stem + ".tmp.npy", mode="w+", dtype=np.float32, shape=(len(keys), self._shards[0].shape[1]))
+        for s in np.unique(loc[:, 0]):
+            sel = loc[:, 0] == s
+            out[sel] = self._shards[s][loc[sel, 1]]
+        out.flush()
+        del out
+        np.save(stem + ".keys.tmp.npy", np.asarray(keys, dtype="S16"))
+        os.replace(stem + ".tmp.npy", stem + ".npy")
+        os.replace(stem + ".keys.tmp.npy", stem + ".keys.npy")
+        self._stems, self._shards, self._index = [], [], {}
+        self._add_shard(stem)
+        for o in old:
+            for suffix in (".keys.npy", ".npy"):
+                try:
+                    os.remove(o + suffix)
+                except FileNotFoundError:
+                    pass
+
+    def encode(self, texts) -> np.ndarray:
+        """Embeddings for `texts` (n × d float32); only texts never seen before reach the encoder."""
+        texts = ["" if t is None or (isinstance(t, float) and np.isnan(t)) else str(t) for t in texts]
+        keys = [self.text_key(t) for t in texts]
+        missing = {}
+        for k, t in zip(keys, texts):
+            if k not in self._index and k not in missing:
+                missing[k] = t
+        if missing:
+            if self.encoder is None:
+                raise KeyError(f"{len(missing)} texts are not cached and no encoder was given")
+            todo = list(missing.values())
+            vectors = [self.encoder(todo[i:i + self.batch_size]) for i in range(0, len(todo), self.batch_size)]
+            self._write_shard(list(missing), np.concatenate(vectors))
+        loc = np.array([self._index[k] for k in keys], dtype=np.int64).reshape(-1, 2)
+        dim = self._shards[0].shape[1] if self._shards else 0
+        out = np.empty((len(keys), dim), dtype=np.float32)
+        for s in np.unique(loc[:, 0]):
+            sel = loc[:, 0] == s
+            out[sel] = self._shards[s][loc[sel, 1]]
+        return out
+
+def sentence_transformer_encoder(model_name: str = "all-MiniLM-L6-v2", device: str = None) -> Encoder:
+    """Local sentence-transformers encoder (optional dependency, see requirements.txt)."""
+    try:
+        from sentence_transformers import SentenceTransformer
+    except ImportError as e:
+        raise ImportError("sentence-transformers is required for text encoding; pip install sentence-transformers") from e
+    model = SentenceTransformer(model_name, device=device)
+    return lambda texts: model.encode(texts, convert_to_numpy=True, show_progress_bar=False)
+
+def coherence_from_texts(turns: pd.DataFrame, cache: EmbeddingCache, window: Optional[int] = 3) -> pd.DataFrame:
+    """Score a turn table (dialogue_id, turn, [participant,] text) through the embedding cache."""
+    turns = turns.sort_values(["dialogue_id","turn"], kind="stable").reset_index(drop=True)
+    return compute_coherence(cache.encode(turns["text"].tolist()), turns, window)
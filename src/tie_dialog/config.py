@@ -1,5 +1,5 @@
 
-import yaml, dataclasses
+import os, yaml, dataclasses
 from dataclasses import dataclass
 from typing import List, Optional
 
@@ -9,11 +9,18 @@ class AnalysisConfig:
     events: dict
     windows: List[int]
     dtw: dict
+    matching: dict = dataclasses.field(default_factory=dict)
+    bootstrap: dict = dataclasses.field(default_factory=dict)
+    sweep: dict = dataclasses.field(default_factory=dict)
+    lead_lag: dict = dataclasses.field(default_factory=dict)
+    sbr: dict = dataclasses.field(default_factory=dict)
 
 @dataclass
 class Paths:
     ct_series: str
     events: str
+    cache_dir: Optional[str] = None
+    raters: Optional[str] = None      # multi-annotator events (long or wide CSV/XLSX)
 
 @dataclass
 class Outputs:
@@ -28,6 +35,13 @@ class Config:
     outputs: Outputs
     analysis: AnalysisConfig
     plotting: dict
+    report: dict = dataclasses.field(default_factory=dict)
+
+def _windows_as_list(analysis: dict) -> dict:
+    # `windows: 20` is shorthand for the full tolerance curve 0..20
+    if isinstance(analysis.get("windows"), int):
+        analysis = dict(analysis, windows=list(range(analysis["windows"] + 1)))
+    return analysis
 
 def load_config(path: str) -> Config:
     with open(path, "r", encoding="utf-8") as f:
@@ -36,6 +50,36 @@ def load_config(path: str) -> Config:
         seed=cfg["seed"],
         data=Paths(**cfg["data"]),
         outputs=Outputs(**cfg["outputs"]),
-        analysis=AnalysisConfig(**cfg["analysis"]),
+        analysis=AnalysisConfig(**_windows_as_list(cfg["analysis"])),
         plotting=cfg.get("plotting", {}),
+        report=cfg.get("report", {}),
     )
+
+# mirrors preprocessing.SMOOTHING_METHODS, events.MATCH_MODES and sbr.THRESHOLD_MODES; importing those modules loads scipy
+SMOOTHING_METHODS = ("rolling", "ewma", "savgol")
+MATCH_MODES = ("tolerant", "greedy", "optimal")
+SBR_THRESHOLDS = ("adaptive", "fixed")
+
+def check_config(cfg: Config) -> List[str]:
+    """Problems that would stop a run, found without importing any stage module."""
+    a, problems = cfg.analysis, []
+    if not os.path.exists(cfg.data.ct_series):
+        problems.append(f"data.ct_series not found: {cfg.data.ct_series}")
+    if cfg.data.raters and not os.path.exists(cfg.data.raters):
+        problems.append(f"data.raters not found: {cfg.data.raters}")
+    if a.smoothing.get("method", "rolling") not in SMOOTHING_METHODS:
+        problems.append(f"analysis.smoothing.method must be one of {SMOOTHING_METHODS}")
+    if not isinstance(a.smoothing.get("window"), int) or a.smoothing["window"] < 1:
+        problems.append("analysis.smoothing.window must be a positive integer")
+    for key in ("peak_prominence", "min_distance"):
+        if key not in a.events:
+            problems.append(f"analysis.events.{key} is required")
+    if not a.windows or any(not isinstance(w, int) or w < 0 for w in a.windows):
+        problems.append("analysis.windows must be non-negative integers")
+    if a.matching.get("mode", "tolerant") not in MATCH_MODES:
+        problems.append(f"analysis.matching.mode must be one of {MATCH_MODES}")
+    if a.sbr.get("thresholds", "adaptive") not in SBR_THRESHOLDS:
+        problems.append(f"analysis.sbr.thresholds must be one of {SBR_THRESHOLDS}")
+    if a.sbr.get("phi_low", 0.60) >= a.sbr.get("phi_high", 0.75):
+        problems.append("analysis.sbr.phi_low must be below phi_high")
+    return problems
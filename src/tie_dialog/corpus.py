@@ -0,0 +1,101 @@
+
+# CSR-style corpus: flat per-turn arrays plus one offsets array, grouped once at load time.
+# Every stage takes a DialogueCorpus or a C_t frame; frames are converted on entry.
+import os
+from dataclasses import dataclass
+from typing import NamedTuple
+import numpy as np
+import pandas as pd
+from tie_dialog.data_loading import CT_COLUMNS, id_codes, load_ct_series
+
+def dialogue_offsets(ids) -> np.ndarray:
+    """Row offsets of each dialogue block (length n_dialogues + 1); rows must be grouped by dialogue."""
+    codes = id_codes(ids) if isinstance(ids, pd.Series) else np.asarray(ids)
+    n = len(codes)
+    if n == 0:
+        return np.zeros(1, dtype=np.int64)
+    starts = np.flatnonzero(codes[1:] != codes[:-1]) + 1
+    offsets = np.concatenate(([0], starts, [n])).astype(np.int64)
+    if np.unique(codes[offsets[:-1]]).size != len(offsets) - 1:
+        raise ValueError("rows must be grouped by dialogue_id")
+    return offsets
+
+def resolve_jobs(jobs) -> int:
+    """Number of worker processes; 0 or a negative value means every core."""
+    jobs = 1 if jobs is None else int(jobs)
+    return (os.cpu_count() or 1) if jobs <= 0 else jobs
+
+class DialogueView(NamedTuple):
+    dialogue_id: object
+    turn: np.ndarray
+    human_ct: np.ndarray
+    model_ct: np.ndarray
+
+@dataclass
+class DialogueCorpus:
+    """Dialogue i owns rows offsets[i]:offsets[i+1] of turn, human_ct and model_ct."""
+    dialogue_ids: pd.Index   # one entry per dialogue, in row order
+    offsets: np.ndarray      # int64, n_dialogues + 1
+    turn: np.ndarray         # int32
+    human_ct: np.ndarray     # float32 when built by from_frame/load_corpus
+    model_ct: np.ndarray
+
+    def __len__(self):
+        return len(self.turn)
+
+    @property
+    def n_dialogues(self) -> int:
+        return len(self.offsets) - 1
+
+    @property
+    def lengths(self) -> np.ndarray:
+        return np.diff(self.offsets)
+
+    @classmethod
+    def from_frame(cls, df: pd.DataFrame, dtype=np.float32) -> "DialogueCorpus":
+        """Build from a C_t frame grouped by dialogue; `dtype=None` keeps the frame's float dtype."""
+        offsets = dialogue_offsets(df["dialogue_id"])
+        curve = lambda c: df[c].to_numpy() if dtype is None else df[c].to_numpy(dtype=dtype)
+        return cls(pd.Index(df["dialogue_id"].array[offsets[:-1]]), offsets,
+                   df["turn"].to_numpy().astype(np.int32, copy=False), curve("human_ct"), curve("model_ct"))
+
+    def to_frame(self) -> pd.DataFrame:
+        return pd.DataFrame(dict(dialogue_id=self.dialogue_ids.take(self.dialogue_rows()), turn=self.turn,
+                                 human_ct=self.human_ct, model_ct=self.model_ct), columns=CT_COLUMNS)
+
+    def dialogue_rows(self) -> np.ndarray:
+        """Dialogue index of every row."""
+        return np.repeat(np.arange(self.n_dialogues), self.lengths)
+
+    def view(self, i: int) -> DialogueView:
+        """Zero-copy slices of dialogue number i."""
+        a, b = self.offsets[i], self.offsets[i + 1]
+        return DialogueView(self.dialogue_ids[i], self.turn[a:b], self.human_ct[a:b], self.model_ct[a:b])
+
+    def __getitem__(self, dialogue_id) -> DialogueView:
+        return self.view(self.dialogue_ids.get_loc(dialogue_id))
+
+    def __iter__(self):
+        return (self.view(i) for i in range(self.n_dialogues))
+
+    def with_curves(self, human_ct, model_ct) -> "DialogueCorpus":
+        """Same dialogues and turns with new curve arrays (e.g. smoothed)."""
+        return DialogueCorpus(self.dialogue_ids, self.offsets, self.turn, human_ct, model_ct)
+
+    def subset(self, ids) -> "DialogueCorpus":
+        """The dialogues of `ids` that are present, in corpus order (copies their rows)."""
+        keep = np.sort(self.dialogue_ids.get_indexer(pd.Index(ids)))
+        keep = keep[keep >= 0]
+        if len(keep) == self.n_dialogues:
+            return self
+        lengths = self.lengths[keep]
+        rows = np.repeat(self.offsets[keep], lengths) + np.arange(lengths.sum()) - np.repeat(np.cumsum(lengths) - lengths, lengths)
+        return DialogueCorpus(self.dialogue_ids[keep], np.concatenate(([0], np.cumsum(lengths))).astype(np.int64),
+                              self.turn[rows], self.human_ct[rows], self.model_ct[rows])
+
+def as_corpus(data) -> DialogueCorpus:
+    """`data` itself when it is a DialogueCorpus, else a corpus over the frame's own dtypes."""
+    return data if isinstance(data, DialogueCorpus) else DialogueCorpus.from_frame(data, dtype=None)
+
+def load_corpus(path: str, cache_dir: str = None) -> DialogueCorpus:
+    return DialogueCorpus.from_frame(load_ct_series(path, cache_dir))
@@ -0,0 +1,155 @@
+
+# Stages as a DAG: every node names the values it reads and writes, and the scheduler runs each
+# node once its inputs exist, at most `jobs` at a time, in threads or in worker processes.
+import heapq, multiprocessing
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, ThreadPoolExecutor, wait
+from contextlib import nullcontext
+from dataclasses import dataclass
+from typing import Callable, Tuple
+
+EXECUTORS = ("thread", "process")
+
+@dataclass
+class Node:
+    """fn(*inputs) returns the outputs: nothing, one value, or a tuple with one value per output.
+
+    A "process" node's fn (top-level, picklable) and its input values are sent to a
+    worker process; with jobs = 1 every node runs inline in the calling thread.
+    """
+    name: str
+    fn: Callable
+    inputs: Tuple[str, ...] = ()
+    outputs: Tuple[str, ...] = ()
+    executor: str = "thread"
+
+class DAG:
+    def __init__(self, nodes=()):
+        self.nodes, self.producer = {}, {}
+        for node in nodes:
+            self.add(node)
+
+    def add(self, node: Node) -> Node:
+        if node.name in self.nodes:
+            raise ValueError(f"duplicate node: {node.name}")
+        if node.executor not in EXECUTORS:
+            raise ValueError(f"unknown executor: {node.executor} (expected one of {EXECUTORS})")
+        node.inputs, node.outputs = tuple(node.inputs), tuple(node.outputs)
+        for out in node.outputs:
+            if out in self.producer:
+                raise ValueError(f"{out} is produced by both {self.producer[out]} and {node.name}")
+            self.producer[out] = node.name
+        self.nodes[node.name] = node
+        return node
+
+    def dependencies(self, name) -> set:
+        return {self.producer[i] for i in self.nodes[name].inputs if i in self.producer}
+
+    def order(self, available=()) -> list:
+        """Node names in a topological order, insertion order among independent nodes.
+
+        Raises ValueError for inputs nobody produces (and not in `available`) and for cycles.
+        """
+        index = {name: k for k, name in enumerate(self.nodes)}
+        for name, node in self.nodes.items():
+            missing = [i for i in node.inputs if i not in self.producer and i not in available]
+            if missing:
+                raise ValueError(f"node {name} needs {missing}, which no node produces")
+        waiting = {name: len(self.dependencies(name)) for name in self.nodes}
+        dependents = self._dependents()
+        ready = [index[n] for n, k in waiting.items() if k == 0]
+        heapq.heapify(ready)
+        names, out = list(self.nodes), []
+        while ready:
+            name = names[heapq.heappop(ready)]
+            out.append(name)
+            for d in dependents[name]:
+                waiting[d] -= 1
+                if waiting[d] == 0:
+                    heapq.heappush(ready, index[d])
+        if len(out) < len(self.nodes):
+            raise ValueError(f"cycle among nodes: {sorted(set(self.nodes) - set(out))}")
+        return out
+
+    def _dependents(self):
+        dependents = {name: [] for name in self.nodes}
+        for name in self.nodes:
+            for d in self.dependencies(name):
+                dependents[d].append(name)
+        return dependents
+
+    def run(self, jobs=1, values=None, stage=None, keep_going=False) -> dict:
+        """Run every node and return all values; `self.status` maps nodes to done/failed/skipped.
+
+        `stage(name)` is a context manager wrapped around each node (e.g. Instrument.stage).
+        When a node fails its dependents are skipped; other nodes already running finish,
+        no new ones start unless `keep_going`, and the first failure is raised at the end.
+        """
+        values = dict(values or {})
+        order = self.order(values)
+        rank = {name: k for k, name in enumerate(order)}
+        dependents = self._dependents()
+        waiting = {name: len(self.dependencies(name)) for name in self.nodes}
+        self.status, errors = {}, []
+        jobs = max(int(jobs), 1)
+        procs = None
+        if jobs > 1 and any(n.executor == "process" for n in self.nodes.values()):
+            # no fork: the parent has live threads (and their locks) while nodes run
+            method = "forkserver" if "forkserver" in multiprocessing.get_all_start_methods() else "spawn"
+            procs = ProcessPoolExecutor(max_workers=jobs, mp_context=multiprocessing.get_context(method))
+
+        def call(name):
+            node = self.nodes[name]
+            with stage(name) if stage else nullcontext():
+                args = [values[i] for i in node.inputs]
+                if procs is not None and node.executor == "process":
+                    return procs.submit(node.fn, *args).result()
+                return node.fn(*args)
+
+        def finish(name, result):
+            node = self.nodes[name]
+            if len(node.outputs) == 1:
+                result = (result,)
+            elif not node.outputs:
+                result = ()
+            values.update(zip(node.outputs, result))
+            self.status[name] = "done"
+            for d in dependents[name]:
+                waiting[d] -= 1
+                if waiting[d] == 0:
+                    heapq.heappush(ready, rank[d])
+
+        ready = [rank[n] for n, k in waiting.items() if k == 0]
+        heapq.heapify(ready)
+        threads = ThreadPoolExecutor(max_workers=jobs) if jobs > 1 else None
+        running = {}
+        try:
+            while ready or running:
+                while ready and len(running) < jobs and (keep_going or not errors):
+                    name = order[heapq.heappop(ready)]
+                    if threads is None:
+                        try:
+                            finish(name, call(name))
+                        except Exception as e:
+                            self.status[name] = "failed"
+                            errors.append(e)
+                    else:
+                        running[threads.submit(call, name)] = name
+                if not running:
+                    break
+                done, _ = wait(running, return_when=FIRST_COMPLETED)
+                for f in sorted(done, key=lambda f: rank[running[f]]):
+                    name = running.pop(f)
+                    try:
+                        finish(name, f.result())
+                    except Exception as e:
+                        self.status[name] = "failed"
+                        errors.append(e)
+        finally:
+            for pool in (threads, procs):
+                if pool is not None:
+                    pool.shutdown(wait=True, cancel_futures=True)
+        for name in order:
+            self.status.setdefault(name, "skipped")
+        if errors:
+            raise errors[0]
+        return values
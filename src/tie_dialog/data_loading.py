@@ -1,16 +1,203 @@
 
+import hashlib, json, os, shutil
+import numpy as np
 import pandas as pd
 
-def load_ct_series(path: str) -> pd.DataFrame:
-    df = pd.read_csv(path)
-    needed = {"dialogue_id","turn","human_ct","model_ct"}
-    if not needed.issubset(df.columns):
-        raise ValueError(f"ct_series missing columns: {needed - set(df.columns)}")
-    return df.sort_values(["dialogue_id","turn"])
-
-def load_events(path: str) -> pd.DataFrame:
-    df = pd.read_csv(path)
-    needed = {"dialogue_id","turn","human_peak","human_valley","machine_peak","machine_valley"}
-    if not needed.issubset(df.columns):
-        raise ValueError(f"events missing columns: {needed - set(df.columns)}")
-    return df.sort_values(["dialogue_id","turn"])
+CT_COLUMNS = ["dialogue_id","turn","human_ct","model_ct"]
+EVENT_COLUMNS = ["dialogue_id","turn","human_peak","human_valley","machine_peak","machine_valley"]
+CT_DTYPES = {"turn": "int32", "human_ct": "float32", "model_ct": "float32"}
+EVENT_DTYPES = {"turn": "int32", "human_peak": "int8", "human_valley": "int8", "machine_peak": "int8", "machine_valley": "int8"}
+
+def file_hash(path: str, chunk_size: int = 1 << 20) -> str:
+    h = hashlib.blake2b(digest_size=16)
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(chunk_size), b""):
+            h.update(block)
+    return h.hexdigest()
+
+def _read_table(path: str, dtypes) -> pd.DataFrame:
+    if path.endswith((".parquet", ".pq")):
+        df = pd.read_parquet(path)
+        return df.astype({c: t for c, t in dtypes.items() if c in df.columns})
+    header = pd.read_csv(path, nrows=0).columns
+    return pd.read_csv(path, dtype={c: t for c, t in dtypes.items() if c in header})
+
+def _compact_ids(s: pd.Series) -> pd.Series:
+    # Integer ids shrink to int32; anything else becomes a categorical
+    if pd.api.types.is_integer_dtype(s) and (s.empty or (s.min() >= np.iinfo(np.int32).min and s.max() <= np.iinfo(np.int32).max)):
+        return s.astype("int32")
+    if isinstance(s.dtype, pd.CategoricalDtype):
+        return s
+    return s.astype("category")
+
+def id_codes(s: pd.Series) -> np.ndarray:
+    return s.cat.codes.to_numpy() if isinstance(s.dtype, pd.CategoricalDtype) else s.to_numpy()
+
+def is_sorted(df: pd.DataFrame) -> bool:
+    """True when rows are already ordered by (dialogue_id, turn)."""
+    if len(df) < 2:
+        return True
+    ids = id_codes(df["dialogue_id"])
+    turns = df["turn"].to_numpy()
+    d_ids = np.diff(ids)
+    if (d_ids < 0).any():
+        return False
+    return bool(((d_ids > 0) | (np.diff(turns) > 0)).all())
+
+def _sort(df: pd.DataFrame) -> pd.DataFrame:
+    if is_sorted(df):
+        return df.reset_index(drop=True)
+    return df.sort_values(["dialogue_id","turn"], kind="stable").reset_index(drop=True)
+
+def _cache_path(cache_dir: str, path: str, kind: str, full_hash: bool = False) -> str:
+    """Cache dir of `path`: keyed on its absolute path, size and mtime, or on its contents when full_hash."""
+    if full_hash:
+        return os.path.join(cache_dir, f"{kind}-{file_hash(path)}")
+    st = os.stat(path)
+    stamp = f"{os.path.abspath(path)}\0{st.st_size}\0{st.st_mtime_ns}".encode("utf-8")
+    return os.path.join(cache_dir, f"{kind}-{hashlib.blake2b(stamp, digest_size=16).hexdigest()}")
+
+def _write_cache(df: pd.DataFrame, cdir: str):
+    tmp = cdir + ".tmp"
+    if os.path.isdir(tmp):
+        shutil.rmtree(tmp)   # left behind by an interrupted write
+    os.makedirs(tmp)
+    meta = {"columns": list(df.columns), "categories": {}}
+    for c in df.columns:
+        s = df[c]
+        if isinstance(s.dtype, pd.CategoricalDtype):
+            meta["categories"][c] = s.cat.categories.tolist()
+            arr = s.cat.codes.to_numpy()
+        else:
+            arr = s.to_numpy()
+        np.save(os.path.join(tmp, f"{c}.npy"), arr)
+    with open(os.path.join(tmp, "meta.json"), "w", encoding="utf-8") as f:
+        json.dump(meta, f)
+    try:
+        os.replace(tmp, cdir)
+    except OSError:
+        if not os.path.isdir(cdir):
+            raise
+        shutil.rmtree(tmp)   # another writer got there first
+
+def _read_cache(cdir: str) -> pd.DataFrame:
+    with open(os.path.join(cdir, "meta.json"), "r", encoding="utf-8") as f:
+        meta = json.load(f)
+    cols = {}
+    for c in meta["columns"]:
+        # copy-on-write maps: writable, and pages are only read (or copied) when touched
+        arr = np.asarray(np.load(os.path.join(cdir, f"{c}.npy"), mmap_mode="c"))
+        if c in meta["categories"]:
+            cols[c] = pd.Categorical.from_codes(arr, categories=meta["categories"][c])
+        else:
+            cols[c] = arr
+    # a dict of arrays without copy keeps one block per column, each still backed by its map
+    return pd.DataFrame(cols, copy=False)
+
+def _load(path, needed, dtypes, kind, cache_dir, full_hash=False):
+    if cache_dir:
+        cdir = _cache_path(cache_dir, path, kind, full_hash)
+        if os.path.isdir(cdir):
+            return _read_cache(cdir)
+    df = _read_table(path, dtypes)
+    if not set(needed).issubset(df.columns):
+        raise ValueError(f"{kind} missing columns: {set(needed) - set(df.columns)}")
+    df["dialogue_id"] = _compact_ids(df["dialogue_id"])
+    for c in df.columns.difference(needed):
+        if pd.api.types.is_string_dtype(df[c].dtype):
+            df[c] = df[c].astype("category")
+    df = _sort(df)
+    if cache_dir:
+        os.makedirs(cache_dir, exist_ok=True)
+        _write_cache(df, cdir)
+    return df
+
+def load_ct_series(path: str, cache_dir: str = None, full_hash: bool = False) -> pd.DataFrame:
+    return _load(path, CT_COLUMNS, CT_DTYPES, "ct_series", cache_dir, full_hash)
+
+def load_events(path: str, cache_dir: str = None, full_hash: bool = False) -> pd.DataFrame:
+    return _load(path, EVENT_COLUMNS, EVENT_DTYPES, "events", cache_dir, full_hash)
+
+def _read_batches(path: str, dtypes, chunk_rows: int):
+    if path.endswith((".parquet", ".pq")):
+        import pyarrow.parquet as pq
+        for batch in pq.ParquetFile(path).iter_batches(batch_size=chunk_rows):
+            df = batch.to_pandas()
+            yield df.astype({c: t for c, t in dtypes.items() if c in df.columns})
+        return
+    header = pd.read_csv(path, nrows=0).columns
+    yield from pd.read_csv(path, dtype={c: t for c, t in dtypes.items() if c in header}, chunksize=chunk_rows)
+
+def _iter_chunks(path, needed, dtypes, kind, chunk_rows):
+    """Frames of whole dialogues, about chunk_rows rows each, from a file sorted by (dialogue_id, turn).
+
+    The rows of the last dialogue of every batch are carried into the next one, so a
+    dialogue longer than chunk_rows becomes a chunk of its own. Ids are compacted per chunk.
+    """
+    carry, last = None, None
+    def finish(df):
+        nonlocal last
+        df = df.reset_index(drop=True)
+        df["dialogue_id"] = _compact_ids(df["dialogue_id"])
+        for c in df.columns.difference(needed):
+            if pd.api.types.is_string_dtype(df[c].dtype):
+                df[c] = df[c].astype("category")
+        first = df["dialogue_id"].iloc[0]
+        if not is_sorted(df) or (last is not None and not first > last):
+            raise ValueError(f"{kind} must be sorted by (dialogue_id, turn) to be read in chunks: {path}")
+        last = df["dialogue_id"].iloc[-1]
+        return df
+    for df in _read_batches(path, dtypes, chunk_rows):
+        if not set(needed).issubset(df.columns):
+            raise ValueError(f"{kind} missing columns: {set(needed) - set(df.columns)}")
+        if carry is not None:
+            df = pd.concat([carry, df], ignore_index=True)
+        ids = df["dialogue_id"].to_numpy()
+        split = np.flatnonzero(ids != ids[-1])
+        if len(split) == 0:
+            carry = df
+            continue
+        carry = df.iloc[split[-1] + 1:]
+        yield finish(df.iloc[:split[-1] + 1])
+    if carry is not None and len(carry):
+        yield finish(carry)
+
+def iter_ct_chunks(path: str, chunk_rows: int = 1_000_000):
+    return _iter_chunks(path, CT_COLUMNS, CT_DTYPES, "ct_series", chunk_rows)
+
+def iter_event_chunks(path: str, chunk_rows: int = 1_000_000):
+    return _iter_chunks(path, EVENT_COLUMNS, EVENT_DTYPES, "events", chunk_rows)
+
+def aligned_chunks(chunks, others):
+    """(chunk, rows of `others` for its dialogues) pairs from two dialogue-sorted chunk iterators.
+
+    Rows of `others` up to each chunk's last dialogue go with that chunk; the last
+    chunk also takes whatever remains.
+    """
+    others, pending = iter(others), None
+    def take(last):
+        nonlocal pending
+        parts = []
+        while True:
+            if pending is None:
+                pending = next(others, None)
+                if pending is None:
+                    break
+            n = len(pending) if last is None else int((pending["dialogue_id"].to_numpy() <= last).sum())
+            parts.append(pending.iloc[:n])
+            if n < len(pending):
+                pending = pending.iloc[n:]
+                break
+            pending = None
+        if not parts:
+            return None
+        df = pd.concat(parts, ignore_index=True)
+        df["dialogue_id"] = _compact_ids(df["dialogue_id"])   # categories differ between chunks
+        return df
+    prev = None
+    for df in chunks:
+        if prev is not None:
+            yield prev, take(prev["dialogue_id"].iloc[-1])
+        prev = df
+    if prev is not None:
+        yield prev, take(None)
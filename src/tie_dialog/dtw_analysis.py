@@ -1,19 +1,91 @@
 
+from concurrent.futures import ProcessPoolExecutor
 import numpy as np
 import pandas as pd
 from dtaidistance import dtw
+from tie_dialog.corpus import as_corpus, resolve_jobs
+from tie_dialog.dtw_path import batch_paths, dtw_path
 
-def dtw_pair(h, m):
-    d = dtw.distance(h, m)
-    # naive warped correlation proxy (for demo purposes)
-    r = np.corrcoef(h, m)[0,1]
-    return d, r
-
-def per_dialogue(df: pd.DataFrame):
-    rows = []
-    for did, part in df.groupby("dialogue_id"):
-        h = part["human_ct"].values
-        m = part["model_ct"].values
-        d, r = dtw_pair(h, m)
-        rows.append(dict(dialogue_id=did, dist_norm=float(d), r_warped=float(r)))
-    return pd.DataFrame(rows)
+_HAS_C = dtw.dtw_cc is not None
+
+def _c_buffer(x):
+    # the C kernel needs contiguous, writable float64 buffers
+    x = np.ascontiguousarray(x, dtype=np.float64)
+    return x if x.flags.writeable else x.copy()
+
+def dtw_distance(h, m, window=None, psi=0, max_dist=None):
+    """DTW distance; inf once it is certain to exceed `max_dist` (early abandoning)."""
+    h, m = _c_buffer(h), _c_buffer(m)
+    if _HAS_C:
+        return dtw.distance_fast(h, m, window=window, psi=psi or 0, max_dist=max_dist)
+    return dtw.distance(h, m, window=window, psi=psi or 0, max_dist=max_dist, use_c=False)
+
+def dtw_pair(h, m, window=None, psi=0):
+    res = dtw_path(h, m, window, psi)
+    return res.distance, res.r_warped
+
+def _block_distances(h, m, offsets, window, psi):
+    out = np.empty(len(offsets) - 1)
+    for i in range(len(out)):
+        a, b = offsets[i], offsets[i + 1]
+        out[i] = dtw_distance(h[a:b], m[a:b], window, psi) if b > a else np.nan
+    return out
+
+def _block_paths(h, m, offsets, window, psi):
+    # distance, r_warped, lag and path length per dialogue; dialogues of equal length share one batched pass
+    lengths = np.diff(offsets)
+    out = np.full((len(lengths), 4), np.nan)
+    for n in np.unique(lengths[lengths > 0]):
+        rows = np.flatnonzero(lengths == n)
+        cells = offsets[rows][:, None] + np.arange(n)
+        out[rows] = batch_paths(h[cells], m[cells], window, psi)
+    return out
+
+def _split(offsets, parts):
+    """Dialogue index boundaries that give each part roughly the same number of DTW cells."""
+    cost = np.cumsum(np.diff(offsets).astype(np.float64) ** 2)
+    if len(cost) == 0 or cost[-1] == 0:
+        return np.array([0, len(offsets) - 1])
+    cuts = np.searchsorted(cost, cost[-1] * np.arange(1, parts) / parts)
+    return np.unique(np.concatenate(([0], cuts, [len(offsets) - 1])))
+
+def _run_blocks(fn, h, m, offsets, window, psi, jobs):
+    h, m = _c_buffer(h), _c_buffer(m)
+    jobs = resolve_jobs(jobs)
+    if jobs == 1 or len(offsets) < 3:
+        return fn(h, m, offsets, window, psi)
+    bounds = _split(offsets, 4 * jobs)
+    with ProcessPoolExecutor(max_workers=jobs) as ex:
+        futures = []
+        for lo, hi in zip(bounds[:-1], bounds[1:]):
+            a, b = offsets[lo], offsets[hi]
+            futures.append(ex.submit(fn, h[a:b], m[a:b], offsets[lo:hi + 1] - a, window, psi))
+        return np.concatenate([f.result() for f in futures])
+
+def dtw_distances(h, m, offsets, window=None, psi=0, jobs=1) -> np.ndarray:
+    """DTW distance between human and model C_t for every dialogue block of the flat arrays."""
+    return _run_blocks(_block_distances, h, m, offsets, window, psi, jobs)
+
+def dtw_paths(h, m, offsets, window=None, psi=0, jobs=1) -> np.ndarray:
+    """(n_dialogues, 4) array of distance, r_warped, lag and path length from each warping path."""
+    return _run_blocks(_block_paths, h, m, offsets, window, psi, jobs)
+
+def per_dialogue(df, window=None, psi=0, normalize=True, jobs=1):
+    """DTW alignment per dialogue under the Sakoe–Chiba `window` and `psi` relaxation.
+
+    r_warped correlates the samples paired by the warping path and lag is the mean
+    signed offset along it (> 0: the model trails the human curve). dist_norm divides
+    the distance by sqrt(n + m), the symmetric step-pattern normalization.
+    """
+    corpus = as_corpus(df)
+    res = dtw_paths(corpus.human_ct, corpus.model_ct, corpus.offsets, window, psi, jobs)
+    n = m = corpus.lengths   # both curves have one value per turn
+    return pd.DataFrame(dict(
+        dialogue_id=corpus.dialogue_ids.to_numpy(),
+        n_turns=n,
+        dist=res[:, 0],
+        dist_norm=res[:, 0] / np.sqrt(n + m) if normalize else res[:, 0],
+        r_warped=res[:, 1],
+        lag=res[:, 2],
+        path_len=res[:, 3].astype(np.int64) if len(res) else np.zeros(0, dtype=np.int64),
+    ))
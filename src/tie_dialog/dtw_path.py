@@ -0,0 +1,184 @@
+
+import numpy as np
+from dataclasses import dataclass
+
+@dataclass
+class DTWPath:
+    distance: float
+    path: np.ndarray     # (L, 2) int indices: column 0 into the human series, column 1 into the model series
+    r_warped: float
+    lag: float           # mean(j - i) along the path; > 0 means the model trails the human curve
+
+def _diagonal_range(k, n, m, window):
+    """Rows i of anti-diagonal i + j = k inside the matrix and the Sakoe–Chiba band."""
+    lo, hi = max(0, k - (m - 1)), min(n - 1, k)
+    if window is not None:
+        # same band as dtaidistance: |i - j| < window, widened by the length difference
+        a, b = max(0, n - m), max(0, m - n)
+        lo = max(lo, -((-(k - b - window + 1)) // 2))
+        hi = min(hi, (k + a + window - 1) // 2)
+    return lo, hi
+
+def _gather(diag, start, idx):
+    out = np.full(len(idx), np.inf)
+    if diag is None:
+        return out
+    pos = idx - start
+    ok = (pos >= 0) & (pos < len(diag))
+    out[ok] = diag[pos[ok]]
+    return out
+
+def accumulated_cost(x, y, window=None, psi=0):
+    """Squared-difference DTW accumulated cost, one anti-diagonal at a time.
+
+    Returns a list of (first_row, values) per anti-diagonal; only cells inside the
+    band are stored, so memory is O((n + m) * window) rather than O(n * m).
+    """
+    x = np.asarray(x, dtype=np.float64)
+    y = np.asarray(y, dtype=np.float64)
+    n, m = len(x), len(y)
+    if window is not None:
+        window = max(int(window), 1)
+    psi = int(psi or 0)
+    diags = []
+    for k in range(n + m - 1):
+        lo, hi = _diagonal_range(k, n, m, window)
+        if hi < lo:
+            diags.append((lo, np.zeros(0)))
+            continue
+        i = np.arange(lo, hi + 1)
+        j = k - i
+        cost = (x[i] - y[j]) ** 2
+        p1 = diags[k - 1] if k >= 1 else (0, None)
+        p2 = diags[k - 2] if k >= 2 else (0, None)
+        best = np.minimum(np.minimum(_gather(p2[1], p2[0], i - 1), _gather(p1[1], p1[0], i - 1)), _gather(p1[1], p1[0], i))
+        acc = cost + best
+        # psi relaxation: the path may start anywhere in the first psi+1 cells of row 0 or column 0
+        start = ((i == 0) & (j <= psi)) | ((j == 0) & (i <= psi))
+        acc[start] = cost[start]
+        diags.append((lo, acc))
+    return diags
+
+def _cell(diags, i, j):
+    lo, vals = diags[i + j]
+    pos = i - lo
+    return vals[pos] if 0 <= pos < len(vals) else np.inf
+
+def warping_path(x, y, window=None, psi=0):
+    """DTW distance (as dtaidistance.dtw.distance) and the optimal (i, j) path."""
+    n, m = len(x), len(y)
+    if n == 0 or m == 0:
+        return np.inf, np.zeros((0, 2), dtype=np.int64)
+    psi = int(psi or 0)
+    diags = accumulated_cost(x, y, window, psi)
+    ends = [(n - 1, j) for j in range(max(0, m - 1 - psi), m)] + [(i, m - 1) for i in range(max(0, n - 1 - psi), n - 1)]
+    i, j = min(ends, key=lambda c: _cell(diags, *c))
+    total = _cell(diags, i, j)
+    if not np.isfinite(total):
+        return np.inf, np.zeros((0, 2), dtype=np.int64)
+    path = [(i, j)]
+    while not ((i == 0 and j <= psi) or (j == 0 and i <= psi)):
+        if i == 0:
+            j -= 1
+        elif j == 0:
+            i -= 1
+        else:
+            # ties prefer the diagonal step, then the vertical one
+            step = int(np.argmin([_cell(diags, i - 1, j - 1), _cell(diags, i - 1, j), _cell(diags, i, j - 1)]))
+            i, j = (i - 1, j - 1) if step == 0 else (i - 1, j) if step == 1 else (i, j - 1)
+        path.append((i, j))
+    return float(np.sqrt(total)), np.asarray(path[::-1], dtype=np.int64)
+
+def dtw_path(x, y, window=None, psi=0) -> DTWPath:
+    """Distance, warping path, correlation of the aligned samples and mean signed lag."""
+    x = np.asarray(x, dtype=np.float64)
+    y = np.asarray(y, dtype=np.float64)
+    d, path = warping_path(x, y, window, psi)
+    if len(path) < 2:
+        return DTWPath(d, path, np.nan, np.nan)
+    xa, ya = x[path[:, 0]], y[path[:, 1]]
+    with np.errstate(invalid="ignore", divide="ignore"):
+        r = np.corrcoef(xa, ya)[0, 1] if xa.std() > 0 and ya.std() > 0 else np.nan
+    return DTWPath(d, path, float(r), float(np.mean(path[:, 1] - path[:, 0])))
+
+def batch_paths(X, Y, window=None, psi=0, max_cells=1 << 22) -> np.ndarray:
+    """dtw_path for the rows of two (k, n) arrays at once: (k, 4) distance, r_warped, lag, path length.
+
+    The same recurrence, band and tie rules as warping_path, with every anti-diagonal
+    and every backtracking step done for all pairs together; about max_cells matrix
+    cells are held at a time. Pairs whose full matrix alone exceeds max_cells go
+    through dtw_path one at a time, which stores only the band.
+    """
+    X = np.asarray(X, dtype=np.float64)
+    Y = np.asarray(Y, dtype=np.float64)
+    k, n = X.shape
+    out = np.full((k, 4), np.nan)
+    out[:, 3] = 0
+    if n == 0:
+        return out
+    if (n + 1) * (n + 1) > max_cells:
+        for r in range(k):
+            res = dtw_path(X[r], Y[r], window, psi)
+            out[r] = res.distance, res.r_warped, res.lag, len(res.path)
+        return out
+    step = max_cells // ((n + 1) * (n + 1))
+    for lo in range(0, k, step):
+        out[lo:lo + step] = _batch_block(X[lo:lo + step], Y[lo:lo + step], window, psi)
+    return out
+
+def _batch_block(X, Y, window, psi):
+    k, n = X.shape
+    if window is not None:
+        window = max(int(window), 1)
+    psi = int(psi or 0)
+    # A[:, i + 1, j + 1] is cell (i, j); the zero border row/column lets paths start within psi of (0, 0)
+    A = np.full((k, n + 1, n + 1), np.inf)
+    A[:, 0, :psi + 1] = 0.0
+    A[:, :psi + 1, 0] = 0.0
+    for d in range(2 * n - 1):
+        lo, hi = _diagonal_range(d, n, n, window)
+        if hi < lo:
+            continue
+        i = np.arange(lo, hi + 1)
+        j = d - i
+        best = np.minimum(np.minimum(A[:, i, j], A[:, i, j + 1]), A[:, i + 1, j])
+        A[:, i + 1, j + 1] = (X[:, i] - Y[:, j]) ** 2 + best
+    rows = np.arange(k)
+    ends = [(n - 1, j) for j in range(max(0, n - 1 - psi), n)] + [(i, n - 1) for i in range(max(0, n - 1 - psi), n - 1)]
+    ei, ej = (np.array(c) for c in zip(*ends))
+    E = A[:, ei + 1, ej + 1]
+    first = np.argmin(E, axis=1)
+    total = E[rows, first]
+    out = np.full((k, 4), np.nan)
+    out[:, 0] = np.where(np.isfinite(total), np.sqrt(total), np.inf)
+    # backtrack every pair at once; paths are stored end first, padded with -1
+    width = 2 * n - 1
+    Pi, Pj = np.full((k, width), -1), np.full((k, width), -1)
+    bi, bj = ei[first], ej[first]
+    length = np.isfinite(total).astype(np.int64)
+    Pi[:, 0], Pj[:, 0] = np.where(length > 0, bi, -1), np.where(length > 0, bj, -1)
+    for s in range(1, width):
+        moving = (length == s) & ~(((bi == 0) & (bj <= psi)) | ((bj == 0) & (bi <= psi)))
+        if not moving.any():
+            break
+        diag, up, left = A[rows, bi, bj], A[rows, bi, bj + 1], A[rows, bi + 1, bj]
+        # ties prefer the diagonal step, then the vertical one
+        di = (bj == 0) | ((bi > 0) & (diag <= np.minimum(up, left))) | ((bi > 0) & (up <= left))
+        dj = (bi == 0) | ((bj > 0) & (diag <= np.minimum(up, left))) | ((bj > 0) & ~(up <= left))
+        bi, bj = np.where(moving, bi - di, bi), np.where(moving, bj - dj, bj)
+        Pi[moving, s], Pj[moving, s] = bi[moving], bj[moving]
+        length += moving
+    out[:, 3] = length
+    mask = Pi >= 0
+    xa = np.where(mask, X[rows[:, None], np.maximum(Pi, 0)], 0.0)
+    ya = np.where(mask, Y[rows[:, None], np.maximum(Pj, 0)], 0.0)
+    with np.errstate(invalid="ignore", divide="ignore"):
+        N = length.astype(np.float64)
+        xm = np.where(mask, xa - xa.sum(axis=1, keepdims=True) / N[:, None], 0.0)
+        ym = np.where(mask, ya - ya.sum(axis=1, keepdims=True) / N[:, None], 0.0)
+        sxx, syy = (xm * xm).sum(axis=1), (ym * ym).sum(axis=1)
+        r = np.clip((xm * ym).sum(axis=1) / np.sqrt(sxx * syy), -1.0, 1.0)
+        ok = length >= 2
+        out[:, 1] = np.where(ok & (sxx > 0) & (syy > 0), r, np.nan)
+        out[:, 2] = np.where(ok, np.where(mask, Pj - Pi, 0).sum(axis=1) / N, np.nan)
+    return out
@@ -0,0 +1,214 @@
+
+# Corpus-wide DTW similarity search over one C_t curve per dialogue: top-k retrieval with an
+# LB_Kim -> LB_Keogh -> early-abandoning DTW cascade, and an all-pairs condensed distance
+# matrix written in parallel to a memory-mapped file that later runs reuse.
+import hashlib, os
+from concurrent.futures import ProcessPoolExecutor
+import numpy as np
+import pandas as pd
+from dtaidistance import dtw
+from tie_dialog.corpus import as_corpus, resolve_jobs
+from tie_dialog.dtw_analysis import _HAS_C, _c_buffer, dtw_distance
+
+CURVES = ("human", "model")
+
+def znormalize(x, offsets) -> np.ndarray:
+    """Each dialogue block of x shifted to mean 0 and scaled to unit (population) std; constant blocks become 0."""
+    x = np.asarray(x, dtype=np.float64)
+    lengths = np.diff(offsets)
+    d = np.repeat(np.arange(len(lengths)), lengths)
+    n = np.maximum(lengths, 1)
+    mean = np.bincount(d, weights=x, minlength=len(lengths)) / n
+    dev = x - mean[d]
+    std = np.sqrt(np.bincount(d, weights=dev * dev, minlength=len(lengths)) / n)
+    with np.errstate(invalid="ignore", divide="ignore"):
+        return np.where(std[d] > 0, dev / std[d], 0.0)
+
+def _series(data, curve, znorm):
+    if curve not in CURVES:
+        raise ValueError(f"unknown curve: {curve} (expected one of {CURVES})")
+    corpus = as_corpus(data)
+    x = corpus.human_ct if curve == "human" else corpus.model_ct
+    x = znormalize(x, corpus.offsets) if znorm else np.asarray(x, dtype=np.float64)
+    return corpus, _c_buffer(x)
+
+def _band(n, m, window):
+    """Rows i of an n-long query allowed for each row j of an m-long candidate (dtaidistance's band)."""
+    j = np.arange(m)
+    if window is None:
+        return np.zeros(m, dtype=np.int64), np.full(m, n - 1)
+    w = max(int(window), 1)
+    a, b = max(0, n - m), max(0, m - n)
+    return np.maximum(j - (b + w - 1), 0), np.minimum(j + (a + w - 1), n - 1)
+
+def _envelope(q, m, window):
+    """Lower and upper envelope of the query q over the band of every row of an m-long candidate."""
+    lo, hi = _band(len(q), m, window)
+    width = int((hi - lo).max()) + 1
+    pad = np.concatenate((q, np.full(width, np.nan)))
+    view = np.lib.stride_tricks.sliding_window_view(pad, width)[lo]
+    inside = np.arange(width) <= (hi - lo)[:, None]
+    return np.where(inside, view, np.inf).min(axis=1), np.where(inside, view, -np.inf).max(axis=1)
+
+class DTWIndex:
+    """Nearest dialogues by DTW distance between one C_t curve per dialogue (z-normalized by default).
+
+    The lower bounds assume psi = 0, since psi lets a path skip turns at either end;
+    with psi > 0 every candidate goes straight to the (early-abandoning) DTW.
+    """
+    def __init__(self, data, curve="model", znorm=True, window=None, psi=0):
+        self.corpus, self.values = _series(data, curve, znorm)
+        self.znorm, self.window, self.psi = znorm, window, int(psi or 0)
+        offsets = self.corpus.offsets
+        self.lengths = self.corpus.lengths
+        has = self.lengths > 0
+        self.first, self.last = np.full(len(has), np.nan), np.full(len(has), np.nan)
+        self.first[has], self.last[has] = self.values[offsets[:-1][has]], self.values[offsets[1:][has] - 1]
+
+    def __len__(self):
+        return self.corpus.n_dialogues
+
+    def series(self, i) -> np.ndarray:
+        return self.values[self.corpus.offsets[i]:self.corpus.offsets[i + 1]]
+
+    def _lb_kim(self, q, cand):
+        # first and last cells lie on every warping path
+        if self.psi:
+            return np.zeros(len(cand))
+        both = (len(q) > 1) | (self.lengths[cand] > 1)
+        return np.sqrt((q[0] - self.first[cand]) ** 2 + np.where(both, (q[-1] - self.last[cand]) ** 2, 0.0))
+
+    def _lb_keogh(self, q, cand):
+        # every candidate row lies on the path, so it pays at least its distance to the query envelope; one pass per length
+        out = np.zeros(len(cand))
+        if self.psi or not len(cand):
+            return out
+        lengths = self.lengths[cand]
+        for m in np.unique(lengths):
+            sel = np.flatnonzero(lengths == m)
+            lower, upper = _envelope(q, int(m), self.window)
+            C = self.values[self.corpus.offsets[cand[sel]][:, None] + np.arange(m)]
+            excess = np.maximum(C - upper, 0) + np.maximum(lower - C, 0)
+            out[sel] = np.sqrt((excess * excess).sum(axis=1))
+        return out
+
+    def query(self, q, k=5, exclude=None) -> pd.DataFrame:
+        """The k dialogues closest to the series q (rank, dialogue_id, dist), exact under the index's window/psi.
+
+        `q` is z-normalized like the corpus. `exclude` lists dialogue ids to skip. The
+        counts of candidates pruned by each bound, abandoned inside DTW and fully
+        computed are in `.attrs["stats"]`.
+        """
+        q = np.asarray(q, dtype=np.float64)
+        q = _c_buffer(znormalize(q, [0, len(q)]) if self.znorm else q)
+        keep = self.lengths > 0
+        if exclude is not None:
+            keep &= ~self.corpus.dialogue_ids.isin(pd.Index(np.atleast_1d(exclude)))
+        cand = np.flatnonzero(keep)
+        stats = dict(candidates=len(cand), pruned_kim=0, pruned_keogh=0, abandoned=0, dtw=0)
+        best_d, best_i = [], []
+
+        def visit(i, bound):
+            d = dtw_distance(q, self.series(i), self.window, self.psi, max_dist=bound if np.isfinite(bound) else None)
+            stats["dtw"] += 1
+            if not d < bound:
+                stats["abandoned"] += 1
+                return bound
+            pos = int(np.searchsorted(best_d, d, side="right"))
+            best_d.insert(pos, d); best_i.insert(pos, i)
+            del best_d[k:], best_i[k:]
+            return best_d[-1] if len(best_d) == k else np.inf
+
+        # seed the k-th best distance with the candidates of smallest LB_Kim, then prune the rest
+        kim = self._lb_kim(q, cand)
+        order = np.argsort(kim, kind="stable")
+        bsf = np.inf
+        for i in cand[order[:k]]:
+            bsf = visit(i, bsf)
+        rest, kim = cand[order[k:]], kim[order[k:]]
+        alive = kim < bsf
+        stats["pruned_kim"] = int((~alive).sum())
+        rest = rest[alive]
+        keogh = np.maximum(self._lb_keogh(q, rest), kim[alive])
+        order = np.argsort(keogh, kind="stable")
+        for n_done, (i, lb) in enumerate(zip(rest[order], keogh[order])):
+            if lb >= bsf:
+                stats["pruned_keogh"] += len(order) - n_done
+                break
+            bsf = visit(i, bsf)
+        out = pd.DataFrame(dict(rank=np.arange(1, len(best_d) + 1), dialogue_id=self.corpus.dialogue_ids[np.asarray(best_i, dtype=np.int64)], dist=best_d))
+        out.attrs["stats"] = stats
+        return out
+
+    def neighbors(self, dialogue_id, k=5) -> pd.DataFrame:
+        """The k dialogues closest to `dialogue_id`, itself excluded."""
+        i = self.corpus.dialogue_ids.get_loc(dialogue_id)
+        return self.query(self.series(i), k, exclude=[dialogue_id])
+
+def condensed_index(i, j, n):
+    """Position of pair (i, j), i < j, in a condensed matrix (scipy.spatial.distance.squareform order)."""
+    return n * i - i * (i + 1) // 2 + (j - i - 1)
+
+def _row_start(i, n):
+    return n * i - i * (i + 1) // 2
+
+def _matrix_rows(values, offsets, lo, hi, window, psi, path):
+    """Rows lo..hi of the condensed matrix into the memmap at path."""
+    n = len(offsets) - 1
+    series = [values[offsets[i]:offsets[i + 1]] for i in range(n)]
+    block = ((lo, hi), (0, n))
+    if _HAS_C:
+        D = dtw.distance_matrix_fast(series, block=block, compact=True, parallel=False, window=window, psi=psi)
+    else:
+        D = dtw.distance_matrix(series, block=block, compact=True, window=window, psi=psi, use_c=False)
+    out = np.memmap(path, dtype=np.float64, mode="r+", shape=(n * (n - 1) // 2,))
+    out[_row_start(lo, n):_row_start(hi, n)] = D
+    out.flush()
+
+def _row_blocks(lengths, parts, max_pairs=1 << 22):
+    """Row ranges with about the same number of DTW cells, each holding at most max_pairs pairs."""
+    n = len(lengths)
+    cost = lengths.astype(np.float64) * (lengths.sum() - np.cumsum(lengths))
+    pairs = n - 1 - np.arange(n)
+    n_blocks = max(parts, int(np.ceil(pairs.sum() / max_pairs)))
+    cuts = np.searchsorted(np.cumsum(cost), cost.sum() * np.arange(1, n_blocks) / n_blocks)
+    return np.unique(np.concatenate(([0], cuts, [n])))
+
+def pairwise_matrix(data, cache_dir, curve="model", znorm=True, window=None, psi=0, jobs=1) -> np.memmap:
+    """All-pairs DTW distances as a read-only memory-mapped condensed matrix (squareform order, corpus order).
+
+    The file under cache_dir is named by a hash of the series, window and psi, so a
+    later run over the same curves opens it instead of recomputing. It is written
+    to a temporary name and renamed once complete. Feed it to
+    scipy.cluster.hierarchy.linkage to cluster the corpus (see cluster_dialogues).
+    """
+    corpus, values = _series(data, curve, znorm)
+    offsets, n = corpus.offsets, corpus.n_dialogues
+    h = hashlib.blake2b(digest_size=16)
+    for part in (values, offsets.astype(np.int64), np.asarray([-1 if window is None else window, psi or 0])):
+        h.update(np.ascontiguousarray(part).tobytes())
+    path = os.path.join(cache_dir, f"dtw-pairs-{h.hexdigest()}.f64")
+    size = n * (n - 1) // 2
+    if not os.path.exists(path):
+        os.makedirs(cache_dir, exist_ok=True)
+        tmp = f"{path}.{os.getpid()}.tmp"
+        np.memmap(tmp, dtype=np.float64, mode="w+", shape=(max(size, 1),)).flush()
+        jobs = resolve_jobs(jobs)
+        bounds = _row_blocks(corpus.lengths, 4 * jobs if jobs > 1 else 1)
+        ranges = [(lo, hi) for lo, hi in zip(bounds[:-1], bounds[1:]) if hi > lo]
+        if jobs == 1 or len(ranges) < 2:
+            for lo, hi in ranges:
+                _matrix_rows(values, offsets, lo, hi, window, psi, tmp)
+        else:
+            with ProcessPoolExecutor(max_workers=jobs) as ex:
+                for f in [ex.submit(_matrix_rows, values, offsets, lo, hi, window, psi, tmp) for lo, hi in ranges]:
+                    f.result()
+        os.replace(tmp, path)
+    return np.memmap(path, dtype=np.float64, mode="r", shape=(max(size, 1),))[:size]
+
+def cluster_dialogues(data, D, n_clusters, method="average") -> pd.DataFrame:
+    """Hierarchical clusters (dialogue_id, cluster from 1) cut from a condensed distance matrix."""
+    from scipy.cluster.hierarchy import fcluster, linkage
+    ids = as_corpus(data).dialogue_ids
+    labels = fcluster(linkage(np.asarray(D), method=method), n_clusters, criterion="maxclust") if len(ids) > 1 else np.ones(len(ids), dtype=np.int64)
+    return pd.DataFrame(dict(dialogue_id=ids.to_numpy(), cluster=labels))
@@ -0,0 +1,182 @@
+
+# Events of any number of raters (annotators, TIE-Dialog) as sorted integer arrays keyed by
+# (rater, kind, dialogue, turn), and rater × rater F1 and Cohen's κ for every window at once.
+import re
+from dataclasses import dataclass
+import numpy as np
+import pandas as pd
+from tie_dialog.agreement import CONFUSION_COLUMNS, kappa_from_confusion
+from tie_dialog.events import KINDS, SPEAKERS, _TURN_BIAS, EventArrays, _nearest, _prf
+
+WIDE_COLUMN = re.compile(rf"^(.+)_({'|'.join(KINDS)})$")   # <rater>_peak, <rater>_valley
+PAIR_COLUMNS = ["n_ref","n_sys","tp_ref","tp_sys"] + CONFUSION_COLUMNS
+
+@dataclass
+class RaterEvents:
+    """One entry per (rater, kind, dialogue, turn) event, sorted in that order without duplicates.
+
+    `n_turns[d]` is the number of annotated turns of dialogue d, the item count behind κ.
+    """
+    rater: np.ndarray        # int16, index into raters
+    kind: np.ndarray         # int8, index into KINDS
+    dialogue: np.ndarray     # int32, index into dialogue_ids
+    turn: np.ndarray         # int32
+    raters: np.ndarray
+    dialogue_ids: np.ndarray
+    n_turns: np.ndarray      # int64 per dialogue
+
+    def __len__(self):
+        return len(self.turn)
+
+    @property
+    def key(self) -> np.ndarray:
+        return _key(self.rater, self.kind, self.dialogue, self.turn, len(self.dialogue_ids))
+
+    @classmethod
+    def build(cls, rater, kind, dialogue, turn, raters, dialogue_ids, n_turns) -> "RaterEvents":
+        """Sort and deduplicate raw parallel arrays."""
+        n_d = len(dialogue_ids)
+        key = np.unique(_key(np.asarray(rater), np.asarray(kind), np.asarray(dialogue), np.asarray(turn), n_d))
+        group = key >> 32
+        return cls((group // (len(KINDS) * n_d)).astype(np.int16), (group // n_d % len(KINDS)).astype(np.int8),
+                   (group % n_d).astype(np.int32), ((key & 0xFFFFFFFF) - _TURN_BIAS).astype(np.int32),
+                   np.asarray(raters), np.asarray(dialogue_ids), np.asarray(n_turns, dtype=np.int64))
+
+    @classmethod
+    def from_event_arrays(cls, ev: EventArrays, names=None, n_turns=None) -> "RaterEvents":
+        """Speakers of `ev` as raters; `names` maps speaker to rater name, and unmapped speakers are dropped."""
+        names = dict(zip(SPEAKERS, SPEAKERS)) if names is None else names
+        code = np.array([SPEAKERS.index(s) for s in names])
+        keep = np.isin(ev.speaker, code)
+        rater = np.searchsorted(code[np.argsort(code)], ev.speaker[keep])
+        raters = np.asarray(list(names.values()))[np.argsort(code)]
+        n_turns = np.zeros(len(ev.dialogue_ids), dtype=np.int64) if n_turns is None else n_turns
+        return cls.build(rater, ev.kind[keep], ev.dialogue[keep], ev.turn[keep], raters, ev.dialogue_ids, n_turns)
+
+def _key(rater, kind, dialogue, turn, n_d):
+    group = (rater.astype(np.int64) * len(KINDS) + kind) * n_d + dialogue
+    return group << 32 | (turn.astype(np.int64) + _TURN_BIAS)
+
+def _turn_counts(frame: pd.DataFrame, dialogue_ids) -> np.ndarray:
+    per = frame.drop_duplicates(["dialogue_id","turn"]).groupby("dialogue_id", sort=False, observed=True).size()
+    return per.reindex(dialogue_ids, fill_value=0).to_numpy(dtype=np.int64)
+
+def from_wide(df: pd.DataFrame, grid: pd.DataFrame = None) -> RaterEvents:
+    """One row per (dialogue_id, turn) with a 0/1 column <rater>_<kind> per rater and kind.
+
+    The annotator workbook (annotator_1_peak, ...) and the events CSV (human_peak,
+    machine_valley, ...) both have this layout. Turns are counted from `grid` when
+    given, otherwise from the rows of `df`.
+    """
+    cols = [(c, m.group(1), KINDS.index(m.group(2))) for c in df.columns if (m := WIDE_COLUMN.match(str(c)))]
+    if not cols:
+        raise ValueError(f"no <rater>_<kind> columns for kinds {KINDS}")
+    raters = pd.unique(pd.Series([r for _, r, _ in cols]))
+    dialogue_ids = pd.unique(df["dialogue_id"])
+    d = pd.Index(dialogue_ids).get_indexer(df["dialogue_id"])
+    rows, j = np.nonzero(df[[c for c, _, _ in cols]].fillna(0).to_numpy() > 0)
+    rater = pd.Index(raters).get_indexer([r for _, r, _ in cols])[j]
+    kind = np.array([k for _, _, k in cols])[j]
+    return RaterEvents.build(rater, kind, d[rows], df["turn"].to_numpy()[rows], raters, dialogue_ids,
+                             _turn_counts(df if grid is None else grid, dialogue_ids))
+
+def from_long(df: pd.DataFrame, grid: pd.DataFrame = None) -> RaterEvents:
+    """Rows (dialogue_id, turn, rater) with peak/valley flag columns, or one row per event with a `kind` column.
+
+    Without `grid`, turns are counted from the rows of `df`, which only covers every
+    turn in the flag layout.
+    """
+    if "kind" in df.columns:
+        events = df
+        kind = pd.Index(KINDS).get_indexer(events["kind"])
+        if (kind < 0).any():
+            raise ValueError(f"unknown event kinds: {sorted(set(events['kind'][kind < 0]))} (expected {KINDS})")
+    else:
+        flags = df[list(KINDS)].fillna(0).to_numpy() > 0
+        rows, kind = np.nonzero(flags)
+        events = df.iloc[rows]
+    raters = pd.unique(df["rater"])
+    dialogue_ids = pd.unique(df["dialogue_id"])
+    return RaterEvents.build(pd.Index(raters).get_indexer(events["rater"]), kind, pd.Index(dialogue_ids).get_indexer(events["dialogue_id"]),
+                             events["turn"].to_numpy(), raters, dialogue_ids, _turn_counts(df if grid is None else grid, dialogue_ids))
+
+def load_rater_events(path: str, grid: pd.DataFrame = None, sheet=0) -> RaterEvents:
+    """Long (with a `rater` column) or wide rater file: CSV, parquet or XLSX (needs openpyxl)."""
+    if path.endswith((".xlsx", ".xls")):
+        df = pd.read_excel(path, sheet_name=sheet)
+    elif path.endswith((".parquet", ".pq")):
+        df = pd.read_parquet(path)
+    else:
+        df = pd.read_csv(path)
+    return (from_long if "rater" in df.columns else from_wide)(df, grid)
+
+def combine(*stores: RaterEvents) -> RaterEvents:
+    """Union of the stores: raters and dialogues are matched by name, turn counts take the maximum."""
+    raters = pd.unique(np.concatenate([s.raters for s in stores]))
+    dialogue_ids = pd.Index(pd.unique(np.concatenate([s.dialogue_ids for s in stores])))
+    n_turns = np.zeros(len(dialogue_ids), dtype=np.int64)
+    parts = []
+    for s in stores:
+        d = dialogue_ids.get_indexer(s.dialogue_ids)
+        np.maximum.at(n_turns, d, s.n_turns)
+        parts.append((pd.Index(raters).get_indexer(s.raters)[s.rater], s.kind, d[s.dialogue], s.turn))
+    return RaterEvents.build(*(np.concatenate(a) for a in zip(*parts)), raters, dialogue_ids.to_numpy(), n_turns)
+
+def pairwise_counts(store: RaterEvents, windows, by_dialogue=False) -> np.ndarray:
+    """(len(windows), groups, kinds, R, R, 8) PAIR_COLUMNS counts, reference rater first.
+
+    Every event is looked up once against each rater's events of the same dialogue and
+    kind; the distance to the nearest one decides all windows. With H[a, b] = events of
+    a with an event of b within ±w turns, the pair (ref a, sys b) has tp_ref = H[a, b],
+    tp_sys = H[b, a], and the κ confusion of the tolerant labels of kappa_by_window:
+    n11 = H[a, b], n10 = N[a] - H[a, b], n01 = N[b] - H[b, a], n00 = the remaining turns.
+    Groups are the dialogues with `by_dialogue`, else the whole corpus.
+    """
+    R, K, n_d = len(store.raters), len(KINDS), len(store.dialogue_ids)
+    key = store.key
+    n_g = n_d if by_dialogue else 1
+    g = store.dialogue.astype(np.int64) if by_dialogue else np.zeros(len(key), dtype=np.int64)
+    group_ab = ((g * K + store.kind) * R + store.rater)[:, None] * R + np.arange(R)
+    # the same (kind, dialogue, turn) under every rater b, searched in one call
+    query = _key(np.broadcast_to(np.arange(R, dtype=np.int16), (len(key), R)), store.kind[:, None],
+                 store.dialogue[:, None], store.turn[:, None], n_d)
+    dist = _nearest(query.reshape(-1), key)[1]
+    n_ev = np.bincount((g * K + store.kind) * R + store.rater, minlength=n_g * K * R).reshape(n_g, K, R)
+    items = store.n_turns if by_dialogue else store.n_turns.sum(keepdims=True)
+    out = np.zeros((len(windows), n_g, K, R, R, len(PAIR_COLUMNS)), dtype=np.int64)
+    for i, w in enumerate(windows):
+        H = np.bincount(group_ab.reshape(-1), weights=dist <= int(w), minlength=n_g * K * R * R).reshape(n_g, K, R, R).astype(np.int64)
+        Ht = H.transpose(0, 1, 3, 2)
+        n_ref, n_sys = np.broadcast_to(n_ev[:, :, :, None], H.shape), np.broadcast_to(n_ev[:, :, None, :], H.shape)
+        n01, n10 = n_sys - Ht, n_ref - H
+        n00 = items[:, None, None, None] - H - n01 - n10
+        out[i] = np.stack([n_ref, n_sys, H, Ht, n00, n01, n10, H], axis=-1)
+    return out
+
+def pairwise_agreement(store: RaterEvents, windows, by_dialogue=False) -> pd.DataFrame:
+    """Precision/recall/F1 and Cohen's κ of every (ref, sys) rater pair per window and kind.
+
+    Tolerant matching in turns, as match_counts_by_window; κ counts as kappa_by_window.
+    Kind "all" pools the counts of both kinds. Rows per dialogue with `by_dialogue`.
+    """
+    windows = [int(w) for w in windows]
+    C = pairwise_counts(store, windows, by_dialogue)
+    C = np.concatenate([C, C.sum(axis=2, keepdims=True)], axis=2)
+    W, G, K, R = C.shape[:4]
+    index = pd.MultiIndex.from_product([windows, range(G), list(KINDS) + ["all"], store.raters, store.raters],
+                                       names=["window","dialogue_id","kind","ref","sys"])
+    out = pd.DataFrame(C.reshape(-1, len(PAIR_COLUMNS)), index=index, columns=PAIR_COLUMNS).reset_index()
+    if by_dialogue:
+        out["dialogue_id"] = store.dialogue_ids[out["dialogue_id"].to_numpy()]
+    else:
+        out = out.drop(columns="dialogue_id")
+    p, r, f = _prf(*(out[c].to_numpy() for c in ("tp_sys","n_sys","tp_ref","n_ref")))
+    out["precision"], out["recall"], out["f1"] = p, r, f
+    out["kappa"] = kappa_from_confusion(out[CONFUSION_COLUMNS].to_numpy().reshape(-1, 2, 2))
+    return out
+
+def agreement_matrix(table: pd.DataFrame, value="f1", window=None, kind="all") -> pd.DataFrame:
+    """ref × sys matrix of one pairwise_agreement column (largest window by default)."""
+    window = table["window"].max() if window is None else window
+    sel = table[(table["window"] == window) & (table["kind"] == kind)]
+    return sel.pivot(index="ref", columns="sys", values=value).reindex(index=pd.unique(sel["ref"]), columns=pd.unique(sel["sys"]))
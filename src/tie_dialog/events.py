@@ -1,46 +1,342 @@
 
 import pandas as pd
 import numpy as np
-from scipy.signal import find_peaks
-
-def detect_events(ct_df: pd.DataFrame, prominence=0.08, min_distance=2):
-    rows = []
-    for did, part in ct_df.groupby("dialogue_id"):
-        # Peaks for human & model
-        for who in ["human_ct","model_ct"]:
-            y = part[who].values
-            peaks, _ = find_peaks(y, prominence=prominence, distance=min_distance)
-            valleys, _ = find_peaks(-y, prominence=prominence, distance=min_distance)
-            for p in peaks:
-                rows.append({"dialogue_id": did, "turn": int(part.iloc[p]["turn"]), f"{who.split('_')[0]}_peak": 1, f"{who.split('_')[0]}_valley": 0})
-            for v in valleys:
-                rows.append({"dialogue_id": did, "turn": int(part.iloc[v]["turn"]), f"{who.split('_')[0]}_peak": 0, f"{who.split('_')[0]}_valley": 1})
-    ev = pd.DataFrame(rows).fillna(0)
-    # pivot to single row per (dialogue_id, turn)
-    if ev.empty:
-        return ct_df[["dialogue_id","turn"]].assign(human_peak=0,human_valley=0,machine_peak=0,machine_valley=0)
-    ev = ev.groupby(["dialogue_id","turn"]).sum(numeric_only=True).reset_index()
-    # Ensure all cols
-    for c in ["human_peak","human_valley","machine_peak","machine_valley"]:
-        if c not in ev.columns: ev[c]=0
-    return ev[["dialogue_id","turn","human_peak","human_valley","machine_peak","machine_valley"]]
-
-def match_events(ev_h, ev_m, window):
-    # Return matches within ±window turns
-    matches = 0
-    total = 0
-    for kind in ["peak","valley"]:
-        a = set(tuple(x) for x in ev_h.query(f"human_{kind}==1")[["dialogue_id","turn"]].to_numpy())
-        b = set(tuple(x) for x in ev_m.query(f"machine_{kind}==1")[["dialogue_id","turn"]].to_numpy())
-        total += len(a)
-        if window == 0:
-            matches += len(a & b)
+from dataclasses import dataclass
+from typing import Optional
+from scipy.signal import find_peaks, peak_prominences
+from tie_dialog.corpus import as_corpus
+
+KINDS = ("peak", "valley")
+SPEAKERS = ("human", "machine")
+EVENT_FLAGS = ["human_peak","human_valley","machine_peak","machine_valley"]
+
+@dataclass
+class EventArrays:
+    """Events as parallel integer arrays; `dialogue` indexes into `dialogue_ids`."""
+    dialogue: np.ndarray     # int32
+    turn: np.ndarray         # int32
+    kind: np.ndarray         # int8, index into KINDS
+    speaker: np.ndarray      # int8, index into SPEAKERS
+    dialogue_ids: np.ndarray
+    prominence: Optional[np.ndarray] = None
+
+    def __len__(self):
+        return len(self.turn)
+
+    def select(self, mask) -> "EventArrays":
+        return EventArrays(self.dialogue[mask], self.turn[mask], self.kind[mask], self.speaker[mask],
+                           self.dialogue_ids, None if self.prominence is None else self.prominence[mask])
+
+    def to_frame(self, grid: pd.DataFrame = None) -> pd.DataFrame:
+        """One row per (dialogue_id, turn) with events; every row of `grid` when given (dense view)."""
+        flag = self.speaker.astype(np.int64) * 2 + self.kind
+        if grid is None:
+            key = self.dialogue.astype(np.int64) << 32 | (self.turn.astype(np.int64) & 0xFFFFFFFF)
+            uniq, inv = np.unique(key, return_inverse=True)
+            d = (uniq >> 32).astype(np.int64)
+            out = pd.DataFrame({"dialogue_id": self.dialogue_ids[d], "turn": (uniq & 0xFFFFFFFF).astype(np.uint32).astype(np.int32)})
         else:
-            # expand a by window and check membership
-            for (d,t) in a:
-                ok = any((d, t+shift) in b for shift in range(-window, window+1))
-                matches += 1 if ok else 0
-    precision = matches / (len(b) if len(b)>0 else 1)
-    recall = matches / (total if total>0 else 1)
-    f1 = 0 if (precision+recall)==0 else 2*precision*recall/(precision+recall)
-    return dict(window=window, precision=precision, recall=recall, f1=f1)
+            out = grid[["dialogue_id","turn"]].reset_index(drop=True)
+            inv = _grid_rows(self, out)
+        counts = np.zeros((len(out), 4), dtype=np.int64)
+        np.add.at(counts, (inv, flag), 1)
+        for i, c in enumerate(EVENT_FLAGS):
+            out[c] = counts[:, i]
+        return out
+
+    @classmethod
+    def from_frame(cls, ev: pd.DataFrame, dialogue_ids=None) -> "EventArrays":
+        """Expand a flag frame (human_peak, ..., machine_valley) into one entry per event."""
+        if dialogue_ids is None:
+            dialogue_ids = pd.unique(ev["dialogue_id"])
+        dialogue_ids = np.asarray(dialogue_ids)
+        d = pd.Index(dialogue_ids).get_indexer(ev["dialogue_id"])
+        flags = ev[EVENT_FLAGS].to_numpy()
+        rows, cols = np.nonzero(flags > 0)
+        keep = d[rows] >= 0
+        rows, cols = rows[keep], cols[keep]
+        return cls(d[rows].astype(np.int32), ev["turn"].to_numpy()[rows].astype(np.int32),
+                   (cols % 2).astype(np.int8), (cols // 2).astype(np.int8), dialogue_ids)
+
+def _grid_rows(ev: EventArrays, grid: pd.DataFrame) -> np.ndarray:
+    d = pd.Index(ev.dialogue_ids).get_indexer(grid["dialogue_id"]).astype(np.int64)
+    gkey = d << 32 | (grid["turn"].to_numpy().astype(np.int64) & 0xFFFFFFFF)
+    order = np.argsort(gkey, kind="stable")
+    ekey = ev.dialogue.astype(np.int64) << 32 | (ev.turn.astype(np.int64) & 0xFFFFFFFF)
+    pos = np.minimum(np.searchsorted(gkey[order], ekey), len(order) - 1)
+    if len(ekey) and (gkey[order][pos] != ekey).any():
+        raise ValueError("events reference turns missing from the grid")
+    return order[pos]
+
+def _fenced_buffer(channels, offsets, gap):
+    """All channels in one flat buffer, each dialogue segment preceded by `gap` +inf samples.
+
+    A peak's prominence search stops at the first higher sample, so no segment
+    sees its neighbours, and a fence wide enough keeps the fence peaks out of
+    min_distance of real ones. Returns the buffer, the channel block size and the
+    `wlen` that bounds the search for the fence peaks themselves.
+    """
+    n, n_d = len(channels[0]), len(offsets) - 1
+    block = n + gap * n_d
+    lengths = np.diff(offsets)
+    seg = np.repeat(np.arange(n_d, dtype=np.int64), lengths)
+    rowpos = np.arange(n, dtype=np.int64) + gap * (seg + 1)
+    buf = np.full(len(channels) * block + gap, np.inf)
+    for c, x in enumerate(channels):
+        buf[c * block + rowpos] = x
+    wlen = 2 * (int(lengths.max(initial=0)) + gap) + 1
+    return buf, block, wlen
+
+def _locate(pos, block, offsets, gap):
+    """(dialogue, row, channel) of buffer positions from _fenced_buffer."""
+    chan = pos // block
+    within = pos - chan * block
+    starts = offsets[:-1] + gap * np.arange(1, len(offsets))
+    d = np.searchsorted(starts, within, side="right") - 1
+    return d, within - gap * (d + 1), chan
+
+def _select_by_distance(pos, height, distance):
+    """Mask of the maxima at sorted `pos` that find_peaks(distance=...) keeps, ties going to the later one.
+
+    Highest first, every kept maximum drops the others closer than `distance`.
+    Only maxima with a neighbour that close can be dropped, so only they are walked.
+    """
+    n = len(pos)
+    distance = int(np.ceil(distance or 1))
+    if distance <= 1 or n < 2:
+        return np.ones(n, dtype=bool)
+    close = np.diff(pos) < distance
+    crowded = np.flatnonzero(np.r_[False, close] | np.r_[close, False])
+    order = crowded[np.lexsort((pos[crowded], height[crowded]))[::-1]]
+    keep, p = [True] * n, pos.tolist()
+    for i in order.tolist():
+        if not keep[i]:
+            continue
+        j = i - 1
+        while j >= 0 and p[i] - p[j] < distance:
+            keep[j] = False
+            j -= 1
+        j = i + 1
+        while j < n and p[j] - p[i] < distance:
+            keep[j] = False
+            j += 1
+    return np.asarray(keep, dtype=bool)
+
+def _detect_block(channels, offsets, turns, thresholds, min_distance):
+    """find_peaks over all dialogues and channels of a block at once (see _fenced_buffer)."""
+    gap = max(1, 2 * int(min_distance or 1))
+    buf, block, wlen = _fenced_buffer(channels, offsets, gap)
+    # find_peaks(buf, distance=min_distance, prominence=...) in its steps, so that equally high
+    # maxima closer than min_distance keep the later one; find_peaks ranks them with an
+    # unstable argsort, which decides such ties by the layout of the whole block
+    pos = find_peaks(buf)[0]
+    pos = pos[_select_by_distance(pos, buf[pos], min_distance)]
+    pos = pos[np.isfinite(buf[pos])]
+    prom = peak_prominences(buf, pos, wlen=wlen)[0]
+    keep = prom >= np.asarray(thresholds)[pos // block]
+    d, row, chan = _locate(pos[keep], block, offsets, gap)
+    return d, turns[row], chan, prom[keep]
+
+def detect_event_arrays(ct_df, prominence=0.08, min_distance=2, valley_prominence=None,
+                        chunk_rows: int = 1 << 22) -> EventArrays:
+    """Human/model peaks and valleys for every dialogue (of a C_t frame or DialogueCorpus) from one find_peaks pass per chunk."""
+    if valley_prominence is None:
+        valley_prominence = prominence
+    corpus = as_corpus(ct_df)
+    offsets = corpus.offsets
+    dialogue_ids = corpus.dialogue_ids.to_numpy()
+    turns = corpus.turn
+    h = corpus.human_ct.astype(np.float64)
+    m = corpus.model_ct.astype(np.float64)
+    # channel order: human peak, machine peak, human valley, machine valley
+    thresholds = (prominence, prominence, valley_prominence, valley_prominence)
+    parts = []
+    lo = 0
+    while lo < len(offsets) - 1:
+        hi = max(lo + 1, int(np.searchsorted(offsets, offsets[lo] + chunk_rows, side="right")) - 1)
+        hi = min(hi, len(offsets) - 1)
+        a, b = offsets[lo], offsets[hi]
+        sub = offsets[lo:hi + 1] - a
+        d, t, chan, prom = _detect_block((h[a:b], m[a:b], -h[a:b], -m[a:b]), sub, turns[a:b], thresholds, min_distance)
+        parts.append((d + lo, t, chan, prom))
+        lo = hi
+    if parts:
+        d, t, chan, prom = (np.concatenate(x) for x in zip(*parts))
+    else:
+        d, t, chan, prom = (np.zeros(0, dtype=np.int64),) * 3 + (np.zeros(0),)
+    order = np.lexsort((chan, t, d))
+    chan = chan[order]
+    return EventArrays(d[order].astype(np.int32), t[order].astype(np.int32), (chan // 2).astype(np.int8),
+                       (chan % 2).astype(np.int8), dialogue_ids, prom[order].astype(np.float32))
+
+def detect_events(ct_df, prominence=0.08, min_distance=2, valley_prominence=None):
+    ev = detect_event_arrays(ct_df, prominence, min_distance, valley_prominence)
+    if len(ev) == 0:
+        grid = as_corpus(ct_df).to_frame() if not isinstance(ct_df, pd.DataFrame) else ct_df
+        return grid[["dialogue_id","turn"]].assign(human_peak=0,human_valley=0,machine_peak=0,machine_valley=0)
+    return ev.to_frame()
+
+MATCH_MODES = ("tolerant", "greedy", "optimal")
+_TURN_BIAS = 1 << 31
+_FAR = np.int64(1) << 40
+COUNT_COLUMNS = ["n_ref","n_sys","tp_ref","tp_sys","fp","fn"]
+
+def _event_keys(ev: EventArrays, speaker: int):
+    """Sorted (dialogue, kind, turn) keys of one speaker's events; turns of one group are contiguous."""
+    mask = ev.speaker == speaker
+    group = ev.dialogue[mask].astype(np.int64) * len(KINDS) + ev.kind[mask]
+    return np.sort(group << 32 | (ev.turn[mask].astype(np.int64) + _TURN_BIAS))
+
+def _nearest(a, b):
+    """Index into sorted `b` of the nearest key for every key of `a` (ties go left) and its distance."""
+    if len(b) == 0:
+        return np.zeros(len(a), dtype=np.int64), np.full(len(a), _FAR)
+    i = np.searchsorted(b, a)
+    left = np.maximum(i - 1, 0)
+    right = np.minimum(i, len(b) - 1)
+    dl = np.where(i > 0, a - b[left], _FAR)
+    dr = np.where(i < len(b), b[right] - a, _FAR)
+    take_left = dl <= dr
+    return np.where(take_left, left, right), np.minimum(np.minimum(dl, dr), _FAR)
+
+def _greedy_pairs(a, b, window):
+    """Greedy nearest-first one-to-one pairs, built from rounds of mutual nearest neighbours."""
+    ra, rb = np.arange(len(a)), np.arange(len(b))
+    pa, pb = [], []
+    while len(ra) and len(rb):
+        ja, da = _nearest(a[ra], b[rb])
+        jb, _ = _nearest(b[rb], a[ra])
+        mutual = (jb[ja] == np.arange(len(ra))) & (da <= window)
+        if not mutual.any():
+            break
+        pa.append(ra[mutual]); pb.append(rb[ja[mutual]])
+        keep_b = np.ones(len(rb), dtype=bool)
+        keep_b[ja[mutual]] = False
+        ra, rb = ra[~mutual], rb[keep_b]
+    if not pa:
+        return np.zeros(0, dtype=np.int64), np.zeros(0, dtype=np.int64)
+    return np.concatenate(pa), np.concatenate(pb)
+
+def _optimal_counts(a, b, ia, ib, k, windows):
+    """(k, len(windows)) sizes of the maximum one-to-one matching per group and window.
+
+    Every window has the same width, so a sorted sweep per group is optimal; the sweeps
+    of all (group, window) lanes advance in lock-step, one vectorized step per event.
+    """
+    na, nb = np.bincount(ia, minlength=k), np.bincount(ib, minlength=k)
+    sa, sb = np.cumsum(na) - na, np.cumsum(nb) - nb
+    lane = np.arange(k * len(windows))
+    g, w = lane // len(windows), np.tile(np.asarray(windows, dtype=np.int64), k)
+    i, j = sa[g], sb[g]
+    ea, eb = sa[g] + na[g], sb[g] + nb[g]
+    hits = np.zeros(len(lane), dtype=np.int64)
+    live = (i < ea) & (j < eb)
+    lane, i, j, w, ea, eb = lane[live], i[live], j[live], w[live], ea[live], eb[live]
+    while len(lane):
+        d = b[j] - a[i]
+        pair = np.abs(d) <= w
+        hits[lane[pair]] += 1
+        i = i + (d >= -w)
+        j = j + (d <= w)
+        live = (i < ea) & (j < eb)
+        lane, i, j, w, ea, eb = lane[live], i[live], j[live], w[live], ea[live], eb[live]
+    return hits.reshape(k, len(windows))
+
+def _hits_by_window(idx, dist, k, windows):
+    """(k, len(windows)) counts of entries with dist <= w, from one histogram over distances."""
+    wmax = int(max(windows))
+    hist = np.bincount(idx * (wmax + 2) + np.minimum(dist, wmax + 1), minlength=k * (wmax + 2)).reshape(k, wmax + 2)
+    return np.cumsum(hist, axis=1)[:, np.asarray(windows, dtype=np.int64)]
+
+def match_counts_by_window(ev: EventArrays, windows, mode: str = "tolerant") -> pd.DataFrame:
+    """Human (reference) vs machine (system) matching counts per window, dialogue and kind.
+
+    tolerant: an event is a hit when the other side has any event within ±window;
+    greedy: one-to-one, nearest pairs first; optimal: one-to-one, maximum number of pairs.
+    Nearest distances (tolerant) and greedy pairs are computed once for the largest
+    window; every smaller window is a prefix of that result. Optimal sweeps every
+    (group, window) pair at once.
+    """
+    if mode not in MATCH_MODES:
+        raise ValueError(f"unknown matching mode: {mode} (expected one of {MATCH_MODES})")
+    windows = [int(w) for w in windows]
+    a, b = _event_keys(ev, 0), _event_keys(ev, 1)
+    ga, gb = a >> 32, b >> 32
+    groups = np.union1d(ga, gb)
+    k = len(groups)
+    ia, ib = np.searchsorted(groups, ga), np.searchsorted(groups, gb)
+    if mode == "tolerant":
+        tp_ref = _hits_by_window(ia, _nearest(a, b)[1], k, windows)
+        tp_sys = _hits_by_window(ib, _nearest(b, a)[1], k, windows)
+    elif mode == "greedy":
+        pa, pb = _greedy_pairs(a, b, max(windows))
+        tp_ref = tp_sys = _hits_by_window(ia[pa], np.abs(b[pb] - a[pa]), k, windows)
+    else:
+        tp_ref = tp_sys = _optimal_counts(a, b, ia, ib, k, windows)
+    n_ref, n_sys = np.bincount(ia, minlength=k), np.bincount(ib, minlength=k)
+    nw = len(windows)
+    out = pd.DataFrame({
+        "window": np.tile(windows, k),
+        "dialogue_id": np.repeat(ev.dialogue_ids[groups // len(KINDS)], nw),
+        "kind": np.repeat(np.asarray(KINDS)[groups % len(KINDS)], nw),
+        "n_ref": np.repeat(n_ref, nw), "n_sys": np.repeat(n_sys, nw),
+        "tp_ref": tp_ref.reshape(-1), "tp_sys": tp_sys.reshape(-1),
+    })
+    out["fp"] = out["n_sys"] - out["tp_sys"]
+    out["fn"] = out["n_ref"] - out["tp_ref"]
+    return out.sort_values(["window","dialogue_id","kind"], kind="stable").reset_index(drop=True)
+
+def match_counts(ev: EventArrays, window: int, mode: str = "tolerant") -> pd.DataFrame:
+    """Matching counts per dialogue and kind for a single window (see match_counts_by_window)."""
+    return match_counts_by_window(ev, [window], mode).drop(columns="window")
+
+def _prf(tp_sys, n_sys, tp_ref, n_ref):
+    precision = np.divide(tp_sys, n_sys, out=np.zeros(np.shape(n_sys)), where=np.asarray(n_sys) > 0)
+    recall = np.divide(tp_ref, n_ref, out=np.zeros(np.shape(n_ref)), where=np.asarray(n_ref) > 0)
+    denom = precision + recall
+    f1 = np.divide(2 * precision * recall, denom, out=np.zeros(np.shape(denom)), where=denom > 0)
+    return precision, recall, f1
+
+def f1_scores(counts: pd.DataFrame, average: str = "macro") -> dict:
+    """Precision/recall/F1 from match_counts rows: macro over (dialogue, kind) rows or micro over pooled counts."""
+    if average == "micro":
+        p, r, f = _prf(*(counts[c].sum() for c in ("tp_sys","n_sys","tp_ref","n_ref")))
+        return dict(precision=float(p), recall=float(r), f1=float(f))
+    if counts.empty:
+        return dict(precision=0.0, recall=0.0, f1=0.0)
+    p, r, f = _prf(*(counts[c].to_numpy() for c in ("tp_sys","n_sys","tp_ref","n_ref")))
+    return dict(precision=float(p.mean()), recall=float(r.mean()), f1=float(f.mean()))
+
+def _combine(ev_h: pd.DataFrame, ev_m: pd.DataFrame) -> EventArrays:
+    ids = pd.unique(pd.concat([ev_h["dialogue_id"], ev_m["dialogue_id"]], ignore_index=True))
+    h = EventArrays.from_frame(ev_h, ids)
+    m = EventArrays.from_frame(ev_m, ids)
+    h, m = h.select(h.speaker == 0), m.select(m.speaker == 1)
+    return EventArrays(*(np.concatenate((getattr(h, f), getattr(m, f))) for f in ("dialogue","turn","kind","speaker")), np.asarray(ids))
+
+def match_events(ev_h, ev_m, window, mode="tolerant"):
+    # Human events of ev_h vs machine events of ev_m within ±window turns, pooled over dialogues
+    counts = match_counts(_combine(ev_h, ev_m), window, mode)
+    return dict(window=window, **f1_scores(counts, "micro"))
+
+def dialogue_f1(counts: pd.DataFrame) -> pd.DataFrame:
+    """match_counts(_by_window) rows with precision/recall/F1 columns added."""
+    out = counts.copy()
+    p, r, f = _prf(*(out[c].to_numpy() for c in ("tp_sys","n_sys","tp_ref","n_ref")))
+    out["precision"], out["recall"], out["f1"] = p, r, f
+    return out
+
+def f1_summary(counts: pd.DataFrame) -> pd.DataFrame:
+    """Macro (over dialogues) and micro (pooled) scores per window and kind; kind "all" pools both kinds per dialogue."""
+    keys = ["window"] if "window" in counts.columns else []
+    cols = ["n_ref","n_sys","tp_ref","tp_sys"]
+    pooled = counts.groupby(keys + ["dialogue_id"], sort=False, observed=True)[cols].sum().reset_index().assign(kind="all")
+    per = dialogue_f1(pd.concat([counts[keys + ["dialogue_id","kind"] + cols], pooled], ignore_index=True))
+    g = per.groupby(keys + ["kind"], sort=False)
+    out = g[["precision","recall","f1"]].mean()
+    out.insert(0, "n_dialogues", g.size())
+    micro = g[cols].sum()
+    p, r, f = _prf(*(micro[c].to_numpy() for c in ("tp_sys","n_sys","tp_ref","n_ref")))
+    out["precision_micro"], out["recall_micro"], out["f1_micro"] = p, r, f
+    return out.reset_index().sort_values(keys + ["kind"], kind="stable").reset_index(drop=True)
+
@@ -0,0 +1,68 @@
+
+# Per-dialogue incremental recomputation: a dialogue's stored results are reused
+# while the fingerprint of its rows (plus the config sections they depend on) is unchanged.
+import hashlib, json, os, pickle
+import numpy as np
+import pandas as pd
+from tie_dialog import __version__
+from tie_dialog.corpus import dialogue_offsets
+
+def config_hash(**sections) -> int:
+    """64-bit hash of config sections; pass only the sections a result depends on."""
+    blob = json.dumps(dict(sections, _version=__version__), sort_keys=True, default=str)
+    return int.from_bytes(hashlib.blake2b(blob.encode("utf-8"), digest_size=8).digest(), "little")
+
+def dialogue_fingerprints(df: pd.DataFrame, columns, salt: int = 0) -> pd.Series:
+    """uint64 content hash per dialogue (index: dialogue_id) of its rows in `columns`, mixed with `salt`.
+
+    Rows are hashed by value (categorical ids by their labels), so adding or
+    removing other dialogues never changes a dialogue's fingerprint.
+    """
+    offsets = dialogue_offsets(df["dialogue_id"])
+    ids = pd.Index(df["dialogue_id"].to_numpy()[offsets[:-1]])
+    if len(df) == 0:
+        return pd.Series(np.zeros(0, dtype=np.uint64), index=ids)
+    rows = pd.util.hash_pandas_object(df[list(columns)], index=False).to_numpy()
+    with np.errstate(over="ignore"):
+        sums = np.add.reduceat(rows, offsets[:-1]) ^ np.uint64(salt)
+    # final avalanche so the linear row sum is not the stored value
+    return pd.Series(pd.util.hash_array(sums), index=ids)
+
+class DialogueStore:
+    """Result rows per dialogue with the fingerprint they were computed from, pickled under root/name."""
+    def __init__(self, root: str, name: str):
+        self.path = os.path.join(root, f"{name}.pkl")
+        self.ids, self.fps, self.table = pd.Index([]), np.zeros(0, dtype=np.uint64), None
+        if os.path.exists(self.path):
+            try:
+                with open(self.path, "rb") as f:
+                    self.ids, self.fps, self.table = pickle.load(f)
+            except Exception:
+                pass   # unreadable (e.g. written by another pandas version): start over
+
+    def stale(self, fingerprints: pd.Series) -> np.ndarray:
+        """Mask over `fingerprints` of dialogues that are new or whose fingerprint changed."""
+        pos = self.ids.get_indexer(fingerprints.index)
+        same = pos >= 0
+        same[same] = self.fps[pos[same]] == fingerprints.to_numpy()[same]
+        return ~same
+
+    def update(self, fingerprints: pd.Series, stale: np.ndarray, fresh: pd.DataFrame) -> pd.DataFrame:
+        """Stored rows of the up-to-date dialogues plus `fresh` rows for the stale ones; saved for the next run.
+
+        Dialogues no longer present in `fingerprints` are dropped; `fresh` may be None when nothing is stale.
+        """
+        keep = fingerprints.index[~stale]
+        parts = [] if self.table is None else [self.table[self.table["dialogue_id"].isin(keep)]]
+        if fresh is not None:
+            parts.append(fresh)
+        parts = [p for p in parts if len(p)] or parts[:1]
+        table = pd.concat(parts, ignore_index=True) if len(parts) > 1 else parts[0]
+        # rows follow the dialogue order of `fingerprints`, stable within a dialogue
+        table = table.iloc[np.argsort(fingerprints.index.get_indexer(table["dialogue_id"]), kind="stable")].reset_index(drop=True)
+        self.ids, self.fps, self.table = fingerprints.index, fingerprints.to_numpy(), table
+        os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+        with open(self.path + ".tmp", "wb") as f:
+            pickle.dump((self.ids, self.fps, self.table), f, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(self.path + ".tmp", self.path)
+        return table
@@ -0,0 +1,170 @@
+
+# Stage instrumentation for pipeline runs: wall/CPU time, RSS, optional tracemalloc
+# deltas and row/dialogue/event counts per stage, written to run_metrics.json.
+import cProfile, json, logging, os, pstats, sys, threading, time, tracemalloc
+from contextlib import contextmanager, nullcontext
+from dataclasses import asdict, dataclass, field
+from typing import Optional
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+def _max_rss_mb():
+    if resource is None:
+        return None
+    r = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return r / 2**20 if sys.platform == "darwin" else r / 2**10   # bytes on macOS, KiB elsewhere
+
+def _rss_mb():
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE") / 2**20
+    except (OSError, ValueError, AttributeError):
+        return None
+
+@dataclass
+class StageRecord:
+    name: str
+    parent: Optional[str] = None
+    seconds: float = 0.0
+    cpu_seconds: float = 0.0
+    rss_mb: Optional[float] = None            # resident set size when the stage ended
+    max_rss_mb: Optional[float] = None        # process peak RSS when the stage ended
+    max_rss_growth_mb: Optional[float] = None # how far the stage pushed the process peak up
+    traced_mb: Optional[float] = None         # tracemalloc: net allocation change over the stage
+    traced_peak_mb: Optional[float] = None    # tracemalloc: peak above the level at stage start
+    counts: dict = field(default_factory=dict)
+
+    def count(self, **counts):
+        for k, v in counts.items():
+            self.counts[k] = self.counts.get(k, 0) + int(v)
+
+class _NullStage:
+    def count(self, **counts):
+        pass
+
+_NULL_STAGE = nullcontext(_NullStage())   # reusable, so a disabled stage allocates nothing
+
+class Instrument:
+    """Context-managed stage timers.
+
+        inst = Instrument(profile_dir="artifacts/profile")
+        with inst.stage("load") as st:
+            ct = load_ct_series(path)
+            st.count(rows=len(ct))
+        inst.write("artifacts/run_metrics.json")
+
+    Stages nest per thread; each record names its parent. With `trace_memory` tracemalloc runs
+    for the whole instrumented run (it slows allocation-heavy Python code), and with
+    `profile_dir` every top-level stage is profiled into <profile_dir>/<stage>.prof
+    plus a cumulative-time listing. A disabled instrument hands out a no-op stage.
+    """
+
+    def __init__(self, enabled=True, trace_memory=False, profile_dir=None, log=None):
+        self.enabled = enabled
+        self.trace_memory = enabled and trace_memory
+        self.profile_dir = profile_dir if enabled else None
+        self.log = log or logging.getLogger("tie_dialog")
+        self.records = []
+        self._local = threading.local()   # open stages per thread, so concurrent DAG nodes each get their own
+        self._t0 = time.perf_counter()
+        self._started = time.strftime("%Y-%m-%dT%H:%M:%S")
+
+    def _open(self):
+        if not hasattr(self._local, "stack"):
+            self._local.stack, self._local.peaks = [], []
+        return self._local
+
+    @property
+    def _stack(self):
+        return self._open().stack
+
+    @property
+    def _peaks(self):
+        return self._open().peaks
+
+    def count(self, **counts):
+        """Add counts to the innermost open stage of this thread."""
+        if self._stack:
+            self._stack[-1].count(**counts)
+
+    def stage(self, name):
+        return self._stage(name) if self.enabled else _NULL_STAGE
+
+    @contextmanager
+    def _stage(self, name):
+        rec = StageRecord(name, parent=self._stack[-1].name if self._stack else None)
+        self.records.append(rec)
+        prof = None
+        if self.profile_dir and not self._stack:
+            prof = cProfile.Profile()
+        if self.trace_memory:
+            if not tracemalloc.is_tracing():
+                tracemalloc.start()
+            # fold the parent's peak so far into its running maximum before resetting
+            if self._stack:
+                self._peaks[-1] = max(self._peaks[-1], tracemalloc.get_traced_memory()[1])
+            tracemalloc.reset_peak()
+            traced0 = tracemalloc.get_traced_memory()[0]
+        self._stack.append(rec)
+        self._peaks.append(0)
+        rss0, t0, c0 = _max_rss_mb(), time.perf_counter(), time.process_time()
+        if prof:
+            prof.enable()
+        try:
+            yield rec
+        finally:
+            if prof:
+                prof.disable()
+            rec.seconds = time.perf_counter() - t0
+            rec.cpu_seconds = time.process_time() - c0
+            rec.rss_mb, rec.max_rss_mb = _rss_mb(), _max_rss_mb()
+            if rss0 is not None:
+                rec.max_rss_growth_mb = rec.max_rss_mb - rss0
+            self._stack.pop()
+            peak = self._peaks.pop()
+            if self.trace_memory:
+                current, since_reset = tracemalloc.get_traced_memory()
+                peak = max(peak, since_reset)
+                rec.traced_mb = (current - traced0) / 2**20
+                rec.traced_peak_mb = (peak - traced0) / 2**20
+                if self._peaks:
+                    self._peaks[-1] = max(self._peaks[-1], peak)
+                tracemalloc.reset_peak()
+            if prof:
+                self._dump_profile(prof, rec.name)
+            self.log.info(self._describe(rec))
+
+    def _dump_profile(self, prof, name):
+        os.makedirs(self.profile_dir, exist_ok=True)
+        base = os.path.join(self.profile_dir, name.replace("/", "_"))
+        prof.dump_stats(base + ".prof")
+        with open(base + ".txt", "w", encoding="utf-8") as f:
+            pstats.Stats(prof, stream=f).sort_stats("cumulative").print_stats(40)
+
+    @staticmethod
+    def _describe(rec):
+        parts = [f"{rec.seconds:.2f} s"]
+        if rec.rss_mb is not None:
+            parts.append(f"rss {rec.rss_mb:.0f} MB")
+        if rec.traced_peak_mb is not None:
+            parts.append(f"traced peak {rec.traced_peak_mb:.1f} MB")
+        parts += [f"{k}={v:,}" for k, v in rec.counts.items()]
+        return f"stage {rec.name}: " + ", ".join(parts)
+
+    def to_dict(self, **extra):
+        return dict(started=self._started, total_seconds=time.perf_counter() - self._t0, max_rss_mb=_max_rss_mb(),
+                    trace_memory=self.trace_memory, **extra, stages=[asdict(r) for r in self.records])
+
+    def write(self, path, **extra):
+        """Write the run summary as JSON (atomically); a no-op when disabled."""
+        if not self.enabled:
+            return None
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        tmp = path + ".tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump(self.to_dict(**extra), f, indent=2)
+        os.replace(tmp, path)
+        return path
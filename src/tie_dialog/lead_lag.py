@@ -0,0 +1,100 @@
+
+# Lead–lag between the human and model C_t curves from normalized cross-correlation.
+# Dialogues are zero-padded into power-of-two FFT length buckets and correlated as 2-D batches.
+import numpy as np
+import pandas as pd
+from tie_dialog.bootstrap import mean_intervals
+from tie_dialog.corpus import as_corpus
+
+def _fft_sizes(lengths):
+    # circular correlation equals the linear one once nfft >= 2n - 1
+    return 1 << np.ceil(np.log2(np.maximum(2 * lengths - 1, 1))).astype(np.int64)
+
+def _padded(x, offsets, idx, size):
+    """(len(idx), size) rows holding the dialogues `idx`, each demeaned and zero-padded."""
+    lens = np.diff(offsets)[idx]
+    rows = np.repeat(np.arange(len(idx)), lens)
+    cols = np.arange(lens.sum()) - np.repeat(np.cumsum(lens) - lens, lens)
+    out = np.zeros((len(idx), size))
+    out[rows, cols] = x[np.repeat(offsets[idx], lens) + cols]
+    with np.errstate(invalid="ignore", divide="ignore"):
+        out[rows, cols] -= (out.sum(axis=1) / lens)[rows]
+    return out
+
+def _blocks(h, m, offsets, max_lag, chunk_cells):
+    """(dialogue indices, normalized cross-correlation at lags -max_lag..max_lag) per FFT bucket."""
+    lengths = np.diff(offsets)
+    sizes = _fft_sizes(lengths)
+    lags = np.arange(-max_lag, max_lag + 1)
+    for size in np.unique(sizes):
+        members = np.flatnonzero(sizes == size)
+        step = max(1, chunk_cells // int(size))
+        for a in range(0, len(members), step):
+            idx = members[a:a + step]
+            H, M = _padded(h, offsets, idx, size), _padded(m, offsets, idx, size)
+            # IFFT(conj(H) M)[k] = sum_t h[t] m[t + k]; negative lags wrap to the end
+            cc = np.fft.irfft(np.conj(np.fft.rfft(H)) * np.fft.rfft(M), n=size)[:, lags % size]
+            with np.errstate(invalid="ignore", divide="ignore"):
+                r = cc / np.sqrt((H ** 2).sum(axis=1) * (M ** 2).sum(axis=1))[:, None]
+            r[np.abs(lags)[None, :] >= lengths[idx][:, None]] = np.nan
+            yield idx, r
+
+def _max_lag(offsets, max_lag):
+    return int(np.diff(offsets).max(initial=1)) - 1 if max_lag is None else int(max_lag)
+
+def cross_correlation(h, m, offsets, max_lag=3, chunk_cells=1 << 22) -> np.ndarray:
+    """(n_dialogues, 2 * max_lag + 1) normalized cross-correlation of every dialogue block of the flat arrays.
+
+    Column j is lag k = j - max_lag: the correlation of human turn t with model
+    turn t + k over the overlapping turns, normalized by the full-length norms
+    (the biased estimate). NaN where |k| >= the dialogue length or a curve is flat.
+    `max_lag=None` covers every lag of the longest dialogue.
+    """
+    h, m = np.asarray(h, dtype=np.float64), np.asarray(m, dtype=np.float64)
+    max_lag = _max_lag(offsets, max_lag)
+    out = np.full((len(offsets) - 1, 2 * max_lag + 1), np.nan)
+    for idx, r in _blocks(h, m, offsets, max_lag, chunk_cells):
+        out[idx] = r
+    return out
+
+def _peaks(r, max_lag, refine):
+    rows = np.arange(len(r))
+    ok = np.isfinite(r)
+    j = np.argmax(np.where(ok, r, -np.inf), axis=1)
+    found = ok.any(axis=1)
+    peak = np.where(found, r[rows, j], np.nan)
+    out = dict(lag=np.where(found, j - max_lag, np.nan), r_peak=peak, r_zero=r[:, max_lag])
+    if refine:
+        # parabola through the peak and its two neighbours; no shift at the edge of the lag range
+        left = np.where(j > 0, r[rows, np.maximum(j - 1, 0)], np.nan)
+        right = np.where(j < r.shape[1] - 1, r[rows, np.minimum(j + 1, r.shape[1] - 1)], np.nan)
+        denom = left - 2 * peak + right
+        with np.errstate(invalid="ignore", divide="ignore"):
+            delta = np.where(np.isfinite(denom) & (denom < 0), 0.5 * (left - right) / denom, 0.0)
+        delta = np.clip(delta, -0.5, 0.5)
+        out["lag_refined"] = out["lag"] + delta
+        out["r_refined"] = peak - 0.25 * np.where(delta != 0, (left - right) * delta, 0.0)
+    return out
+
+def lead_lag(df, max_lag=3, refine=True, chunk_cells=1 << 22) -> pd.DataFrame:
+    """Peak of the human/model cross-correlation per dialogue.
+
+    lag > 0 means the model trails the human curve (human-leading), the sign
+    convention of the DTW lag. With `refine`, a parabola through the peak and its
+    neighbours gives a sub-turn lag_refined and r_refined.
+    """
+    corpus = as_corpus(df)
+    offsets = corpus.offsets
+    h, m = corpus.human_ct.astype(np.float64), corpus.model_ct.astype(np.float64)
+    max_lag = _max_lag(offsets, max_lag)
+    n_d = len(offsets) - 1
+    cols = {c: np.full(n_d, np.nan) for c in ("lag", "r_peak", "r_zero") + (("lag_refined", "r_refined") if refine else ())}
+    for idx, r in _blocks(h, m, offsets, max_lag, chunk_cells):
+        for c, v in _peaks(r, max_lag, refine).items():
+            cols[c][idx] = v
+    return pd.DataFrame(dict(dialogue_id=corpus.dialogue_ids.to_numpy(), n_turns=corpus.lengths, **cols))
+
+def lead_lag_summary(table: pd.DataFrame, n_boot=10000, seed=0, alpha=0.05, jobs=1) -> pd.DataFrame:
+    """Corpus means of the per-dialogue lead–lag columns with dialogue-bootstrap CIs."""
+    columns = [c for c in ("lag", "lag_refined", "r_peak", "r_zero") if c in table.columns]
+    return mean_intervals(table, columns, n_boot=n_boot, seed=seed, alpha=alpha, jobs=jobs)
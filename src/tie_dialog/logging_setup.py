@@ -1,12 +1,14 @@
 
-from rich.logging import RichHandler
 import logging
 
-def setup_logger(name: str = "tie_dialog", level: int = logging.INFO):
+def setup_logger(name: str = "tie_dialog", level: int = logging.INFO, stderr: bool = False):
+    # imported here to keep CLI start-up light
+    from rich.console import Console
+    from rich.logging import RichHandler
     logging.basicConfig(
         level=level,
         format="%(message)s",
         datefmt="[%X]",
-        handlers=[RichHandler(rich_tracebacks=True)]
+        handlers=[RichHandler(rich_tracebacks=True, console=Console(stderr=stderr))]
     )
     return logging.getLogger(name)
@@ -1,21 +1,18 @@
 
 import pandas as pd
-from sklearn.metrics import cohen_kappa_score
+from tie_dialog.agreement import cohen_kappa_labels
 
 def binary_series(df, col_name):
-    # Expand to full index of (dialogue_id, turn)
-    idx = df[["dialogue_id","turn"]].drop_duplicates().sort_values(["dialogue_id","turn"])
-    y = df.set_index(["dialogue_id","turn"])[col_name].reindex(pd.MultiIndex.from_frame(idx)).fillna(0).astype(int)
-    return y.values
+    # One value per (dialogue_id, turn), in sorted order
+    part = df.drop_duplicates(["dialogue_id","turn"]).sort_values(["dialogue_id","turn"], kind="stable")
+    return part[col_name].fillna(0).astype(int).to_numpy()
 
 def cohen_kappa(ev_ref: pd.DataFrame, ev_sys: pd.DataFrame, kind="peak"):
-    # compares human_kind vs machine_kind
+    # compares human_kind vs machine_kind over the union of turns of both frames
     ref_col = f"human_{kind}"
     sys_col = f"machine_{kind}"
-    df = ev_ref.merge(ev_sys, on=["dialogue_id","turn"], how="outer").fillna(0)
-    y_true = df[ref_col].astype(int)
-    y_pred = df[sys_col].astype(int)
-    return cohen_kappa_score(y_true, y_pred)
+    df = ev_ref[["dialogue_id","turn",ref_col]].merge(ev_sys[["dialogue_id","turn",sys_col]], on=["dialogue_id","turn"], how="outer")
+    return cohen_kappa_labels(df[ref_col].fillna(0).to_numpy(dtype=int), df[sys_col].fillna(0).to_numpy(dtype=int))
 
 def macro_average(rows, key="f1"):
     return sum(r[key] for r in rows)/len(rows) if rows else 0.0
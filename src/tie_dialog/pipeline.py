@@ -0,0 +1,591 @@
+
+# The pipeline behind `tie-dialog` and scripts/run_pipeline.py.
+# Stages register themselves in STAGES and add their nodes to a DAG (load -> smooth ->
+# {events -> F1/κ, DTW, lead–lag, S–B–R, figures} -> report) that runs up to --jobs nodes at
+# once. Nodes import their heavy modules (scipy, dtaidistance, matplotlib, PIL) when they
+# run, so a metrics-only run never loads the plotting stack.
+import os, random
+from dataclasses import dataclass, field
+from functools import partial
+import numpy as np
+import pandas as pd
+from tie_dialog.config import Config
+from tie_dialog.dag import DAG, Node
+from tie_dialog.corpus import DialogueCorpus
+from tie_dialog.data_loading import CT_COLUMNS, EVENT_COLUMNS, _compact_ids, aligned_chunks, iter_ct_chunks, iter_event_chunks, load_ct_series, load_events
+from tie_dialog.incremental import DialogueStore, config_hash, dialogue_fingerprints
+from tie_dialog.instrument import Instrument
+
+STAGES = {}
+# what each subcommand runs, in order
+PLANS = {"metrics": ["metrics"], "figures": ["figures"], "report": ["report"], "sweep": ["sweep"],
+         "all": ["metrics", "figures", "report"]}
+# per-dialogue columns the corpus summaries and bootstraps need; the chunked path keeps only these
+F1_KEEP = ["window","dialogue_id","kind","n_ref","n_sys","tp_ref","tp_sys"]
+KAPPA_KEEP = ["window","dialogue_id","kind","n00","n01","n10","n11"]
+DTW_KEEP = ["dist_norm","r_warped","lag"]
+LEAD_LAG_KEEP = ["lag","lag_refined","r_peak","r_zero"]
+SBR_KEEP = ["speaker","n_turns","frac_S","frac_B","frac_R","runs_S","runs_B","runs_R",
+            "n_SS","n_SB","n_SR","n_BS","n_BB","n_BR","n_RS","n_RB","n_RR"]
+
+def stage(name):
+    def register(fn):
+        STAGES[name] = fn
+        return fn
+    return register
+
+@dataclass
+class Run:
+    args: object
+    cfg: Config
+    log: object
+    inst: Instrument
+    ct_raw: pd.DataFrame = None       # kept for the incremental fingerprints
+    raw: DialogueCorpus = None
+    ct: DialogueCorpus = None         # smoothed
+    ev: pd.DataFrame = None           # annotated events, when the CSV exists
+    store_dir: str = None
+    jobs: int = 1                     # DAG nodes at once; also the number of DTW/overlay shards
+    dialogue_ids: list = field(default_factory=list)
+    fig_paths: list = field(default_factory=list)
+
+    def artifact(self, name):
+        return os.path.join(self.cfg.outputs.artifacts_dir, name)
+
+    @property
+    def boot(self):
+        b = self.cfg.analysis.bootstrap
+        return dict(n_boot=b.get("n_boot", 0), alpha=b.get("alpha", 0.05), seed=self.cfg.seed, jobs=self.args.jobs)
+
+def _subset(data, ids):
+    if ids is None:
+        return data
+    if isinstance(data, DialogueCorpus):
+        return data.subset(ids)
+    return data[data["dialogue_id"].isin(ids)]
+
+def _stale(store_dir, name, fp, force=False, missing=None):
+    """(store, mask of the dialogues to compute, whether to compute at all); no store without store_dir."""
+    if store_dir is None:
+        return None, np.ones(len(fp), dtype=bool), True
+    store = DialogueStore(store_dir, name)
+    mask = np.ones(len(fp), dtype=bool) if force else store.stale(fp)
+    if missing is not None:
+        mask |= missing
+    return store, mask, bool(mask.any()) or store.table is None
+
+def _update(store, name, fp, mask, fresh, log, inst):
+    if store is None:
+        inst.count(dialogues=len(fp), recomputed=len(fp))
+        return fresh
+    log.info(f"{name}: recomputed {int(mask.sum())} of {len(fp)} dialogues")
+    inst.count(dialogues=len(fp), recomputed=mask.sum())
+    return store.update(fp, mask, fresh)
+
+def _incremental(store_dir, name, fp, compute, log, inst, force=False, missing=None):
+    """compute(ids) for new or changed dialogues only; stored rows are reused for the rest."""
+    store, mask, todo = _stale(store_dir, name, fp, force, missing)
+    return _update(store, name, fp, mask, compute(fp.index[mask]) if todo else None, log, inst)
+
+def _smooth(run: Run, raw):
+    from tie_dialog.preprocessing import smooth_series
+    smoothing = run.cfg.analysis.smoothing
+    return smooth_series(raw, window=smoothing["window"], method=smoothing.get("method", "rolling"), polyorder=smoothing.get("polyorder", 2))
+
+def _load(run: Run):
+    cfg, log, inst = run.cfg, run.log, run.inst
+    run.ct_raw = load_ct_series(cfg.data.ct_series, cache_dir=cfg.data.cache_dir)
+    # grouped once; the frame itself is only kept for the incremental fingerprints
+    run.raw = DialogueCorpus.from_frame(run.ct_raw)
+    run.dialogue_ids = list(run.raw.dialogue_ids)
+    inst.count(rows=len(run.raw), dialogues=run.raw.n_dialogues)
+    # Events: use provided annotations if available; otherwise detect from C_t
+    if os.path.exists(cfg.data.events):
+        run.ev = load_events(cfg.data.events, cache_dir=cfg.data.cache_dir)
+        inst.count(event_rows=len(run.ev))
+    else:
+        log.info("No events CSV found; detecting events from C_t.")
+    return run.raw, run.ev
+
+def _smoothed(run: Run, raw):
+    run.ct = _smooth(run, raw)
+    run.inst.count(rows=len(run.ct))
+    return run.ct
+
+def _shards(corpus, n):
+    """n slices of consecutive dialogues with about the same sum of squared lengths; None for empty slices."""
+    if n <= 1 or corpus.n_dialogues <= 1:
+        return [corpus] + [None] * (n - 1)
+    cost = np.cumsum(corpus.lengths.astype(np.float64) ** 2)
+    bounds = np.concatenate(([0], np.searchsorted(cost, cost[-1] * np.arange(1, n) / n), [corpus.n_dialogues]))
+    return [corpus.subset(corpus.dialogue_ids[lo:hi]) if hi > lo else None for lo, hi in zip(bounds[:-1], bounds[1:])]
+
+def _part(fn, corpus):
+    return None if corpus is None else fn(corpus)
+
+def _add_sharded(run: Run, dag, name, inputs, plan, part_fn, done, outputs):
+    """Per-dialogue work over run.jobs shards of the stale dialogues, each a process node.
+
+    plan(*inputs) returns (fingerprints, store, mask, todo, corpus of the dialogues to
+    compute); part_fn(corpus) must be picklable; done(table) runs after the store update.
+    """
+    parts = [f"{name}.part/{i}" for i in range(run.jobs)]
+    rows = [f"{name}.rows/{i}" for i in range(run.jobs)]
+    def split(*args):
+        fp, store, mask, todo, corpus = plan(*args)
+        return ((fp, store, mask, todo), *(_shards(corpus, run.jobs) if todo else [None] * run.jobs))
+    def merge(state, *parts):
+        fp, store, mask, todo = state
+        fresh = pd.concat([p for p in parts if p is not None], ignore_index=True) if todo else None
+        return done(_update(store, name, fp, mask, fresh, run.log, run.inst))
+    dag.add(Node(f"{name}_plan", split, inputs, (f"{name}.plan", *parts)))
+    for i in range(run.jobs):
+        dag.add(Node(f"{name}/{i}", partial(_part, part_fn), (parts[i],), (rows[i],), "process"))
+    dag.add(Node(name, merge, (f"{name}.plan", *rows), outputs))
+
+def _add_summary(run: Run, dag, name, table, ci_fn, write, output):
+    """write(run, table[, intervals]) as node `<name>_summary`; the bootstrap runs first in its own process node."""
+    if run.boot["n_boot"]:
+        dag.add(Node(f"{name}_bootstrap", partial(ci_fn, dict(run.boot, jobs=1)), (table,), (f"{name}.ci",), "process"))
+        dag.add(Node(f"{name}_summary", partial(write, run), (table, f"{name}.ci"), (output,)))
+    else:
+        dag.add(Node(f"{name}_summary", partial(write, run), (table,), (output,)))
+
+# --- per-dialogue tables, shared by the in-memory and chunked paths ---
+
+def _event_source(run: Run, ct, ev):
+    """(events_for(ids), kappa grid): annotated events when given, else detected from the smoothed curves."""
+    from tie_dialog.events import EventArrays, detect_event_arrays
+    a = run.cfg.analysis
+    if ev is not None:
+        arrays_for, grid = (lambda ids: EventArrays.from_frame(_subset(ev, ids))), ev
+    else:
+        arrays_for = lambda ids: detect_event_arrays(_subset(ct, ids), prominence=a.events["peak_prominence"], min_distance=a.events["min_distance"],
+                                                          valley_prominence=a.events.get("valley_prominence"))
+        grid = ct
+    def events_for(ids):
+        arrays = arrays_for(ids)
+        run.inst.count(events=len(arrays.turn))
+        return arrays
+    return events_for, grid
+
+def _match_table(run: Run, events):
+    from tie_dialog.events import match_counts_by_window
+    a = run.cfg.analysis
+    return match_counts_by_window(events, a.windows, a.matching.get("mode", "tolerant"))
+
+def _kappa_table(run: Run, events, grid):
+    from tie_dialog.agreement import kappa_by_window
+    return kappa_by_window(events, grid, run.cfg.analysis.windows)
+
+def _dtw_table(run: Run, ct):
+    return _dtw_rows(run.cfg.analysis.dtw, ct, run.args.jobs)
+
+def _dtw_rows(dtw_cfg, ct, jobs=1):
+    from tie_dialog.dtw_analysis import per_dialogue
+    return per_dialogue(ct, window=dtw_cfg.get("window"), psi=dtw_cfg.get("psi", 0), normalize=dtw_cfg.get("normalize", True), jobs=jobs)
+
+def _overlay_rows(outdir, skip, plot_kw, ct):
+    from tie_dialog.plots import render_overlays
+    return pd.DataFrame(dict(dialogue_id=list(ct.dialogue_ids), path=render_overlays(ct, outdir, skip_newer_than=skip, **plot_kw)))
+
+def _lead_lag_table(run: Run, ct):
+    from tie_dialog.lead_lag import lead_lag
+    ll_cfg = run.cfg.analysis.lead_lag
+    return lead_lag(ct, max_lag=ll_cfg.get("max_lag", 3), refine=ll_cfg.get("refine", True))
+
+def _sbr_table(run: Run, ct):
+    from tie_dialog.sbr import sbr_by_dialogue
+    c = run.cfg.analysis.sbr
+    return sbr_by_dialogue(ct, mode=c.get("thresholds", "adaptive"), percentiles=c.get("percentiles", (25, 75)),
+                           phi_low=c.get("phi_low", 0.60), phi_high=c.get("phi_high", 0.75), hysteresis=c.get("hysteresis", 0.0))
+
+def _tie_raters(events, store):
+    """The machine events on the rater file's dialogues as rater "tie_dialog"."""
+    from tie_dialog.event_store import RaterEvents
+    on_file = np.isin(events.dialogue_ids[events.dialogue], store.dialogue_ids)
+    return RaterEvents.from_event_arrays(events.select(on_file & (events.speaker == 1)), names={"machine": "tie_dialog"})
+
+def _by_window(table):
+    return table.sort_values(["window","dialogue_id","kind"], kind="stable").reset_index(drop=True)
+
+# --- corpus summaries from the per-dialogue tables ---
+
+# bootstrap intervals, top-level so DAG process nodes can run them
+def _f1_ci(boot, counts):
+    from tie_dialog.bootstrap import f1_intervals
+    return f1_intervals(counts, **boot)
+
+def _kappa_ci(boot, kappa):
+    from tie_dialog.bootstrap import kappa_intervals
+    return kappa_intervals(kappa, **boot)
+
+def _dtw_ci(boot, df_dtw):
+    from tie_dialog.bootstrap import mean_intervals
+    return mean_intervals(df_dtw, DTW_KEEP, **boot)
+
+def _lead_lag_ci(boot, df_ll):
+    from tie_dialog.lead_lag import lead_lag_summary
+    return lead_lag_summary(df_ll, **boot)
+
+def _write_raters(run: Run, store, tie):
+    from tie_dialog.event_store import agreement_matrix, combine, pairwise_agreement
+    table = pairwise_agreement(combine(store, *tie), run.cfg.analysis.windows)
+    table.to_csv(run.artifact("rater_agreement.csv"), index=False)
+    f1 = agreement_matrix(table).loc[store.raters, "tie_dialog"]
+    run.log.info(f"Saved rater_agreement.csv ({len(store.raters)} raters; mean F1 vs TIE-Dialog={f1.mean():.3f} at window {max(run.cfg.analysis.windows)})")
+
+def _write_f1(run: Run, counts, ci=None):
+    from tie_dialog.events import f1_summary
+    df_f1 = f1_summary(counts)
+    if run.boot["n_boot"]:
+        if ci is None:
+            with run.inst.stage("f1_bootstrap"):
+                ci = _f1_ci(run.boot, counts)
+        df_f1 = df_f1.merge(ci, on=["window","kind"], how="left")
+    f1_macro = df_f1.loc[df_f1["kind"] == "all", "f1"].mean()
+    df_f1.to_csv(run.artifact("f1_by_window.csv"), index=False)
+    run.log.info(f"Saved F1 by window -> artifacts/f1_by_window.csv (macro={f1_macro:.3f})")
+
+def _write_kappa(run: Run, kappa, ci=None):
+    from tie_dialog.agreement import kappa_summary
+    df_kappa = kappa_summary(kappa)
+    if run.boot["n_boot"]:
+        if ci is None:
+            with run.inst.stage("kappa_bootstrap"):
+                ci = _kappa_ci(run.boot, kappa)
+        df_kappa = df_kappa.merge(ci, on=["window","kind"], how="left")
+    df_kappa.to_csv(run.artifact("kappa_by_window.csv"), index=False)
+    run.log.info(f"Saved kappa by window -> artifacts/kappa_by_window.csv (pooled={df_kappa.loc[df_kappa['kind'] == 'all', 'kappa_pooled'].mean():.3f})")
+
+def _write_dtw_corpus(run: Run, df_dtw, ci=None):
+    if run.boot["n_boot"]:
+        # corpus means of the per-dialogue DTW rows with their intervals
+        if ci is None:
+            with run.inst.stage("dtw_bootstrap"):
+                ci = _dtw_ci(run.boot, df_dtw)
+        ci.to_csv(run.artifact("dtw_corpus.csv"), index=False)
+        run.log.info("Saved dtw_corpus.csv")
+
+def _write_lead_lag_corpus(run: Run, df_ll, corpus=None):
+    corpus = _lead_lag_ci(run.boot, df_ll) if corpus is None else corpus
+    corpus.to_csv(run.artifact("lead_lag_corpus.csv"), index=False)
+    means = corpus.set_index("statistic")["mean"]
+    run.log.info(f"Saved lead_lag.csv and lead_lag_corpus.csv (mean lag={means.get('lag_refined', means['lag']):+.2f} turns)")
+
+def _write_sbr_corpus(run: Run, df_sbr):
+    from tie_dialog.sbr import sbr_summary
+    sbr_summary(df_sbr).to_csv(run.artifact("sbr_corpus.csv"), index=False)
+    run.log.info("Saved sbr_by_dialogue.csv and sbr_corpus.csv")
+
+@stage("metrics")
+def _metrics(run: Run, dag: DAG):
+    from tie_dialog.events import dialogue_f1
+    args, cfg, log, inst = run.args, run.cfg, run.log, run.inst
+    a = cfg.analysis
+    smoothing = a.smoothing
+
+    def fingerprints(**sections):
+        return dialogue_fingerprints(run.ct_raw, CT_COLUMNS, config_hash(smoothing=smoothing, **sections))
+
+    def events(ct, ev):
+        events_for, grid = _event_source(run, ct, ev)
+        if ev is not None:
+            fp = dialogue_fingerprints(ev, EVENT_COLUMNS, config_hash(windows=a.windows, matching=a.matching))
+        else:
+            fp = fingerprints(events=a.events, windows=a.windows, matching=a.matching)
+        return events_for, grid, fp
+    dag.add(Node("events", events, ("ct", "ev"), ("events",)))
+
+    def f1(events):
+        events_for, _, fp = events
+        counts = _incremental(run.store_dir, "match_counts", fp, lambda ids: _match_table(run, events_for(ids)), log, inst, args.force)
+        counts = _by_window(counts)
+        dialogue_f1(counts).to_csv(run.artifact("f1_by_window_dialogue.csv"), index=False)
+        return counts
+    dag.add(Node("f1", f1, ("events",), ("f1.table",)))
+    _add_summary(run, dag, "f1", "f1.table", _f1_ci, _write_f1, "f1_by_window.csv")
+
+    # Cohen's kappa over every turn of the grid, same windows as F1
+    def kappa(events):
+        events_for, grid, fp = events
+        kappa = _incremental(run.store_dir, "kappa", fp, lambda ids: _kappa_table(run, events_for(ids), _subset(grid, ids)), log, inst, args.force)
+        kappa = _by_window(kappa)
+        kappa.to_csv(run.artifact("kappa_by_window_dialogue.csv"), index=False)
+        return kappa
+    dag.add(Node("kappa", kappa, ("events",), ("kappa.table",)))
+    _add_summary(run, dag, "kappa", "kappa.table", _kappa_ci, _write_kappa, "kappa_by_window.csv")
+
+    # DTW per-dialogue, the stale dialogues split into run.jobs process shards
+    def dtw_plan(ct):
+        fp = fingerprints(dtw=a.dtw)
+        store, mask, todo = _stale(run.store_dir, "dtw", fp, args.force)
+        return fp, store, mask, todo, _subset(ct, fp.index[mask])
+    def dtw_done(df_dtw):
+        df_dtw.to_csv(run.artifact("dtw_summary.csv"), index=False)
+        log.info("Saved dtw_summary.csv")
+        return df_dtw
+    _add_sharded(run, dag, "dtw", ("ct",), dtw_plan, partial(_dtw_rows, a.dtw), dtw_done, ("dtw.table",))
+    _add_summary(run, dag, "dtw", "dtw.table", _dtw_ci, _write_dtw_corpus, "dtw_corpus.csv")
+
+    # Lead–lag from the cross-correlation peak per dialogue
+    def lead_lag(ct):
+        df_ll = _incremental(run.store_dir, "lead_lag", fingerprints(lead_lag=a.lead_lag), lambda ids: _lead_lag_table(run, _subset(ct, ids)), log, inst, args.force)
+        df_ll.to_csv(run.artifact("lead_lag.csv"), index=False)
+        return df_ll
+    dag.add(Node("lead_lag", lead_lag, ("ct",), ("lead_lag.table",)))
+    _add_summary(run, dag, "lead_lag", "lead_lag.table", _lead_lag_ci, _write_lead_lag_corpus, "lead_lag_corpus.csv")
+
+    # Stability–Breakdown–Repair states of each curve
+    def sbr(ct):
+        df_sbr = _incremental(run.store_dir, "sbr", fingerprints(sbr=a.sbr), lambda ids: _sbr_table(run, _subset(ct, ids)), log, inst, args.force)
+        df_sbr.to_csv(run.artifact("sbr_by_dialogue.csv"), index=False)
+        _write_sbr_corpus(run, df_sbr)
+    dag.add(Node("sbr", sbr, ("ct",), ("sbr_corpus.csv",)))
+
+    # every annotator of the rater file against the others and TIE-Dialog
+    if cfg.data.raters:
+        def raters(events):
+            from tie_dialog.event_store import load_rater_events
+            store = load_rater_events(cfg.data.raters)
+            _write_raters(run, store, [_tie_raters(events[0](store.dialogue_ids), store)])
+        dag.add(Node("raters", raters, ("events",), ("rater_agreement.csv",)))
+
+@stage("sweep")
+def _sweep(run: Run, dag: DAG):
+    dag.add(Node("sweep", lambda raw: _sweep_surface(run, raw), ("raw",), ("sweep_surface.csv",)))
+
+def _sweep_surface(run: Run, raw):
+    from tie_dialog.sweep import threshold_sweep
+    a, smoothing = run.cfg.analysis, run.cfg.analysis.smoothing
+    grid = a.sweep
+    surface = threshold_sweep(raw, grid.get("smoothing_window", [smoothing["window"]]), grid.get("peak_prominence", [a.events["peak_prominence"]]),
+                              grid.get("min_distance", [a.events["min_distance"]]), grid.get("valley_prominence"), windows=a.windows,
+                              method=smoothing.get("method", "rolling"), polyorder=smoothing.get("polyorder", 2), mode=a.matching.get("mode", "tolerant"), jobs=run.args.jobs)
+    surface.to_csv(run.artifact("sweep_surface.csv"), index=False)
+    params = ["smooth_window","min_distance","peak_prominence","valley_prominence"]
+    run.inst.count(grid_points=len(surface.groupby(params)))
+    best = surface[surface["kind"] == "all"].groupby(params)["f1"].mean().idxmax()
+    run.log.info(f"Saved sweep_surface.csv ({len(surface.groupby(params))} grid points); best mean F1 at " + ", ".join(f"{k}={v:g}" for k, v in zip(params, best)))
+
+def _plot_kw(run: Run):
+    p = run.cfg.plotting
+    return dict(figsize=tuple(p.get("figsize",[10,4])), dpi=p.get("dpi",160), font_size=p.get("font_size",11), jobs=run.args.jobs)
+
+def _overlay_skip(run: Run):
+    # without the incremental store, fall back to skipping overlays newer than their inputs
+    return None if run.args.force or run.store_dir else max(os.path.getmtime(p) for p in (run.cfg.data.ct_series, run.args.config))
+
+def _lead_lag_figure(run: Run):
+    from tie_dialog.plots import plot_lead_lag
+    ll_paths = [run.artifact(f) for f in ("lead_lag.csv", "lead_lag_corpus.csv")]
+    if all(os.path.exists(p) for p in ll_paths):
+        lag_png = plot_lead_lag(*(pd.read_csv(p) for p in ll_paths), os.path.join(run.cfg.outputs.figures_dir, "figure_lead_lag.png"))
+        run.log.info(f"Saved {lag_png}")
+
+@stage("figures")
+def _figures(run: Run, dag: DAG):
+    cfg = run.cfg
+    def plan(ct):
+        from tie_dialog.plots import overlay_path
+        fp = dialogue_fingerprints(run.ct_raw, CT_COLUMNS, config_hash(smoothing=cfg.analysis.smoothing, plotting=cfg.plotting, figures_dir=cfg.outputs.figures_dir))
+        missing = ~np.array([os.path.exists(overlay_path(cfg.outputs.figures_dir, did)) for did in fp.index], dtype=bool)
+        store, mask, todo = _stale(run.store_dir, "figures", fp, run.args.force, missing)
+        return fp, store, mask, todo, _subset(ct, fp.index[mask])
+    def done(table):
+        run.fig_paths = table["path"].tolist()
+    part = partial(_overlay_rows, cfg.outputs.figures_dir, _overlay_skip(run), dict(_plot_kw(run), jobs=1))
+    _add_sharded(run, dag, "figures", ("ct",), plan, part, done, ("figures",))
+    # after metrics when both run, so the figure shows this run's lead–lag tables
+    needs = [o for o in ("lead_lag_corpus.csv",) if o in dag.producer]
+    dag.add(Node("lead_lag_figure", lambda *_: _lead_lag_figure(run), needs, ("figure_lead_lag.png",)))
+
+@stage("report")
+def _report_stage(run: Run, dag: DAG):
+    needs = [o for o in ("raw", "f1_by_window.csv", "kappa_by_window.csv", "dtw.table", "dtw_corpus.csv", "lead_lag_corpus.csv",
+                         "sbr_corpus.csv", "figures", "figure_lead_lag.png") if o in dag.producer]
+    dag.add(Node("report", lambda *_: _report(run), needs))
+
+def _report(run: Run):
+    cfg = run.cfg
+    try:
+        from tie_dialog.plots import overlay_path
+        from tie_dialog.report import build_pdf
+        fig_paths = run.fig_paths or [p for p in (overlay_path(cfg.outputs.figures_dir, did) for did in run.dialogue_ids) if os.path.exists(p)]
+        tables = {
+            "F1 by window": run.artifact("f1_by_window.csv"),
+            "Kappa by window": run.artifact("kappa_by_window.csv"),
+            "DTW corpus means": run.artifact("dtw_corpus.csv"),
+            "DTW summary": run.artifact("dtw_summary.csv"),
+            "Lead–lag corpus means": run.artifact("lead_lag_corpus.csv"),
+            "S–B–R states": run.artifact("sbr_corpus.csv"),
+        }
+        out_pdf = cfg.outputs.pdf_report
+        report_cfg = dict(cfg.report, grid=tuple(cfg.report.get("grid", (4, 2))))
+        build_pdf(fig_paths, tables, out_pdf, **report_cfg)
+        run.inst.count(figures=len(fig_paths), pdf_bytes=os.path.getsize(out_pdf))
+    except Exception as e:
+        run.log.warning(f"PDF generation skipped: {e}")
+
+def _build(run: Run, plan) -> DAG:
+    """load -> smooth, then the nodes of every stage of the plan."""
+    dag = DAG()
+    dag.add(Node("load", lambda: _load(run), (), ("raw", "ev")))
+    dag.add(Node("smooth", lambda raw: _smoothed(run, raw), ("raw",), ("ct",)))
+    for name in plan:
+        STAGES[name](run, dag)
+    return dag
+
+def _chunked(run: Run, plan):
+    """One pass over dialogue-contiguous chunks of about args.chunk_rows C_t rows.
+
+    Each chunk is smoothed, detected, matched, aligned and plotted on its own and its
+    per-dialogue rows are appended to the artifacts; between chunks only the count,
+    confusion and DTW/lead–lag value columns are kept, from which the corpus tables
+    are computed exactly as in memory. The incremental store is not used.
+    """
+    from tie_dialog.chunked import AppendCSV, WindowMajorCSV
+    from tie_dialog.events import dialogue_f1
+    if "sweep" in plan:
+        raise ValueError("the sweep stage needs the whole corpus; run it without --chunk-rows")
+    args, cfg, log, inst = run.args, run.cfg, run.log, run.inst
+    metrics, figures = "metrics" in plan, "figures" in plan
+    chunks = iter_ct_chunks(cfg.data.ct_series, args.chunk_rows)
+    if metrics and os.path.exists(cfg.data.events):
+        chunks = aligned_chunks(chunks, iter_event_chunks(cfg.data.events, args.chunk_rows))
+    else:
+        if metrics:
+            log.info("No events CSV found; detecting events from C_t.")
+        chunks = ((c, None) for c in chunks)
+    if metrics:
+        windows = cfg.analysis.windows
+        f1_out = WindowMajorCSV(run.artifact("f1_by_window_dialogue.csv"), windows)
+        kappa_out = WindowMajorCSV(run.artifact("kappa_by_window_dialogue.csv"), windows)
+        dtw_out, ll_out = AppendCSV(run.artifact("dtw_summary.csv")), AppendCSV(run.artifact("lead_lag.csv"))
+        sbr_out = AppendCSV(run.artifact("sbr_by_dialogue.csv"))
+        kept = dict(f1=[], kappa=[], dtw=[], lead_lag=[], sbr=[], raters=[])
+        if cfg.data.raters:
+            from tie_dialog.event_store import load_rater_events
+            raters = load_rater_events(cfg.data.raters)
+    if figures:
+        from tie_dialog.plots import render_overlays
+        plot_kw, skip = _plot_kw(run), _overlay_skip(run)
+
+    n_chunks = 0
+    with inst.stage("chunks") as st:
+        for ct_frame, ev in chunks:
+            n_chunks += 1
+            raw = DialogueCorpus.from_frame(ct_frame)
+            del ct_frame
+            ct = _smooth(run, raw)
+            run.dialogue_ids.extend(raw.dialogue_ids)
+            st.count(rows=len(raw), dialogues=raw.n_dialogues)
+            if metrics:
+                events_for, grid = _event_source(run, ct, ev)
+                events = events_for(None)
+                counts = _match_table(run, events)
+                f1_out.append(dialogue_f1(counts))
+                kept["f1"].append(counts[F1_KEEP])
+                kappa = _kappa_table(run, events, grid)
+                kappa_out.append(kappa)
+                kept["kappa"].append(kappa[KAPPA_KEEP])
+                df_dtw, df_ll = _dtw_table(run, ct), _lead_lag_table(run, ct)
+                dtw_out.append(df_dtw)
+                ll_out.append(df_ll)
+                kept["dtw"].append(df_dtw[DTW_KEEP])
+                kept["lead_lag"].append(df_ll[[c for c in LEAD_LAG_KEEP if c in df_ll.columns]])
+                df_sbr = _sbr_table(run, ct)
+                sbr_out.append(df_sbr)
+                kept["sbr"].append(df_sbr[SBR_KEEP])
+                if cfg.data.raters:
+                    kept["raters"].append(_tie_raters(events, raters))
+            if figures:
+                run.fig_paths.extend(render_overlays(ct, cfg.outputs.figures_dir, skip_newer_than=skip, **plot_kw))
+        st.count(chunks=n_chunks)
+        log.info(f"Processed {len(run.dialogue_ids)} dialogues in {n_chunks} chunks of about {args.chunk_rows} rows")
+
+    if metrics:
+        def concat(parts):
+            df = pd.concat(parts, ignore_index=True)
+            if "dialogue_id" in df.columns:
+                df["dialogue_id"] = _compact_ids(df["dialogue_id"])   # categories differ between chunks
+            return df
+        with inst.stage("f1"):
+            log.info(f"Saved {f1_out.close()}")
+            _write_f1(run, _by_window(concat(kept.pop("f1"))))
+        with inst.stage("kappa"):
+            log.info(f"Saved {kappa_out.close()}")
+            _write_kappa(run, _by_window(concat(kept.pop("kappa"))))
+        with inst.stage("dtw"):
+            log.info(f"Saved {dtw_out.close()}")
+            _write_dtw_corpus(run, concat(kept.pop("dtw")))
+        with inst.stage("lead_lag"):
+            ll_out.close()
+            _write_lead_lag_corpus(run, concat(kept.pop("lead_lag")))
+        with inst.stage("sbr"):
+            sbr_out.close()
+            _write_sbr_corpus(run, concat(kept.pop("sbr")))
+        if cfg.data.raters:
+            with inst.stage("raters"):
+                _write_raters(run, raters, kept.pop("raters"))
+    if figures:
+        with inst.stage("figures"):
+            _lead_lag_figure(run)
+    if "report" in plan:
+        with inst.stage("report"):
+            _report(run)
+
+def run(args, cfg: Config, log):
+    """Run PLANS[args.stage] and write run_metrics.json, also when a stage fails."""
+    random.seed(cfg.seed); np.random.seed(cfg.seed)
+    os.makedirs(cfg.outputs.figures_dir, exist_ok=True)
+    os.makedirs(cfg.outputs.artifacts_dir, exist_ok=True)
+    inst = Instrument(enabled=not args.no_instrument, trace_memory=args.trace_memory,
+                      profile_dir=os.path.join(cfg.outputs.artifacts_dir, "profile") if args.profile else None, log=log)
+    state = Run(args, cfg, log, inst)
+    state.jobs = (os.cpu_count() or 1) if args.jobs <= 0 else args.jobs
+    if state.jobs > 1 and (args.profile or args.trace_memory):
+        # tracemalloc and the profiler see the whole process, not one node
+        log.info("--profile/--trace-memory run the stages one at a time")
+        state.jobs = 1
+    status = "failed"
+    try:
+        if getattr(args, "chunk_rows", None):
+            _chunked(state, PLANS[args.stage])
+        else:
+            # Per-dialogue results are kept under cache_dir/incremental and reused while the
+            # dialogue's rows and the config sections they depend on are unchanged.
+            state.store_dir = os.path.join(cfg.data.cache_dir, "incremental") if cfg.data.cache_dir else None
+            _build(state, PLANS[args.stage]).run(state.jobs, stage=inst.stage)
+        status = "ok"
+    finally:
+        path = inst.write(state.artifact("run_metrics.json"), status=status, stage=args.stage, config=args.config,
+                          jobs=state.jobs, force=args.force, chunk_rows=getattr(args, "chunk_rows", None))
+        if path:
+            log.info(f"Saved {path}")
+
+def stream(args, cfg: Config, log):
+    """Feed C_t rows, in arrival order, through a StreamingAnalyzer and write events as they are confirmed."""
+    import csv, sys
+    from tie_dialog.streaming import StreamingAnalyzer
+    analyzer = StreamingAnalyzer.from_config(cfg.analysis, max_history=args.max_history)
+    source = args.input or cfg.data.ct_series
+    src = sys.stdin if source == "-" else open(source, newline="", encoding="utf-8")
+    dst = sys.stdout if args.output in (None, "-") else open(args.output, "w", newline="", encoding="utf-8")
+    n_rows = n_events = 0
+    try:
+        out = csv.writer(dst)
+        out.writerow(["dialogue_id", "turn", "kind", "speaker", "prominence"])
+        def emit(events):
+            out.writerows(events)
+            return len(events)
+        for row in csv.DictReader(src):
+            n_rows += 1
+            n_events += emit(analyzer.push(row["dialogue_id"], int(row["turn"]), float(row["human_ct"]), float(row["model_ct"])))
+        n_events += emit(analyzer.close_all())
+    finally:
+        if src is not sys.stdin:
+            src.close()
+        if dst is not sys.stdout:
+            dst.close()
+    log.info(f"Streamed {n_rows} rows from {source}: {n_events} events")
@@ -1,20 +1,113 @@
-
 import os
-import matplotlib.pyplot as plt
+from concurrent.futures import ProcessPoolExecutor
+import matplotlib
+from matplotlib.backends.backend_agg import FigureCanvasAgg
+from matplotlib.figure import Figure
+import numpy as np
 import pandas as pd
+from tie_dialog.corpus import as_corpus, resolve_jobs
+
+def overlay_path(outdir, did):
+    return os.path.join(outdir, f"ct_overlay_d{did}.png")
+
+class OverlayRenderer:
+    """One Agg figure whose axes and line artists are reused for every dialogue (no pyplot state)."""
+    def __init__(self, figsize=(10,4), dpi=160, font_size=11):
+        self.rc = {"font.size": font_size}
+        with matplotlib.rc_context(self.rc):
+            self.fig = Figure(figsize=figsize, dpi=dpi)
+            FigureCanvasAgg(self.fig)
+            self.ax = self.fig.add_subplot()
+            self.human, = self.ax.plot([], [], label="Human")
+            self.model, = self.ax.plot([], [], label="Model")
+            self.ax.set_xlabel("Turn")
+            self.ax.set_ylabel("Coherence (C_t)")
+            self.title = self.ax.set_title("")
+            self.ax.legend()
+        self._layout_key = None
+
+    def render(self, did, turns, human, model, path):
+        self.human.set_data(turns, human)
+        self.model.set_data(turns, model)
+        self.ax.relim()
+        self.ax.autoscale_view()
+        self.title.set_text(f"Dialogue {did} — Human vs Model C_t")
+        # tight_layout costs as much as the draw; redo it only when the tick labels change
+        key = tuple(tuple(axis.get_major_formatter().format_ticks(axis.get_major_locator()())) for axis in (self.ax.xaxis, self.ax.yaxis))
+        with matplotlib.rc_context(self.rc):
+            if key != self._layout_key:
+                self.fig.tight_layout()
+                self._layout_key = key
+            self.fig.savefig(path)
+        return path
 
 def plot_overlay(df, outdir, did, figsize=(10,4), dpi=160, font_size=11):
-    part = df[df["dialogue_id"]==did]
-    if part.empty: return None
-    plt.figure(figsize=figsize, dpi=dpi)
-    plt.plot(part["turn"], part["human_ct"], label="Human")
-    plt.plot(part["turn"], part["model_ct"], label="Model")
-    plt.xlabel("Turn")
-    plt.ylabel("Coherence (C_t)")
-    plt.title(f"Dialogue {did} — Human vs Model C_t")
-    plt.legend()
-    path = os.path.join(outdir, f"ct_overlay_d{did}.png")
-    plt.tight_layout()
-    plt.savefig(path)
-    plt.close()
+    corpus = as_corpus(df)
+    if did not in corpus.dialogue_ids: return None
+    v = corpus[did]
+    return OverlayRenderer(figsize, dpi, font_size).render(did, v.turn, v.human_ct, v.model_ct, overlay_path(outdir, did))
+
+def _render_block(tasks, figsize, dpi, font_size):
+    renderer = OverlayRenderer(figsize, dpi, font_size)
+    return [renderer.render(*t) for t in tasks]
+
+def render_overlays(df, outdir, ids=None, figsize=(10,4), dpi=160, font_size=11, jobs=1, skip_newer_than=None):
+    """Overlay PNG per dialogue of `df` (or of `ids`), rendered by `jobs` worker processes.
+
+    The frame is split by dialogue once. With `skip_newer_than` (a timestamp),
+    outputs modified after it are kept as they are. Returns paths in dialogue order.
+    """
+    corpus = as_corpus(df)
+    offsets, all_ids = corpus.offsets, corpus.dialogue_ids
+    rows = np.arange(len(all_ids)) if ids is None else all_ids.get_indexer(pd.Index(ids))
+    rows = rows[rows >= 0]
+    turns, h, m = corpus.turn, corpus.human_ct, corpus.model_ct
+    paths, tasks = [], []
+    for r in rows:
+        did, a, b = all_ids[r], offsets[r], offsets[r + 1]
+        path = overlay_path(outdir, did)
+        paths.append(path)
+        if skip_newer_than is not None and os.path.exists(path) and os.path.getmtime(path) >= skip_newer_than:
+            continue
+        tasks.append((did, turns[a:b], h[a:b], m[a:b], path))
+    jobs = min(resolve_jobs(jobs), len(tasks))
+    if jobs <= 1:
+        _render_block(tasks, figsize, dpi, font_size)
+    else:
+        step = -(-len(tasks) // (4 * jobs))
+        with ProcessPoolExecutor(max_workers=jobs) as ex:
+            for f in [ex.submit(_render_block, tasks[i:i + step], figsize, dpi, font_size) for i in range(0, len(tasks), step)]:
+                f.result()
+    return paths
+
+def plot_lead_lag(table, summary, path, column="lag_refined", figsize=(8,4), dpi=300, font_size=12):
+    """Figure 1 of the pilot: per-dialogue lead–lag (ticks) and the corpus mean with its CI,
+    from tie_dialog.lead_lag.lead_lag / lead_lag_summary."""
+    if column not in table.columns:
+        column = "lag"
+    lags = table[column].to_numpy(dtype=np.float64)
+    lags = lags[np.isfinite(lags)]
+    row = summary.set_index("statistic").loc[column]
+    with matplotlib.rc_context({"font.size": font_size}):
+        fig = Figure(figsize=figsize, dpi=dpi)
+        FigureCanvasAgg(fig)
+        ax = fig.add_subplot()
+        ax.axvline(0, linestyle="--", color="gray", alpha=0.7, label="Zero point")
+        ax.scatter(lags, np.zeros_like(lags), marker="|", s=200, color="gray", alpha=min(1.0, max(0.02, 20 / max(len(lags), 1))),
+                   label="Dialogues")
+        if np.isfinite(row["ci_low"]):
+            ax.errorbar([row["mean"]], [0], xerr=[[row["mean"] - row["ci_low"]], [row["ci_high"] - row["mean"]]],
+                        fmt="none", ecolor="blue", elinewidth=2, capsize=8)
+        ax.scatter([row["mean"]], [0], marker="x", s=250, linewidths=3, color="blue",
+                   label=f"Mean human-leading lag ({row['mean']:+.2f})")
+        span = max(2.0, float(np.abs(lags).max(initial=0)) + 0.25)
+        ax.set_xlim(-span, span)
+        ax.set_ylim(-1.0, 1.0)
+        ax.set_yticks([])
+        ax.set_xlabel("Lead–Lag (turns)")
+        ax.set_title(f"Mean Human Leading Lag Across {int(row['n_dialogues'])} Dialogues", fontsize=font_size + 4)
+        ax.grid(axis="x", linestyle=":", alpha=0.3)
+        ax.legend(loc="upper center", bbox_to_anchor=(0.5, -0.25), frameon=False, ncol=3)
+        fig.tight_layout()
+        fig.savefig(path)
     return path
@@ -1,9 +1,153 @@
 
+import numpy as np
 import pandas as pd
+from scipy.signal import lfilter, savgol_coeffs
+from tie_dialog.corpus import DialogueCorpus, dialogue_offsets
 
-def smooth_series(df: pd.DataFrame, window: int = 3) -> pd.DataFrame:
-    out = df.copy()
+SMOOTHING_METHODS = ("rolling", "ewma", "savgol")
+
+def _head(offsets, k: int, tail: bool = False):
+    """Flat positions of the first (or last) k rows of every dialogue and their distance to that edge."""
+    lengths = np.diff(offsets)
+    take = np.minimum(lengths, k)
+    rank = np.arange(take.sum()) - np.repeat(np.cumsum(take) - take, take)
+    base = np.repeat(offsets[1:] - 1 if tail else offsets[:-1], take)
+    return (base - rank if tail else base + rank), rank
+
+def rolling_mean(x, offsets, window: int, out=None) -> np.ndarray:
+    """Trailing mean over `window` rows (min_periods=1, NaN-aware), restarted at every dialogue."""
+    x = np.asarray(x)
+    n = len(x)
+    if out is None:
+        out = np.empty(n, dtype=np.float32)
+    if n == 0:
+        return out
+    valid = ~np.isnan(x)
+    cs = np.zeros(n + 1, dtype=np.float64)
+    np.cumsum(x if valid.all() else np.where(valid, x, 0.0), out=cs[1:])
+    cnt = None
+    if not valid.all():
+        cnt = np.zeros(n + 1, dtype=np.int64)
+        np.cumsum(valid, out=cnt[1:])
+    # Full windows come straight from the cumulative sum; only the first
+    # window-1 rows of each dialogue need a shortened window.
+    pos, rank = _head(offsets, window - 1)
+    lo = np.empty(n, dtype=np.int64) if cnt is not None else None
+    with np.errstate(invalid="ignore", divide="ignore"):
+        if cnt is None:
+            if n >= window:
+                out[window - 1:] = (cs[window:] - cs[:-window]) / window
+            out[pos] = (cs[pos + 1] - cs[pos - rank]) / (rank + 1)
+        else:
+            lo[:] = np.arange(n) - (window - 1)
+            lo[pos] = pos - rank
+            np.maximum(lo, 0, out=lo)
+            out[:] = (cs[1:] - cs[lo]) / (cnt[1:] - cnt[lo])
+    return out
+
+def _segment_filter(x, offsets, decay):
+    """y[i] = x[i] + decay * y[i-1], restarted at every dialogue."""
+    # One filter pass over the flat buffer, then remove the carry-over from the
+    # previous dialogue. It decays geometrically, so only the head of each dialogue needs it.
+    y = lfilter([1.0], [1.0, -decay], x)
+    horizon = int(np.ceil(np.log(1e-12) / np.log(decay))) if decay > 0 else 1
+    pos, rank = _head(offsets, horizon)
+    starts = pos - rank
+    y[pos] -= decay ** (rank + 1) * np.where(starts > 0, y[np.maximum(starts - 1, 0)], 0.0)
+    return y
+
+def _ewma_gaps(x, alpha):
+    # pandas' ewm(adjust=False, ignore_na=False) recursion: a NaN keeps its turn in the decay
+    # of the previous mean, whose weight is renormalised when the next value arrives
+    out = np.empty(len(x))
+    mean, weight = np.nan, 1.0
+    for i, v in enumerate(x):
+        if mean == mean:
+            weight *= 1.0 - alpha
+            if v == v:
+                mean = (weight * mean + alpha * v) / (weight + alpha)
+                weight = 1.0
+        elif v == v:
+            mean = v
+        out[i] = mean
+    return out
+
+def ewma(x, offsets, span: int, adjust: bool = False, out=None) -> np.ndarray:
+    """Exponentially weighted mean (alpha = 2/(span+1)), restarted at every dialogue.
+
+    Matches pandas' ewm(span, adjust) with ignore_na=False: NaN rows repeat the last
+    mean (NaN before the first value) and still count in the decay of older values.
+    """
+    x = np.asarray(x, dtype=np.float64)
+    n = len(x)
+    if out is None:
+        out = np.empty(n, dtype=np.float32)
+    if n == 0:
+        return out
+    alpha = 2.0 / (span + 1.0)
+    decay = 1.0 - alpha
+    nan = np.isnan(x)
+    x0 = np.where(nan, 0.0, x) if nan.any() else x
+    if adjust:
+        # weights decay^(i-j) over the values seen so far: a ratio of two filters
+        with np.errstate(invalid="ignore"):
+            y = _segment_filter(x0, offsets, decay) / _segment_filter((~nan).astype(np.float64), offsets, decay)
+    else:
+        # seed every dialogue with its first value instead of alpha times it
+        y = alpha * _segment_filter(x0, offsets, decay)
+        pos, rank = _head(offsets, int(np.ceil(np.log(1e-12) / np.log(decay))) if decay > 0 else 1)
+        y[pos] += decay ** (rank + 1) * x0[pos - rank]
+        # the renormalisation after a gap is not linear; recompute dialogues with NaNs exactly
+        for d in np.unique(np.searchsorted(offsets, np.flatnonzero(nan), side="right") - 1):
+            y[offsets[d]:offsets[d + 1]] = _ewma_gaps(x[offsets[d]:offsets[d + 1]], alpha)
+    out[:] = y
+    return out
+
+def savgol(x, offsets, window: int, polyorder: int = 2, out=None) -> np.ndarray:
+    """Savitzky–Golay filter (odd `window`, edge values repeated) applied within every dialogue."""
+    x = np.asarray(x)
+    n = len(x)
+    if out is None:
+        out = np.empty(n, dtype=np.float32)
+    if n == 0:
+        return out
+    if window % 2 == 0:
+        window += 1
+    coeffs = savgol_coeffs(window, min(polyorder, window - 1), use="dot")
+    half = window // 2
+    y = np.correlate(np.pad(x.astype(np.float64), half, mode="edge"), coeffs, mode="valid")
+    # Rows within half a window of a dialogue edge repeat that dialogue's edge value.
+    head, _ = _head(offsets, half)
+    tail, _ = _head(offsets, half, tail=True)
+    pos = np.concatenate((head, tail))
+    seg = np.searchsorted(offsets, pos, side="right") - 1
+    lo, hi = offsets[seg], offsets[seg + 1] - 1
+    acc = np.zeros(len(pos), dtype=np.float64)
+    for k, c in zip(range(-half, half + 1), coeffs):
+        acc += c * x[np.clip(pos + k, lo, hi)]
+    y[pos] = acc
+    out[:] = y
+    return out
+
+def smooth_array(x, offsets, window: int = 3, method: str = "rolling", polyorder: int = 2, out=None) -> np.ndarray:
+    """Smooth a flat C_t buffer; pass `out=x` to smooth a float32 array in place."""
+    if method == "rolling":
+        return rolling_mean(x, offsets, window, out=out)
+    if method == "ewma":
+        return ewma(x, offsets, window, out=out)
+    if method == "savgol":
+        return savgol(x, offsets, window, polyorder, out=out)
+    raise ValueError(f"unknown smoothing method: {method} (expected one of {SMOOTHING_METHODS})")
+
+def smooth_series(df, window: int = 3, method: str = "rolling", polyorder: int = 2):
+    """Smoothed C_t curves of a frame or DialogueCorpus, returned as the same type."""
+    if isinstance(df, DialogueCorpus):
+        if not window or window <= 1:
+            return df
+        return df.with_curves(*(smooth_array(x, df.offsets, window, method, polyorder) for x in (df.human_ct, df.model_ct)))
+    out = df.copy(deep=False)
     if window and window > 1:
-        out["human_ct"] = out.groupby("dialogue_id")["human_ct"].transform(lambda s: s.rolling(window, min_periods=1).mean())
-        out["model_ct"] = out.groupby("dialogue_id")["model_ct"].transform(lambda s: s.rolling(window, min_periods=1).mean())
+        offsets = dialogue_offsets(df["dialogue_id"])
+        for col in ("human_ct", "model_ct"):
+            out[col] = smooth_array(df[col].to_numpy(), offsets, window, method, polyorder)
     return out
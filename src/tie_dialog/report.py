@@ -1,19 +1,84 @@
+import logging, os, time
+import numpy as np
+import pandas as pd
+from matplotlib.backends.backend_agg import FigureCanvasAgg
+from matplotlib.backends.backend_pdf import PdfPages
+from matplotlib.figure import Figure
+from PIL import Image
 
-import os, json
-from fpdf import FPDF
-
-def build_pdf(fig_paths, tables, out_pdf):
-    # Minimal PDF builder to keep dependencies light; install fpdf if needed.
-    pdf = FPDF()
-    pdf.set_auto_page_break(auto=True, margin=12)
-    pdf.add_page()
-    pdf.set_font("Arial", size=14)
-    pdf.cell(0, 10, "TIE–Dialog Pilot — Replication Report", ln=True)
-    pdf.set_font("Arial", size=10)
-    for title, table_path in tables.items():
-        pdf.cell(0, 8, f"{title}: {table_path}", ln=True)
-    for fp in fig_paths:
-        pdf.add_page()
-        pdf.image(fp, w=180)
-    pdf.output(out_pdf)
+A4 = (8.27, 11.69)
+log = logging.getLogger("tie_dialog")
+
+def _page():
+    fig = Figure(figsize=A4)
+    FigureCanvasAgg(fig)
+    return fig
+
+def _downsample(path, width_in, height_in, dpi):
+    """RGB pixels of `path` shrunk to fit width_in × height_in inches at `dpi` (never upscaled)."""
+    with Image.open(path) as im:
+        im = im.convert("RGB")
+        im.thumbnail((max(1, int(width_in * dpi)), max(1, int(height_in * dpi))), Image.LANCZOS)
+        return np.asarray(im)
+
+def _format(df: pd.DataFrame) -> list:
+    return [[f"{v:.3f}" if isinstance(v, float) else str(v) for v in row] for row in df.itertuples(index=False)]
+
+def _table_pages(pdf, title, df, rows_per_page, max_rows, source):
+    shown = df.head(max_rows)
+    for start in range(0, max(len(shown), 1), rows_per_page):
+        part = shown.iloc[start:start + rows_per_page]
+        fig = _page()
+        fig.text(0.06, 0.96, title + (" (cont.)" if start else ""), fontsize=13, weight="bold")
+        ax = fig.add_axes((0.06, 0.06, 0.88, 0.87))
+        ax.axis("off")
+        if len(part):
+            tab = ax.table(cellText=_format(part), colLabels=list(df.columns), loc="upper center", cellLoc="right")
+            tab.auto_set_font_size(False)
+            tab.set_fontsize(7)
+        if start + rows_per_page >= len(shown) and len(df) > len(shown):
+            fig.text(0.06, 0.03, f"{len(df) - len(shown)} more rows in {source}", fontsize=8, style="italic")
+        pdf.savefig(fig)
+
+def _figure_pages(pdf, fig_paths, grid, dpi):
+    rows, cols = grid
+    margin, top = 0.4, 0.4
+    cell_w = (A4[0] - 2 * margin) / cols
+    cell_h = (A4[1] - margin - top) / rows
+    for start in range(0, len(fig_paths), rows * cols):
+        fig = _page()
+        for k, path in enumerate(fig_paths[start:start + rows * cols]):
+            r, c = divmod(k, cols)
+            ax = fig.add_axes((
+                (margin + c * cell_w) / A4[0], 1 - (top + (r + 1) * cell_h) / A4[1], cell_w / A4[0], cell_h / A4[1]))
+            ax.axis("off")
+            # pixels are resampled here once; interpolation="none" embeds them as they are
+            ax.imshow(_downsample(path, cell_w, cell_h, dpi), interpolation="none")
+        pdf.savefig(fig)
+
+def build_pdf(fig_paths, tables, out_pdf, grid=(4, 2), dpi=150, rows_per_page=45, max_table_rows=450,
+              budget_mb=None, budget_s=None):
+    """Stream the report to `out_pdf` one page at a time.
+
+    Tables (title -> CSV path) are rendered inline first; overlays follow as a
+    rows × cols grid per A4 page, downsampled to `dpi` for their cell size.
+    Time and size are logged against the optional budgets.
+    """
+    t0 = time.perf_counter()
+    os.makedirs(os.path.dirname(out_pdf) or ".", exist_ok=True)
+    with PdfPages(out_pdf) as pdf:
+        fig = _page()
+        fig.text(0.06, 0.94, "TIE–Dialog Pilot — Replication Report", fontsize=16)
+        fig.text(0.06, 0.91, f"{len(tables)} tables, {len(fig_paths)} overlays", fontsize=10)
+        pdf.savefig(fig)
+        for title, table_path in tables.items():
+            if os.path.exists(table_path):
+                _table_pages(pdf, title, pd.read_csv(table_path), rows_per_page, max_table_rows, table_path)
+        _figure_pages(pdf, list(fig_paths), grid, dpi)
+        pages = pdf.get_pagecount()
+    elapsed, size_mb = time.perf_counter() - t0, os.path.getsize(out_pdf) / 2**20
+    msg = f"Report {out_pdf}: {pages} pages, {size_mb:.1f} MB" + (f" / {budget_mb} MB budget" if budget_mb else "") \
+          + f", {elapsed:.1f} s" + (f" / {budget_s} s budget" if budget_s else "")
+    over = (budget_mb and size_mb > budget_mb) or (budget_s and elapsed > budget_s)
+    (log.warning if over else log.info)(msg)
     return out_pdf
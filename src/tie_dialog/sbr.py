@@ -0,0 +1,157 @@
+
+# Stability–Breakdown–Repair (S–B–R) quantization of C_t with Φ_low/Φ_high thresholds.
+# Works on the flat per-turn arrays plus dialogue offsets; no per-turn Python loop.
+import numpy as np
+import pandas as pd
+from tie_dialog.corpus import as_corpus
+from tie_dialog.events import SPEAKERS
+
+STATES = ("S", "B", "R")
+S, B, R = 0, 1, 2
+THRESHOLD_MODES = ("adaptive", "fixed")
+
+def _lerp(a, b, t):
+    # numpy's linear percentile interpolation, so results equal np.nanpercentile bit for bit
+    diff = b - a
+    return np.where(t >= 0.5, b - diff * (1 - t), a + diff * t)
+
+def _segment_order(x, dialogue):
+    """Row order sorting x within each dialogue block, NaN last."""
+    if x.dtype != np.float32:
+        return np.lexsort((x, dialogue))
+    # float32: one uint64 sort on (dialogue, order-preserving bits of x) instead of a lexsort
+    u = np.where(np.isnan(x), np.float32(np.nan), x).view(np.uint32)
+    bits = np.where(u >> 31, ~u, u | np.uint32(1 << 31)).astype(np.uint64)
+    return np.argsort((dialogue.astype(np.uint64) << np.uint64(32)) | bits)
+
+def segmented_percentile(x, offsets, q) -> np.ndarray:
+    """(n_dialogues, len(q)) NaN-skipping percentiles of each dialogue block of x (linear, as np.nanpercentile)."""
+    x = np.asarray(x)
+    if x.dtype not in (np.float32, np.float64):
+        x = x.astype(np.float64)
+    lengths = np.diff(offsets)
+    dialogue = np.repeat(np.arange(len(lengths)), lengths)
+    v = x[_segment_order(x, dialogue)].astype(np.float64)
+    n = np.bincount(dialogue, weights=~np.isnan(x), minlength=len(lengths)).astype(np.int64)
+    q = np.atleast_1d(np.asarray(q, dtype=np.float64))
+    pos = q[None, :] / 100 * (n[:, None] - 1)
+    lo = np.floor(pos).astype(np.int64)
+    hi = np.minimum(lo + 1, n[:, None] - 1)
+    start = np.asarray(offsets[:-1])[:, None]
+    ok = n[:, None] > 0
+    a = v[np.where(ok, start + lo, 0)]
+    b = v[np.where(ok, start + hi, 0)]
+    return np.where(ok, _lerp(a, b, pos - lo), np.nan)
+
+def phi_thresholds(x, offsets, mode="adaptive", percentiles=(25, 75), phi_low=0.60, phi_high=0.75):
+    """Per-dialogue (Φ_low, Φ_high): the dialogue's own percentiles (adaptive) or the fixed values."""
+    n_d = len(offsets) - 1
+    if mode == "adaptive":
+        p = segmented_percentile(x, offsets, percentiles)
+        return p[:, 0], p[:, 1]
+    if mode == "fixed":
+        return np.full(n_d, float(phi_low)), np.full(n_d, float(phi_high))
+    raise ValueError(f"unknown threshold mode: {mode} (expected one of {THRESHOLD_MODES})")
+
+def _ffill(code, offsets):
+    """Last code >= 0 at or before each row; every dialogue's first row must hold a code."""
+    pos = np.where(code >= 0, np.arange(len(code)), 0)
+    return code[np.maximum.accumulate(pos)] if len(code) else code
+
+def sbr_states(x, offsets, phi_low, phi_high, hysteresis=0.0) -> np.ndarray:
+    """int8 state per turn (S=0, B=1, R=2) with hysteresis.
+
+    C_t < Φ_low enters B; B turns into R once C_t climbs to Φ_low + hysteresis and R
+    returns to S at Φ_high. Falling from S or R below Φ_low is a new breakdown, so
+    S holds until C_t drops below Φ_low. A dialogue opening between the thresholds
+    starts in S; NaN turns keep the previous state. Thresholds are scalars or one per dialogue.
+    """
+    x = np.asarray(x, dtype=np.float64)
+    lengths = np.diff(offsets)
+    lo = np.repeat(np.broadcast_to(np.asarray(phi_low, dtype=np.float64), lengths.shape), lengths)
+    hi = np.repeat(np.broadcast_to(np.asarray(phi_high, dtype=np.float64), lengths.shape), lengths)
+    starts = np.asarray(offsets[:-1])[lengths > 0]
+    # latch: was the last threshold crossing a breakdown (below Φ_low) or a recovery (at Φ_high)?
+    latch = np.full(len(x), -1, dtype=np.int8)
+    latch[x >= hi] = S
+    latch[x < lo] = B
+    latch[starts] = np.where(latch[starts] < 0, S, latch[starts])
+    latch = _ffill(latch, offsets)
+    code = np.full(len(x), -1, dtype=np.int8)
+    code[x >= hi] = S
+    code[(latch == B) & (x >= lo + hysteresis)] = R
+    code[x < lo] = B
+    code[starts] = latch[starts]
+    return _ffill(code, offsets)
+
+def run_lengths(states, offsets):
+    """Run-length encoding of the states within each dialogue: (dialogue, state, start, length) arrays."""
+    states = np.asarray(states)
+    n = len(states)
+    if n == 0:
+        return (np.zeros(0, dtype=np.int64),) * 4
+    lengths = np.diff(offsets)
+    dialogue = np.repeat(np.arange(len(lengths)), lengths)
+    change = np.ones(n, dtype=bool)
+    change[1:] = (states[1:] != states[:-1]) | (dialogue[1:] != dialogue[:-1])
+    start = np.flatnonzero(change)
+    return dialogue[start], states[start].astype(np.int64), start - np.asarray(offsets)[dialogue[start]], np.diff(np.append(start, n))
+
+def transition_counts(states, offsets) -> np.ndarray:
+    """(n_dialogues, 3, 3) turn-to-turn transition counts, [from, to] in STATES order."""
+    states = np.asarray(states, dtype=np.int64)
+    lengths = np.diff(offsets)
+    n_d = len(lengths)
+    dialogue = np.repeat(np.arange(n_d), lengths)
+    same = dialogue[1:] == dialogue[:-1]
+    key = dialogue[1:][same] * 9 + states[:-1][same] * 3 + states[1:][same]
+    return np.bincount(key, minlength=n_d * 9).reshape(n_d, 3, 3)
+
+TRANSITION_COLUMNS = [f"n_{a}{b}" for a in STATES for b in STATES]
+
+def sbr_by_dialogue(data, mode="adaptive", percentiles=(25, 75), phi_low=0.60, phi_high=0.75, hysteresis=0.0) -> pd.DataFrame:
+    """S–B–R statistics per dialogue and speaker over the human and model curves.
+
+    Fractions of turns, runs and mean dwell time (turns per run) per state, cycles
+    (R→S returns to stability) and the turn-to-turn transition counts n_<from><to>.
+    """
+    corpus = as_corpus(data)
+    offsets, n_d = corpus.offsets, corpus.n_dialogues
+    parts = []
+    for speaker, x in zip(SPEAKERS, (corpus.human_ct, corpus.model_ct)):
+        low, high = phi_thresholds(x, offsets, mode, percentiles, phi_low, phi_high)
+        states = sbr_states(x, offsets, low, high, hysteresis)
+        d, s, _, length = run_lengths(states, offsets)
+        turns = np.bincount(d * 3 + s, weights=length, minlength=n_d * 3).reshape(n_d, 3)
+        runs = np.bincount(d * 3 + s, minlength=n_d * 3).reshape(n_d, 3)
+        T = transition_counts(states, offsets)
+        with np.errstate(invalid="ignore", divide="ignore"):
+            frac = turns / corpus.lengths[:, None]
+            dwell = turns / runs
+        part = pd.DataFrame(dict(dialogue_id=corpus.dialogue_ids.to_numpy(), speaker=speaker, n_turns=corpus.lengths,
+                                 phi_low=low, phi_high=high))
+        for k, name in enumerate(STATES):
+            part[f"frac_{name}"], part[f"runs_{name}"], part[f"dwell_{name}"] = frac[:, k], runs[:, k], dwell[:, k]
+        part["cycles"] = T[:, R, S]
+        for j, col in enumerate(TRANSITION_COLUMNS):
+            part[col] = T.reshape(n_d, 9)[:, j]
+        parts.append(part)
+    # dialogue-major, speakers in SPEAKERS order
+    out = pd.concat(parts, ignore_index=True)
+    order = np.arange(len(out)).reshape(len(SPEAKERS), n_d).T.reshape(-1)
+    return out.iloc[order].reset_index(drop=True)
+
+def sbr_summary(table: pd.DataFrame) -> pd.DataFrame:
+    """Pooled per speaker and state: share of turns, runs, mean dwell and the row-normalized transition probabilities."""
+    rows = []
+    for speaker, g in table.groupby("speaker", sort=False):
+        total = g["n_turns"].sum()
+        T = g[TRANSITION_COLUMNS].to_numpy().sum(axis=0).reshape(3, 3)
+        for k, name in enumerate(STATES):
+            turns = np.rint(g[f"frac_{name}"] * g["n_turns"]).sum()
+            runs = g[f"runs_{name}"].sum()
+            with np.errstate(invalid="ignore", divide="ignore"):
+                p = T[k] / T[k].sum()
+            rows.append(dict(speaker=speaker, state=name, n_dialogues=len(g), frac=turns / total if total else np.nan,
+                             runs=int(runs), dwell=turns / runs if runs else np.nan, **{f"p_to_{b}": p[j] for j, b in enumerate(STATES)}))
+    return pd.DataFrame(rows)
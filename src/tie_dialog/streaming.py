@@ -0,0 +1,281 @@
+
+import heapq, struct
+from collections import deque
+from dataclasses import dataclass
+from typing import Dict, List, NamedTuple, Optional
+import numpy as np
+from tie_dialog.events import KINDS, SPEAKERS
+
+class StreamEvent(NamedTuple):
+    dialogue_id: object
+    turn: int
+    kind: str         # "peak" (repair) or "valley" (rupture)
+    speaker: str      # "human" or "machine"
+    prominence: float
+
+class _Smoother:
+    """Online counterpart of preprocessing.smooth_array for the causal methods."""
+    def __init__(self, window: int, method: str):
+        if method not in ("rolling", "ewma"):
+            raise ValueError(f"streaming supports rolling and ewma smoothing, not {method}")
+        self.window, self.method = max(int(window or 1), 1), method
+        self.buf, self.total, self.state = deque(), 0.0, None
+
+    def push(self, x: float) -> float:
+        if self.method == "ewma":
+            alpha = 2.0 / (self.window + 1.0)
+            self.state = x if self.state is None else alpha * x + (1 - alpha) * self.state
+            y = self.state
+        else:
+            self.buf.append(x)
+            self.total += x
+            if len(self.buf) > self.window:
+                self.total -= self.buf.popleft()
+            y = self.total / len(self.buf)
+        # batch smoothing stores float32, so detection sees float32-rounded values
+        return float(np.float32(y))
+
+@dataclass
+class _Peak:
+    idx: int
+    value: float
+    left_min: float
+    right_min: float
+    closed: bool = False      # a higher sample arrived; right base is final
+    kept: Optional[bool] = None
+
+    @property
+    def prominence(self):
+        return self.value - max(self.left_min, self.right_min)
+
+def _ordered(f: float) -> int:
+    # float -> int with the same order (IEEE bit pattern, negatives mirrored)
+    i = struct.unpack("<q", struct.pack("<d", f))[0]
+    return i if i >= 0 else -(i & 0x7FFFFFFFFFFFFFFF)
+
+def _unordered(k: int) -> float:
+    return struct.unpack("<d", struct.pack("<Q", k if k >= 0 else -k | 1 << 63))[0]
+
+def _fire_level(value, threshold):
+    """Largest float x with value - x >= threshold: a peak reaches the threshold once a sample this low arrives.
+
+    value - x is monotone in x under rounding, so the level is bracketed around
+    value - threshold and bisected over the float ordering.
+    """
+    ok = lambda k: value - _unordered(k) >= threshold
+    k, step = _ordered(value - threshold), 1
+    if ok(k):
+        while ok(k + step):
+            k, step = k + step, step * 2
+        lo, hi = k, k + step
+    else:
+        while not ok(k - step):
+            k, step = k - step, step * 2
+        lo, hi = k - step, k
+    while hi - lo > 1:
+        mid = (lo + hi) // 2
+        lo, hi = (mid, hi) if ok(mid) else (lo, mid)
+    return _unordered(lo)
+
+class _PeakTracker:
+    """Incremental scipy.signal.find_peaks(x, prominence=p, distance=d).
+
+    Prominence can only grow as samples arrive until a higher sample closes the
+    right-hand search, so a peak is confirmed as soon as it crosses the threshold.
+    min_distance is decided per cluster of maxima closer than d; a cluster is
+    complete d samples after its last maximum, which makes the result exact,
+    unless a cluster spans more than `lookahead` samples. Then it is resolved
+    early with the maxima seen so far. The left-base stack and the open peaks
+    are capped at `max_history` entries.
+
+    Open peaks form a stack of non-increasing values, so a higher sample closes a
+    suffix of it; each entry's right_min covers the samples up to the next entry,
+    and a closed entry folds its minimum into the one below. Kept peaks still short
+    of the threshold wait in a heap keyed by the sample level that confirms them.
+    Every push is O(1) amortized, plus O(log n) per peak that has to wait.
+    """
+    def __init__(self, prominence: float, min_distance: int, lookahead: int, max_history: int):
+        self.threshold, self.distance = prominence, max(int(min_distance or 1), 1)
+        self.lookahead, self.max_history = lookahead, max_history
+        self.n, self.prev = 0, None
+        self.rise = None                  # left edge of a plateau that started with a rise
+        self.rise_left_min = None
+        self.stack = deque()              # (value, min since previous greater value), strictly decreasing
+        self.open = deque()               # peaks whose right base is still moving, values non-increasing
+        self.cluster: List[_Peak] = []    # maxima awaiting the min_distance decision
+        self.pending = []                 # heap of (-fire level, idx, peak): kept, waiting for enough prominence
+
+    def _left_min(self, x):
+        m = x
+        while self.stack and self.stack[-1][0] <= x:
+            m = min(m, self.stack.pop()[1])
+        self.stack.append((x, m))
+        if len(self.stack) > self.max_history:
+            self.stack.popleft()
+        return m
+
+    def push(self, x: float) -> List[_Peak]:
+        i = self.n
+        self.n += 1
+        while self.open and x > self.open[-1].value:
+            p = self.open.pop()
+            p.closed = True
+            if self.open:
+                self.open[-1].right_min = min(self.open[-1].right_min, p.right_min)
+        if self.open:
+            self.open[-1].right_min = min(self.open[-1].right_min, x)
+        fired = []
+        while self.pending and -self.pending[0][0] >= x:
+            p = heapq.heappop(self.pending)[2]
+            if not p.closed:
+                p.right_min = min(p.right_min, x)
+                fired.append(p)
+        left_min = self._left_min(x)
+        if self.prev is not None:
+            if x > self.prev:
+                self.rise, self.rise_left_min = i, left_min
+            elif x < self.prev and self.rise is not None:
+                peak = _Peak((self.rise + i - 1) // 2, self.prev, self.rise_left_min, x)
+                self.open.append(peak)
+                self.cluster.append(peak)
+                self.rise = None
+        self.prev = x
+        if len(self.open) > self.max_history:
+            self.open.popleft().closed = True
+        return sorted(fired, key=lambda p: p.idx) + self._settle(final=False)
+
+    def finish(self) -> List[_Peak]:
+        while self.open:
+            p = self.open.pop()
+            p.closed = True
+            if self.open:
+                self.open[-1].right_min = min(self.open[-1].right_min, p.right_min)
+        return self._settle(final=True)
+
+    def _select(self, peaks):
+        # scipy's _select_by_peak_distance: highest first (the later peak on a tie), drop neighbours closer than distance
+        order = sorted(range(len(peaks)), key=lambda k: (peaks[k].value, peaks[k].idx), reverse=True)
+        for k in order:
+            if peaks[k].kept is False:
+                continue
+            peaks[k].kept = True
+            for o in peaks:
+                if o is not peaks[k] and o.kept is None and abs(o.idx - peaks[k].idx) < self.distance:
+                    o.kept = False
+
+    def _settle(self, final: bool) -> List[_Peak]:
+        if not self.cluster:
+            return []
+        frontier = self.n if self.rise is None else self.rise
+        last = self.cluster[-1].idx
+        # maxima split into independent clusters wherever the gap reaches distance
+        if self.distance <= 2:
+            for p in self.cluster:
+                p.kept = True
+        elif final or frontier - last >= self.distance or last - self.cluster[0].idx > self.lookahead:
+            self._select(self.cluster)
+        else:
+            return []
+        cluster, self.cluster = self.cluster, []
+        first = cluster[0].idx
+        # the cluster is the newest run of maxima, so its open peaks are the top of the stack:
+        # fold the entries above each into its right_min to make it exact
+        m = np.inf
+        for p in reversed(self.open):
+            if p.idx < first:
+                break
+            m = p.right_min = min(p.right_min, m)
+        out = []
+        for p in cluster:
+            if not p.kept:
+                continue
+            if p.prominence >= self.threshold:
+                out.append(p)
+            elif not (p.closed or final) and p.value - p.left_min >= self.threshold:
+                heapq.heappush(self.pending, (-_fire_level(p.value, self.threshold), p.idx, p))
+        if final:
+            self.pending = []
+        elif len(self.pending) > 2 * self.max_history:
+            live = sorted((e for e in self.pending if not e[2].closed), key=lambda e: e[1])
+            self.pending = live[-self.max_history:]
+            heapq.heapify(self.pending)
+        return out
+
+class _DialogueState:
+    def __init__(self, analyzer: "StreamingAnalyzer"):
+        self.smoothers = [_Smoother(analyzer.window, analyzer.method) for _ in SPEAKERS]
+        # tracker order: (speaker, kind) = human peak, human valley, machine peak, machine valley
+        self.trackers = [_PeakTracker(p, analyzer.min_distance, analyzer.lookahead, analyzer.max_history)
+                         for _ in SPEAKERS for p in (analyzer.prominence, analyzer.valley_prominence)]
+        self.turns = deque(maxlen=analyzer.max_history)
+        self.base = 0
+
+class StreamingAnalyzer:
+    """Turn-by-turn rupture/repair detection for many concurrent dialogues.
+
+    Each push costs O(1) amortized per dialogue and memory per active dialogue is
+    bounded by max_history. Uses the smoothing and find_peaks semantics of the
+    batch pipeline (rolling/ewma smoothing, prominence, min_distance), so events
+    agree with events.detect_events on the same series.
+    """
+    def __init__(self, window: int = 3, method: str = "rolling", prominence: float = 0.08, min_distance: int = 2,
+                 valley_prominence: float = None, lookahead: int = None, max_history: int = 512):
+        self.window, self.method = window, method
+        self.prominence = prominence
+        self.valley_prominence = prominence if valley_prominence is None else valley_prominence
+        self.min_distance = min_distance
+        self.lookahead = lookahead if lookahead is not None else 8 * max(int(min_distance or 1), 1)
+        self.max_history = max_history
+        self._dialogues: Dict[object, _DialogueState] = {}
+
+    @classmethod
+    def from_config(cls, analysis, **kw) -> "StreamingAnalyzer":
+        ev = analysis.events
+        return cls(window=analysis.smoothing.get("window", 3), method=analysis.smoothing.get("method", "rolling"),
+                   prominence=ev["peak_prominence"], min_distance=ev["min_distance"],
+                   valley_prominence=ev.get("valley_prominence"), **kw)
+
+    @property
+    def active_dialogues(self) -> int:
+        return len(self._dialogues)
+
+    def _emit(self, did, st, t, peaks) -> List[StreamEvent]:
+        speaker, kind = SPEAKERS[t // 2], KINDS[t % 2]
+        out = []
+        for p in peaks:
+            pos = p.idx - st.base
+            turn = st.turns[pos] if 0 <= pos < len(st.turns) else None
+            out.append(StreamEvent(did, turn, kind, speaker, float(p.prominence)))
+        return out
+
+    def push(self, dialogue_id, turn: int, human_ct: float, model_ct: float) -> List[StreamEvent]:
+        """Add one turn; returns the events confirmed by it (possibly for earlier turns)."""
+        st = self._dialogues.get(dialogue_id)
+        if st is None:
+            st = self._dialogues[dialogue_id] = _DialogueState(self)
+        if len(st.turns) == st.turns.maxlen:
+            st.base += 1
+        st.turns.append(turn)
+        out = []
+        for s, x in enumerate((human_ct, model_ct)):
+            y = st.smoothers[s].push(float(x))
+            for k, sign in enumerate((1.0, -1.0)):
+                t = 2 * s + k
+                out.extend(self._emit(dialogue_id, st, t, st.trackers[t].push(sign * y)))
+        return out
+
+    def close(self, dialogue_id) -> List[StreamEvent]:
+        """End a dialogue: flush events that only the end of the series confirms and free its state."""
+        st = self._dialogues.pop(dialogue_id, None)
+        if st is None:
+            return []
+        out = []
+        for t, tracker in enumerate(st.trackers):
+            out.extend(self._emit(dialogue_id, st, t, tracker.finish()))
+        return out
+
+    def close_all(self) -> List[StreamEvent]:
+        out = []
+        for did in list(self._dialogues):
+            out.extend(self.close(did))
+        return out
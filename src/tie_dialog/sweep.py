@@ -0,0 +1,102 @@
+
+# Threshold sweep: candidate peaks and prominences are found once per smoothed series,
+# then every (min_distance, prominence) point is a cheap filter over those candidates.
+import itertools
+from concurrent.futures import ProcessPoolExecutor
+import numpy as np
+import pandas as pd
+from scipy.signal import find_peaks, peak_prominences
+from tie_dialog.agreement import _row_bounds, confusion_counts, kappa_from_confusion, tolerant_labels
+from tie_dialog.events import EventArrays, _fenced_buffer, _locate, _prf, _select_by_distance, match_counts_by_window
+from tie_dialog.corpus import as_corpus, resolve_jobs
+from tie_dialog.preprocessing import smooth_array
+
+SURFACE_KINDS = ("peak", "valley", "all")
+
+def candidate_peaks(channels, offsets, min_distances):
+    """Every local maximum of every channel with its prominence.
+
+    Returns (row, channel, prominence, {d: kept}) where kept marks the maxima that
+    detect_event_arrays keeps for min_distance d. Its distance rule ranks all maxima
+    by height before any prominence filter, so one mask per d is exact for every threshold.
+    """
+    gap = max(1, 2 * max(min_distances))
+    buf, block, wlen = _fenced_buffer(channels, offsets, gap)
+    pos = find_peaks(buf)[0]
+    real = np.isfinite(buf[pos])
+    kept = {d: _select_by_distance(pos, buf[pos], d)[real] for d in min_distances}
+    _, row, chan = _locate(pos[real], block, offsets, gap)
+    return row, chan, peak_prominences(buf, pos[real], wlen=wlen)[0], kept
+
+def _score(row, chan, dialogue, turns, offsets, windows, mode, bounds):
+    """Per-dialogue (n_ref, n_sys, tp_ref, tp_sys) and confusion cells, both (dialogues, windows, 4)."""
+    n_d = len(offsets) - 1
+    speaker = (chan % 2).astype(np.int8)
+    ev = EventArrays(dialogue[row].astype(np.int32), turns[row].astype(np.int32), (chan // 2).astype(np.int8), speaker, np.arange(n_d))
+    counts = match_counts_by_window(ev, windows, mode)
+    F = np.zeros((n_d, len(windows), 4))
+    F[counts["dialogue_id"].to_numpy(), np.searchsorted(windows, counts["window"].to_numpy())] = \
+        counts[["n_ref","n_sys","tp_ref","tp_sys"]].to_numpy()
+    ref = np.zeros(len(turns), dtype=bool)
+    sys = np.zeros(len(turns), dtype=bool)
+    ref[row[speaker == 0]] = True
+    sys[row[speaker == 1]] = True
+    K = np.stack([confusion_counts(ref, tolerant_labels(ref, sys, offsets, w, bounds), dialogue, n_d).reshape(n_d, 4) for w in windows], axis=1)
+    return F, K
+
+def _summarize(F, K):
+    """Macro/micro F1 and macro/pooled κ per window from per-dialogue arrays (as f1_summary / kappa_summary)."""
+    n_ref, n_sys, tp_ref, tp_sys = np.moveaxis(F, -1, 0)
+    present = (n_ref + n_sys) > 0
+    f1 = _prf(tp_sys, n_sys, tp_ref, n_ref)[2]
+    with np.errstate(invalid="ignore"):
+        macro = (f1 * present).sum(axis=0) / present.sum(axis=0)
+        micro = _prf(*(x.sum(axis=0) for x in (tp_sys, n_sys, tp_ref, n_ref)))[2]
+        kappa = np.nanmean(kappa_from_confusion(K.reshape(*K.shape[:-1], 2, 2)), axis=0) if len(K) else np.full(K.shape[1], np.nan)
+    return present.sum(axis=0), macro, micro, kappa, kappa_from_confusion(K.sum(axis=0).reshape(-1, 2, 2))
+
+def _sweep_smoothing(h, m, turns, offsets, smooth_window, method, polyorder, min_distances, peak_grid, valley_grid, windows, mode):
+    # same arrays as smooth_series followed by detect_event_arrays
+    smooth = (lambda x: smooth_array(x, offsets, smooth_window, method, polyorder)) if smooth_window > 1 else (lambda x: x)
+    hs, ms = smooth(h).astype(np.float64), smooth(m).astype(np.float64)
+    # channel order as in detect_event_arrays: human peak, machine peak, human valley, machine valley
+    row, chan, prom, kept = candidate_peaks((hs, ms, -hs, -ms), offsets, min_distances)
+    dialogue = np.repeat(np.arange(len(offsets) - 1), np.diff(offsets))
+    bounds = _row_bounds(offsets)
+    rows = []
+    for d in min_distances:
+        per_kind = []
+        for k, grid in enumerate((peak_grid, valley_grid)):
+            base = kept[d] & (chan // 2 == k)
+            per_kind.append([_score(row[sel], chan[sel], dialogue, turns, offsets, windows, mode, bounds)
+                             for sel in (base & (prom >= p) for p in grid)])
+        for (i, pp), (j, pv) in itertools.product(enumerate(peak_grid), enumerate(valley_grid)):
+            (Fp, Kp), (Fv, Kv) = per_kind[0][i], per_kind[1][j]
+            for kind, (F, K) in zip(SURFACE_KINDS, ((Fp, Kp), (Fv, Kv), (Fp + Fv, Kp + Kv))):
+                n, f1, f1_micro, kappa, kappa_pooled = _summarize(F, K)
+                rows.append(pd.DataFrame(dict(smooth_window=smooth_window, min_distance=d, peak_prominence=pp, valley_prominence=pv,
+                                              window=windows, kind=kind, n_dialogues=n, f1=f1, f1_micro=f1_micro, kappa=kappa, kappa_pooled=kappa_pooled)))
+    return pd.concat(rows, ignore_index=True)
+
+def threshold_sweep(ct_df, smooth_windows, peak_prominence, min_distance, valley_prominence=None,
+                    windows=(1,2,3), method="rolling", polyorder=2, mode="tolerant", jobs=1) -> pd.DataFrame:
+    """F1/κ surface over smoothing window × min_distance × peak prominence × valley prominence.
+
+    One row per grid point, matching window and kind ("peak", "valley", "all"),
+    with the same definitions as f1_summary and kappa_summary on detected events.
+    Smoothing windows run in parallel with `jobs` processes.
+    """
+    as_list = lambda v: sorted({v} if np.isscalar(v) else set(v))
+    smooth_windows, peak_grid, min_distances = as_list(smooth_windows), as_list(peak_prominence), [int(d) for d in as_list(min_distance)]
+    valley_grid = peak_grid if valley_prominence is None else as_list(valley_prominence)
+    windows = sorted(int(w) for w in windows)
+    corpus = as_corpus(ct_df)
+    offsets, h, m, turns = corpus.offsets, corpus.human_ct, corpus.model_ct, corpus.turn
+    args = [(h, m, turns, offsets, s, method, polyorder, min_distances, peak_grid, valley_grid, windows, mode) for s in smooth_windows]
+    jobs = min(resolve_jobs(jobs), len(args))
+    if jobs <= 1:
+        parts = [_sweep_smoothing(*a) for a in args]
+    else:
+        with ProcessPoolExecutor(max_workers=jobs) as ex:
+            parts = list(ex.map(_sweep_smoothing, *zip(*args)))
+    return pd.concat(parts, ignore_index=True)
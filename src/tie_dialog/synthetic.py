@@ -0,0 +1,101 @@
+
+# Synthetic corpora after the human/model simulation of figures_pilot.py (Figure 3):
+# human C_t around a base level with a slow oscillation and small noise, the model
+# below it by a fixed offset and noisier, plus planted ruptures (valleys) and repairs (peaks).
+import os
+from dataclasses import dataclass
+import numpy as np
+import pandas as pd
+from tie_dialog.data_loading import CT_COLUMNS, EVENT_COLUMNS
+
+@dataclass
+class SyntheticSpec:
+    turns: tuple = (18, 40)       # dialogue length range (inclusive)
+    base_level: float = 0.80
+    trend: float = 0.01           # amplitude of the slow oscillation
+    noise_h: float = 0.008
+    offset: float = -0.12         # the model runs below the human curve
+    noise_m: float = 0.015
+    event_rate: float = 0.06      # planted events per turn
+    depth: float = 0.12           # height of a planted peak / depth of a valley
+    lag_prob: float = 0.47        # chance the model trails the human by one turn (mean lag ≈ +0.47)
+    miss_rate: float = 0.10       # planted events the model does not reproduce
+    false_rate: float = 0.01      # spurious model events per turn
+
+def _shift(x, starts, k):
+    """x moved k rows later within each dialogue (rows shifted in from outside the dialogue are 0)."""
+    out = np.zeros_like(x)
+    idx = np.arange(len(x))
+    src = idx - k
+    ok = (src >= starts) & (src < len(x))
+    out[idx[ok]] = x[src[ok]]
+    return out
+
+def _bumps(imp, starts, ends):
+    # each impulse becomes a three-turn triangle: full height at the event, half on either side
+    left, right = _shift(imp, starts, 1), _shift(imp, starts, -1)
+    right[np.arange(len(imp)) + 1 >= ends] = 0
+    return imp + 0.5 * (left + right)
+
+def synthetic_corpus(n_dialogues: int, seed: int = 0, spec: SyntheticSpec = None, first_id: int = 0):
+    """(ct_series, events) frames for `n_dialogues` dialogues; the events are the planted ground truth."""
+    spec = spec or SyntheticSpec()
+    rng = np.random.default_rng(seed)
+    lengths = rng.integers(spec.turns[0], spec.turns[1] + 1, size=n_dialogues)
+    offsets = np.concatenate(([0], np.cumsum(lengths)))
+    n = int(offsets[-1])
+    dlg = np.repeat(np.arange(n_dialogues), lengths)
+    starts, ends = offsets[:-1][dlg], offsets[1:][dlg]
+    t = np.arange(n) - starts
+    frac = t / np.maximum(lengths[dlg] - 1, 1)
+    phase = rng.uniform(0, 2 * np.pi, n_dialogues)[dlg]
+    lag = (rng.random(n_dialogues) < spec.lag_prob).astype(np.int64)[dlg]
+
+    # planted events away from the dialogue edges, sign = +1 repair (peak) / -1 rupture (valley)
+    inner = (t >= 2) & (t < lengths[dlg] - 3)
+    imp_h = np.where(inner & (rng.random(n) < spec.event_rate), rng.choice([-1.0, 1.0], size=n), 0.0)
+    imp_m = np.where(lag > 0, _shift(imp_h, starts, 1), imp_h)
+    imp_m[rng.random(n) < spec.miss_rate] = 0
+    spurious = inner & (imp_m == 0) & (rng.random(n) < spec.false_rate)
+    imp_m[spurious] = rng.choice([-1.0, 1.0], size=int(spurious.sum()))
+
+    trend = lambda f: spec.trend * np.sin(2 * np.pi * f + phase)
+    human = spec.base_level + trend(frac) + rng.normal(0, spec.noise_h, n) + spec.depth * _bumps(imp_h, starts, ends)
+    frac_m = np.maximum(t - lag, 0) / np.maximum(lengths[dlg] - 1, 1)
+    model = spec.base_level + spec.offset + trend(frac_m) + rng.normal(0, spec.noise_m, n) + spec.depth * _bumps(imp_m, starts, ends)
+
+    ids = (dlg + first_id).astype(np.int32)
+    turn = (t + 1).astype(np.int32)
+    ct = pd.DataFrame(dict(dialogue_id=ids, turn=turn, human_ct=human.astype(np.float32), model_ct=model.astype(np.float32)))
+    ev = pd.DataFrame(dict(dialogue_id=ids, turn=turn,
+                           human_peak=(imp_h > 0).astype(np.int8), human_valley=(imp_h < 0).astype(np.int8),
+                           machine_peak=(imp_m > 0).astype(np.int8), machine_valley=(imp_m < 0).astype(np.int8)))
+    return ct[CT_COLUMNS], ev[EVENT_COLUMNS]
+
+def write_synthetic(out_dir: str, n_dialogues: int, seed: int = 0, spec: SyntheticSpec = None,
+                    fmt: str = "csv", chunk_dialogues: int = 100_000):
+    """Write ct_series.synthetic.<fmt> and events.synthetic.<fmt> in chunks of dialogues; returns both paths.
+
+    Chunk k draws from default_rng([seed, k]), so output depends only on seed and chunk size.
+    Both formats are written chunk by chunk (parquet as one row group per chunk).
+    """
+    os.makedirs(out_dir, exist_ok=True)
+    paths = [os.path.join(out_dir, f"{name}.synthetic.{fmt}") for name in ("ct_series", "events")]
+    writers = [None, None]
+    try:
+        for k, lo in enumerate(range(0, n_dialogues, chunk_dialogues)):
+            frames = synthetic_corpus(min(chunk_dialogues, n_dialogues - lo), seed=[seed, k], spec=spec, first_id=lo)
+            for i, (path, df) in enumerate(zip(paths, frames)):
+                if fmt == "parquet":
+                    import pyarrow as pa, pyarrow.parquet as pq
+                    table = pa.Table.from_pandas(df, preserve_index=False)
+                    if writers[i] is None:
+                        writers[i] = pq.ParquetWriter(path, table.schema)
+                    writers[i].write_table(table)
+                else:
+                    df.to_csv(path, mode="w" if k == 0 else "a", header=k == 0, index=False, float_format="%.6f")
+    finally:
+        for w in writers:
+            if w is not None:
+                w.close()
+    return tuple(paths)